@@ -1,24 +1,78 @@
 # agents.py
 
-import httpx # CHANGEMENT : Importe httpx au lieu de requests
+import os
+import httpx
 import time
+import json
+import asyncio
 import logging
-# import asyncio # Plus besoin de asyncio ici car httpx est asynchrone
+from collections import deque
+
+from app.common.ollama_client import get_ollama_client
+from app.common.llm_cache import get_llm_cache, LLM_CACHE_ENABLED
+from app.common.context_budget import estimate_tokens
+from app.common.llm_scheduler import llm_scheduler, PRIORITY_BATCH
+from app.common.metrics import (LLM_REQUEST_SECONDS, LLM_FIRST_TOKEN_SECONDS, LLM_REQUESTS, LLM_FALLBACKS,
+                                observe_ollama_usage)
+
+OLLAMA_CHAT_PATH = "/api/chat"
+# Réponse de remplacement quand Ollama ne renvoie aucun contenu (jamais mise en cache)
+NO_RESPONSE_PLACEHOLDER = "(Pas de réponse valide de l'IA)"
+
+# Bornes de la mémoire de conversation de chaque instance d'agent
+AGENT_MEMORY_MAX_TOKENS = int(os.environ.get("AGENT_MEMORY_MAX_TOKENS", "4000"))
+AGENT_MEMORY_MAX_MESSAGES = int(os.environ.get("AGENT_MEMORY_MAX_MESSAGES", "20"))
+# Durée (secondes) après laquelle une session inactive libère ses agents
+AGENT_SESSION_IDLE_TIMEOUT = int(os.environ.get("AGENT_SESSION_IDLE_TIMEOUT", "1800"))
 
 # Configuration du logger
 logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s %(message)s')
 
+class ConversationMemory:
+    """
+    Historique de conversation borné (tampon circulaire) : au-delà de `max_messages`
+    messages ou de `max_tokens` tokens estimés, les messages les plus anciens sont évincés.
+    """
+
+    def __init__(self, max_tokens: int = AGENT_MEMORY_MAX_TOKENS, max_messages: int = AGENT_MEMORY_MAX_MESSAGES):
+        self.max_tokens = max_tokens
+        self.messages = deque(maxlen=max_messages)
+        self.tokens = 0
+
+    def append(self, message: dict):
+        if len(self.messages) == self.messages.maxlen:
+            self.tokens -= estimate_tokens(self.messages[0]["content"])
+        self.messages.append(message)
+        self.tokens += estimate_tokens(message["content"])
+        while self.tokens > self.max_tokens and len(self.messages) > 1:
+            evicted = self.messages.popleft()
+            self.tokens -= estimate_tokens(evicted["content"])
+
+    def as_messages(self) -> list:
+        return list(self.messages)
+
+    def clear(self):
+        self.messages.clear()
+        self.tokens = 0
+
+    def __len__(self):
+        return len(self.messages)
+
 class Agent:
-    def __init__(self, name, role, llm_model, description_for_orchestrator):
+    def __init__(self, name, role, llm_model, description_for_orchestrator, session_id=None):
         self.name = name
         self.role = role
         self.llm_model = llm_model # C'est le nom du modèle Ollama personnalisé (ex: "agent-architecte")
         self.description_for_orchestrator = description_for_orchestrator # Description utile pour l'orchestrateur
-        self.memory = [] # Pour stocker l'historique de conversation de cet agent
+        self.session_id = session_id # Session propriétaire (équité de l'ordonnanceur LLM)
+        self.memory = ConversationMemory() # Historique borné de conversation de cette instance
 
-    # CORRECTION CRUCIALE : aask est maintenant une fonction SYNCHRONE
-    def aask(self, prompt, context_messages=None, timeout=180):
-        """Envoie un prompt à Ollama, gère les erreurs et fournit un fallback intelligent."""
+    def spawn(self, session_id=None):
+        """Crée une nouvelle instance du même agent, avec une mémoire vierge."""
+        return Agent(self.name, self.role, self.llm_model, self.description_for_orchestrator, session_id)
+
+    def _build_messages(self, prompt, context_messages=None):
+        """Construit la liste des messages envoyés à Ollama."""
         messages = []
         # Le SYSTEM prompt est déjà intégré dans le Modelfile de chaque agent.
         # Ici, nous construisons juste les messages user/assistant pour la conversation.
@@ -28,40 +82,166 @@ class Agent:
         
         # Ajout du prompt utilisateur
         messages.append({"role": "user", "content": prompt})
+        return messages
 
-        logging.info(f"[Agent {self.name}] Début appel Ollama ({self.llm_model})...")
-        start = time.time()
-        try:
-            # Utilise httpx.Client pour les requêtes synchrones, car cette fonction sera appelée via asyncio.to_thread
-            client = httpx.Client() # CHANGEMENT : Utilise httpx.Client
-            response = client.post( # CHANGEMENT : Appel synchrone
-                "http://localhost:11434/api/chat", # Assurez-vous que votre serveur Ollama tourne sur ce port
-                json={"model": self.llm_model, "messages": messages, "stream": False},
+    def _remember(self, prompt, content):
+        self.memory.append({"role": "user", "content": prompt})
+        self.memory.append({"role": "assistant", "content": content})
+
+    def _payload(self, messages, stream, options=None, keep_alive=None):
+        payload = {"model": self.llm_model, "messages": messages, "stream": stream}
+        if options:
+            payload["options"] = options
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive # Durée de résidence du modèle après l'appel
+        return payload
+
+    async def _chat(self, messages, timeout, options=None, priority=PRIORITY_BATCH, keep_alive=None):
+        """Appel Ollama non streamé. Lève une exception en cas d'échec."""
+        # Créneau attribué par l'ordonnanceur global, puis client partagé (pool keep-alive)
+        async with llm_scheduler.slot(self.llm_model, self.session_id, priority):
+            response = await get_ollama_client().post(
+                OLLAMA_CHAT_PATH,
+                json=self._payload(messages, False, options, keep_alive),
                 timeout=timeout
             )
             response.raise_for_status()
             data = response.json()
-            
-            content = data.get("message", {}).get("content")
-            if not content:
-                content = data.get("content") or data.get("response") or "(Pas de réponse valide de l'IA)"
+        observe_ollama_usage(self.llm_model, data)
+
+        content = data.get("message", {}).get("content")
+        if not content:
+            content = data.get("content") or data.get("response") or NO_RESPONSE_PLACEHOLDER
+        return content
+
+    async def _chat_stream(self, messages, timeout, on_delta, options=None, priority=PRIORITY_BATCH, keep_alive=None):
+        """Appel Ollama streamé (NDJSON). Lève une exception en cas d'échec."""
+        parts = []
+        async with llm_scheduler.slot(self.llm_model, self.session_id, priority), \
+                get_ollama_client().stream(
+                    "POST",
+                    OLLAMA_CHAT_PATH,
+                    json=self._payload(messages, True, options, keep_alive),
+                    timeout=timeout
+                ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise RuntimeError(chunk["error"])
+                delta = chunk.get("message", {}).get("content") or chunk.get("response") or ""
+                if delta:
+                    parts.append(delta)
+                    await on_delta(delta)
+                if chunk.get("done"):
+                    observe_ollama_usage(self.llm_model, chunk) # Statistiques dans le dernier fragment
+                    break
+        return "".join(parts) or NO_RESPONSE_PLACEHOLDER
+
+    async def _generate(self, messages, options, use_cache, generate):
+        """Passe par le cache de réponses (LRU + SQLite, appels fusionnés) si activé."""
+        if not (use_cache and LLM_CACHE_ENABLED):
+            return await generate()
+        cache = get_llm_cache()
+        key = cache.make_key(self.llm_model, messages, options)
+        return await cache.get_or_generate(key, self.llm_model, generate,
+                                           cacheable=lambda content: content != NO_RESPONSE_PLACEHOLDER)
+
+    async def aask(self, prompt, context_messages=None, timeout=180, options=None, use_cache=True, priority=PRIORITY_BATCH,
+                   keep_alive=None):
+        """Envoie un prompt à Ollama, gère les erreurs et fournit un fallback intelligent."""
+        messages = self._build_messages(prompt, context_messages)
+
+        logging.info(f"[Agent {self.name}] Début appel Ollama ({self.llm_model})...")
+        start = time.time()
+        called = False
+
+        async def generate():
+            nonlocal called
+            called = True
+            return await self._chat(messages, timeout, options, priority, keep_alive)
+
+        try:
+            content = await self._generate(messages, options, use_cache, generate)
 
             elapsed = time.time() - start
             logging.info(f"[Agent {self.name}] Réponse Ollama reçue en {elapsed:.2f}s")
+            self._observe("chat", "ok" if called else "cache", elapsed)
             
-            self.memory.append({"role": "user", "content": prompt})
-            self.memory.append({"role": "assistant", "content": content})
+            self._remember(prompt, content)
+
+            return content
+        except httpx.TimeoutException:
+            logging.warning(f"[Agent {self.name}] Timeout après {timeout}s pour {self.llm_model} - Fallback utilisé.")
+            return self._fallback(prompt, "chat", "timeout", start)
+        except httpx.RequestError as e:
+            logging.error(f"Erreur de requête Ollama pour {self.name} ({self.llm_model}): {e} - Fallback utilisé.")
+            return self._fallback(prompt, "chat", "request_error", start)
+        except Exception as e:
+            logging.error(f"Erreur inattendue pour l'agent {self.name} ({self.llm_model}): {e} - Fallback utilisé.")
+            return self._fallback(prompt, "chat", "error", start)
+
+    async def aask_stream(self, prompt, on_delta, context_messages=None, timeout=180, options=None, use_cache=True,
+                          priority=PRIORITY_BATCH, keep_alive=None):
+        """
+        Variante streaming de aask : lit les fragments NDJSON d'Ollama au fil de l'eau
+        et appelle `await on_delta(fragment)` pour chacun. Retourne la réponse complète.
+        Une réponse servie par le cache est transmise en un seul fragment.
+        """
+        messages = self._build_messages(prompt, context_messages)
+
+        logging.info(f"[Agent {self.name}] Début appel Ollama en streaming ({self.llm_model})...")
+        start = time.time()
+        first_token_at = None
+        streamed = False
+
+        async def forward(delta):
+            nonlocal first_token_at
+            if first_token_at is None:
+                first_token_at = time.time() - start
+            await on_delta(delta)
+
+        async def generate():
+            nonlocal streamed
+            streamed = True
+            return await self._chat_stream(messages, timeout, forward, options, priority, keep_alive)
+
+        try:
+            content = await self._generate(messages, options, use_cache, generate)
+            if not streamed:
+                await forward(content)
+
+            elapsed = time.time() - start
+            logging.info(f"[Agent {self.name}] Réponse Ollama streamée en {elapsed:.2f}s (premier token: {first_token_at or elapsed:.2f}s)")
+            self._observe("stream", "ok" if streamed else "cache", elapsed)
+            if streamed and first_token_at is not None:
+                LLM_FIRST_TOKEN_SECONDS.observe(first_token_at, agent=self.name, model=self.llm_model)
+
+            self._remember(prompt, content)
 
             return content
-        except httpx.TimeoutException: # CHANGEMENT : Gère l'exception Timeout de httpx
+        except httpx.TimeoutException:
             logging.warning(f"[Agent {self.name}] Timeout après {timeout}s pour {self.llm_model} - Fallback utilisé.")
-            return self._generate_generic_fallback(prompt)
-        except httpx.RequestError as e: # CHANGEMENT : Gère l'exception RequestError de httpx
+            reason = "timeout"
+        except httpx.RequestError as e:
             logging.error(f"Erreur de requête Ollama pour {self.name} ({self.llm_model}): {e} - Fallback utilisé.")
-            return self._generate_generic_fallback(prompt)
+            reason = "request_error"
         except Exception as e:
             logging.error(f"Erreur inattendue pour l'agent {self.name} ({self.llm_model}): {e} - Fallback utilisé.")
-            return self._generate_generic_fallback(prompt)
+            reason = "error"
+        return self._fallback(prompt, "stream", reason, start)
+
+    def _observe(self, mode, outcome, elapsed):
+        LLM_REQUEST_SECONDS.observe(elapsed, agent=self.name, model=self.llm_model, mode=mode)
+        LLM_REQUESTS.inc(agent=self.name, model=self.llm_model, outcome=outcome)
+
+    def _fallback(self, prompt, mode, reason, start):
+        """Comptabilise l'échec (issue, durée) puis retourne la réponse de repli."""
+        self._observe(mode, reason, time.time() - start)
+        LLM_FALLBACKS.inc(agent=self.name, model=self.llm_model, reason=reason)
+        return self._generate_generic_fallback(prompt)
 
     def _generate_generic_fallback(self, prompt):
         """Réponse de fallback générique si l'appel LLM échoue."""
@@ -162,4 +342,59 @@ def get_agent_by_name(agent_name: str):
     for agent in agents:
         if agent.name == agent_name:
             return agent
-    return None
\ No newline at end of file
+    return None
+
+# --- Registre des agents par session ---
+class AgentRegistry:
+    """
+    Les agents de la liste `agents` servent de catalogue. Chaque session reçoit ses
+    propres instances (et donc sa propre mémoire), libérées à la fin de la session
+    ou après `idle_timeout` secondes d'inactivité.
+    """
+
+    def __init__(self, idle_timeout: int = AGENT_SESSION_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self._sessions = {} # session_id -> {"agents": {nom: Agent}, "last_used": float}
+
+    def get_agent(self, session_id: str, agent_name: str):
+        """Retourne l'instance de l'agent pour cette session (créée à la demande), ou None."""
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = {"agents": {}, "last_used": time.monotonic()}
+        session["last_used"] = time.monotonic()
+        agent = session["agents"].get(agent_name)
+        if agent is None:
+            template = get_agent_by_name(agent_name)
+            if template is None:
+                return None
+            agent = session["agents"][agent_name] = template.spawn(session_id)
+        return agent
+
+    def touch(self, session_id: str):
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session["last_used"] = time.monotonic()
+
+    def release(self, session_id: str):
+        """Libère les agents (et leur mémoire) d'une session."""
+        if self._sessions.pop(session_id, None) is not None:
+            logging.info(f"[AgentRegistry] Session {session_id} libérée ({len(self._sessions)} actives)")
+
+    def sweep_idle(self) -> list:
+        """Libère les sessions inactives depuis plus de `idle_timeout` secondes."""
+        now = time.monotonic()
+        idle = [sid for sid, session in self._sessions.items() if now - session["last_used"] > self.idle_timeout]
+        for session_id in idle:
+            self.release(session_id)
+        return idle
+
+    async def run_idle_sweeper(self, interval: float = 60):
+        """Boucle de fond qui libère périodiquement les sessions inactives."""
+        while True:
+            await asyncio.sleep(interval)
+            self.sweep_idle()
+
+    def __len__(self):
+        return len(self._sessions)
+
+agent_registry = AgentRegistry()
\ No newline at end of file
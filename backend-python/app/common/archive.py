@@ -0,0 +1,140 @@
+# app/common/archive.py
+import io
+import os
+import queue
+import asyncio
+import logging
+import zipfile
+import threading
+
+ARCHIVE_CHUNK_SIZE = 64 * 1024
+# Nombre de morceaux en attente d'envoi : borne la mémoire quel que soit le volume de la session
+ARCHIVE_QUEUE_CHUNKS = 8
+# Contenus déjà compressés : stockés tels quels dans l'archive
+STORED_EXTENSIONS = {
+    ".zip", ".gz", ".tgz", ".br", ".zst", ".xz", ".bz2", ".7z",
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".avif", ".ico",
+    ".woff", ".woff2", ".mp3", ".mp4", ".webm", ".pdf",
+}
+
+_DONE = object()
+
+
+class _ArchiveCancelled(Exception):
+    """Le client a abandonné le téléchargement."""
+
+
+class _QueueWriter(io.RawIOBase):
+    """
+    Flux d'écriture non positionnable : zipfile y écrit l'archive, qui est découpée en
+    morceaux de ARCHIVE_CHUNK_SIZE et transmise par une file bornée (écriture bloquante
+    quand le client lit moins vite que l'archive ne se construit).
+    """
+
+    def __init__(self, chunks: queue.Queue, cancelled: threading.Event):
+        self.chunks = chunks
+        self.cancelled = cancelled
+        self.buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if self.cancelled.is_set():
+            raise _ArchiveCancelled()
+        self.buffer += data
+        if len(self.buffer) >= ARCHIVE_CHUNK_SIZE:
+            self._put(bytes(self.buffer))
+            self.buffer.clear()
+        return len(data)
+
+    def flush(self):
+        if self.cancelled.is_set():
+            self.buffer.clear()
+            return
+        if self.buffer:
+            self._put(bytes(self.buffer))
+            self.buffer.clear()
+
+    def _put(self, chunk: bytes):
+        while not self.cancelled.is_set():
+            try:
+                self.chunks.put(chunk, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+        raise _ArchiveCancelled()
+
+
+def list_archive_files(session_dir: str) -> list:
+    """Fichiers d'une session à archiver (chemins relatifs), hors fichiers internes du stockage."""
+    files = []
+    for root, dirs, names in os.walk(session_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for name in sorted(names):
+            if not name.startswith("."):
+                files.append(os.path.relpath(os.path.join(root, name), session_dir))
+    return files
+
+
+def _write_zip(session_dir: str, files: list, writer: _QueueWriter):
+    with zipfile.ZipFile(writer, "w", allowZip64=True) as archive:
+        for relative_path in files:
+            path = os.path.join(session_dir, relative_path)
+            try:
+                info = zipfile.ZipInfo.from_file(path, relative_path.replace(os.sep, "/"))
+            except FileNotFoundError:
+                continue # Supprimé entre le listing et l'archivage
+            stored = os.path.splitext(relative_path)[1].lower() in STORED_EXTENSIONS
+            info.compress_type = zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED
+            with open(path, "rb") as source, archive.open(info, "w", force_zip64=info.file_size > zipfile.ZIP64_LIMIT) as target:
+                while True:
+                    block = source.read(ARCHIVE_CHUNK_SIZE)
+                    if not block:
+                        break
+                    target.write(block)
+    writer.flush()
+
+
+async def stream_zip(session_dir: str, files: list):
+    """
+    Générateur asynchrone des octets d'une archive ZIP des `files` de `session_dir`.
+    L'archive est construite dans un thread au fil de la lecture, sans fichier
+    temporaire ni archive complète en mémoire.
+    """
+    chunks = queue.Queue(maxsize=ARCHIVE_QUEUE_CHUNKS)
+    cancelled = threading.Event()
+    errors = []
+
+    def produce():
+        try:
+            _write_zip(session_dir, files, _QueueWriter(chunks, cancelled))
+        except _ArchiveCancelled:
+            pass
+        except Exception as e:
+            logging.exception(f"[Archive] Échec de l'archivage de {session_dir}")
+            errors.append(e)
+        finally:
+            while not cancelled.is_set():
+                try:
+                    chunks.put(_DONE, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+
+    producer = threading.Thread(target=produce, name="zip-stream", daemon=True)
+    producer.start()
+    try:
+        while True:
+            chunk = await asyncio.to_thread(chunks.get)
+            if chunk is _DONE:
+                break
+            yield chunk
+        if errors:
+            raise errors[0] # Archive incomplète : on interrompt la réponse plutôt que d'envoyer un ZIP corrompu
+    finally:
+        cancelled.set() # Client parti ou fin normale : le thread producteur s'arrête
+        try:
+            chunks.put_nowait(_DONE) # Débloque une lecture encore en attente dans un thread
+        except queue.Full:
+            pass
@@ -0,0 +1,157 @@
+# app/common/artifact_index.py
+import os
+import json
+import base64
+import logging
+import sqlite3
+from datetime import datetime
+
+from app.common.db import db_pool
+from app.common import search_index
+from app.common.code_fences import language_for_path
+
+LIST_CODE_DEFAULT_LIMIT = 100
+LIST_CODE_MAX_LIMIT = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    session_id TEXT NOT NULL,
+    path TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stage TEXT,
+    agent TEXT,
+    language TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (session_id, path)
+);
+CREATE INDEX IF NOT EXISTS idx_artifacts_recent ON artifacts (updated_at DESC, session_id, path);
+CREATE INDEX IF NOT EXISTS idx_artifacts_agent ON artifacts (agent, updated_at DESC);
+CREATE INDEX IF NOT EXISTS idx_artifacts_language ON artifacts (language, updated_at DESC);
+"""
+
+_schema_ready = False
+
+
+def _ensure_schema(conn: sqlite3.Connection):
+    global _schema_ready
+    if not _schema_ready:
+        conn.executescript(_SCHEMA)
+        _schema_ready = True
+
+
+def encode_cursor(row: dict) -> str:
+    raw = json.dumps([row["updated_at"], row["session_id"], row["path"]]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str):
+    """Retourne (updated_at, session_id, path) ; lève ValueError si le curseur est invalide."""
+    try:
+        updated_at, session_id, path = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return float(updated_at), str(session_id), str(path)
+    except Exception as e:
+        raise ValueError(f"Curseur invalide: {e}")
+
+
+def parse_timestamp(value: str):
+    """Date de filtre : timestamp Unix ou date ISO ("2024-05-01", "2024-05-01T12:00:00"). Lève ValueError."""
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def index_files(session_id: str, records: dict, contents: dict = None):
+    """
+    Met à jour l'index avec les entrées de manifeste {chemin: entrée} d'une session (appel
+    synchrone), et l'index de recherche avec les contenus fournis {chemin: contenu}.
+    """
+    rows = [
+        (session_id, path, entry["sha256"], entry["size"], entry.get("stage"), entry.get("agent"),
+         language_for_path(path), entry["updated_at"])
+        for path, entry in records.items()
+    ]
+    with db_pool.connection() as conn:
+        _ensure_schema(conn)
+        conn.executemany(
+            "INSERT OR REPLACE INTO artifacts (session_id, path, sha256, size, stage, agent, language, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+        for path, content in (contents or {}).items():
+            entry = records[path]
+            search_index.index_document(conn, search_index.SOURCE_ARTIFACT, search_index.artifact_key(session_id, path),
+                                        path, content, session_id=session_id, agent=entry.get("agent"),
+                                        language=language_for_path(path))
+
+
+def query_files(conn, session_id=None, agent=None, language=None, since=None, until=None,
+                cursor=None, limit=LIST_CODE_DEFAULT_LIMIT) -> tuple:
+    """
+    Page de fichiers, du plus récent au plus ancien, avec pagination par curseur
+    (keyset sur updated_at, session_id, path). Retourne (lignes, curseur suivant ou None).
+    """
+    _ensure_schema(conn)
+    clauses, params = [], []
+    for column, value in (("session_id", session_id), ("agent", agent), ("language", language)):
+        if value:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    if since is not None:
+        clauses.append("updated_at >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append("updated_at < ?")
+        params.append(until)
+    if cursor:
+        updated_at, cursor_session, cursor_path = decode_cursor(cursor)
+        clauses.append("(updated_at < ? OR (updated_at = ? AND (session_id > ? OR (session_id = ? AND path > ?))))")
+        params.extend([updated_at, updated_at, cursor_session, cursor_session, cursor_path])
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    limit = max(1, min(limit, LIST_CODE_MAX_LIMIT))
+    rows = conn.execute(
+        f"SELECT session_id, path, size, stage, agent, language, updated_at FROM artifacts {where} "
+        "ORDER BY updated_at DESC, session_id, path LIMIT ?",
+        params + [limit + 1]
+    ).fetchall()
+    rows = [dict(row) for row in rows]
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def is_empty(conn) -> bool:
+    _ensure_schema(conn)
+    return conn.execute("SELECT 1 FROM artifacts LIMIT 1").fetchone() is None
+
+
+def reindex(store) -> int:
+    """
+    Reconstruit l'index à partir des dossiers de sessions (manifeste s'il existe, sinon
+    métadonnées des fichiers). Sert aux sessions antérieures à l'index.
+    """
+    count = 0
+    if not os.path.isdir(store.root):
+        return 0
+    for session_id in os.listdir(store.root):
+        session_path = os.path.join(store.root, session_id)
+        if session_id.startswith(".") or not os.path.isdir(session_path):
+            continue
+        records = store.load_manifest(session_id)["files"]
+        if not records:
+            for root, dirs, files in os.walk(session_path):
+                dirs[:] = [d for d in dirs if not d.startswith(".")]
+                for file_name in files:
+                    if file_name.startswith(".") or file_name.endswith(".zip"):
+                        continue
+                    file_path = os.path.join(root, file_name)
+                    stat = os.stat(file_path)
+                    relative_path = os.path.relpath(file_path, session_path).replace(os.sep, "/")
+                    records[relative_path] = {"sha256": "", "size": stat.st_size, "updated_at": stat.st_mtime}
+        if records:
+            index_files(session_id, records)
+            count += len(records)
+    logging.info(f"[ArtifactIndex] Index reconstruit : {count} fichier(s)")
+    return count
@@ -0,0 +1,183 @@
+# app/common/artifact_store.py
+import os
+import json
+import time
+import shutil
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import tempfile
+
+from app.common import artifact_index
+
+# Dossier des fichiers générés (relatif au répertoire de lancement du serveur, comme auparavant)
+GENERATED_CODE_DIR = os.environ.get("GENERATED_CODE_DIR", "generated_code")
+# Sous-dossier des contenus dédupliqués, partagés entre sessions
+BLOB_DIR_NAME = ".store"
+MANIFEST_NAME = ".manifest.json"
+
+# mkstemp crée des fichiers en 0600 : on applique les droits habituels (0666 moins l'umask)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+FILE_MODE = 0o666 & ~_UMASK
+
+
+def atomic_write_bytes(path: str, data: bytes):
+    """Écrit `data` dans un fichier temporaire du même dossier puis le renomme : jamais de fichier à moitié écrit."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(temp_path, FILE_MODE)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def is_hidden_path(relative_path: str) -> bool:
+    """Vrai pour les chemins internes au stockage (dossiers ou fichiers commençant par un point)."""
+    return any(part.startswith(".") for part in relative_path.replace("\\", "/").split("/"))
+
+
+class ArtifactStore:
+    """
+    Stockage des fichiers générés par les workflows :
+    - écritures atomiques (fichier temporaire puis renommage) ;
+    - contenus adressés par leur SHA-256 dans `.store/`, un même contenu n'est stocké
+      qu'une fois et lié physiquement (hard link) dans chaque session qui le produit ;
+    - manifeste par session (`.manifest.json`) : taille, empreinte, étape et agent producteurs.
+    """
+
+    def __init__(self, root: str = GENERATED_CODE_DIR):
+        self.root = root
+        self.blob_dir = os.path.join(root, BLOB_DIR_NAME)
+        self._locks = {} # session_id -> [asyncio.Lock, utilisateurs] (mises à jour du manifeste), retiré une fois libre
+
+    def session_dir(self, session_id: str) -> str:
+        return os.path.join(self.root, session_id)
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def _manifest_path(self, session_id: str) -> str:
+        return os.path.join(self.session_dir(session_id), MANIFEST_NAME)
+
+    # --- Opérations synchrones (exécutées dans un thread) ---
+    def _put_blob(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        blob_path = self._blob_path(digest)
+        if not os.path.exists(blob_path):
+            atomic_write_bytes(blob_path, data)
+        return digest
+
+    def _link(self, blob_path: str, destination: str):
+        """Place le contenu à `destination` par un lien physique, ou une copie si le système ne le permet pas."""
+        directory = os.path.dirname(destination)
+        os.makedirs(directory, exist_ok=True)
+        temp_path = os.path.join(directory, f".tmp-{os.getpid()}-{time.monotonic_ns()}")
+        try:
+            os.link(blob_path, temp_path)
+        except OSError:
+            shutil.copyfile(blob_path, temp_path)
+        try:
+            os.replace(temp_path, destination)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def load_manifest(self, session_id: str) -> dict:
+        try:
+            with open(self._manifest_path(session_id), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"session_id": session_id, "files": {}}
+
+    def _write_files(self, session_id: str, files: dict, stage: str, agent: str) -> dict:
+        manifest = self.load_manifest(session_id)
+        written, contents = {}, {}
+        for relative_path, content in files.items():
+            relative_path = relative_path.replace("\\", "/")
+            data = content.encode("utf-8") if isinstance(content, str) else content
+            digest = hashlib.sha256(data).hexdigest()
+            destination = os.path.join(self.session_dir(session_id), relative_path)
+            previous = manifest["files"].get(relative_path)
+            if previous and previous["sha256"] == digest and os.path.exists(destination):
+                continue # Contenu inchangé : aucune écriture
+            self._put_blob(data)
+            self._link(self._blob_path(digest), destination)
+            written[relative_path] = manifest["files"][relative_path] = {
+                "sha256": digest,
+                "size": len(data),
+                "stage": stage,
+                "agent": agent,
+                "updated_at": time.time(),
+            }
+            contents[relative_path] = data
+        if written:
+            atomic_write_bytes(self._manifest_path(session_id), json.dumps(manifest, ensure_ascii=False, indent=1).encode("utf-8"))
+            try:
+                artifact_index.index_files(session_id, written, contents)
+            except sqlite3.Error as e:
+                # Les fichiers sont écrits : l'index sera reconstruit au besoin
+                logging.warning(f"[ArtifactStore] Indexation de {session_id} impossible: {e}")
+        return written
+
+    # --- API asynchrone ---
+    async def write_files(self, session_id: str, files: dict, stage: str = None, agent: str = None) -> dict:
+        """
+        Écrit un groupe de fichiers {chemin relatif: contenu} d'une session en une seule
+        passe (un thread, une mise à jour du manifeste). Retourne les entrées écrites.
+        """
+        if not files:
+            return {}
+        entry = self._locks.get(session_id)
+        if entry is None:
+            entry = self._locks[session_id] = [asyncio.Lock(), 0]
+        entry[1] += 1 # Détenteur et appels en attente : le verrou reste tant qu'il en reste un
+        try:
+            async with entry[0]:
+                return await asyncio.to_thread(self._write_files, session_id, dict(files), stage, agent)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[session_id]
+
+    async def write_file(self, session_id: str, relative_path: str, content, stage: str = None, agent: str = None) -> dict:
+        return await self.write_files(session_id, {relative_path: content}, stage, agent)
+
+    async def manifest(self, session_id: str) -> dict:
+        return await asyncio.to_thread(self.load_manifest, session_id)
+
+    def collect_garbage(self) -> int:
+        """
+        Supprime les contenus qui ne sont plus liés dans aucune session (un seul lien :
+        celui du stockage). Retourne le nombre de contenus supprimés.
+        """
+        removed = 0
+        if not os.path.isdir(self.blob_dir):
+            return 0
+        for directory, _, names in os.walk(self.blob_dir):
+            for name in names:
+                path = os.path.join(directory, name)
+                try:
+                    if os.stat(path).st_nlink <= 1:
+                        os.unlink(path)
+                        removed += 1
+                except OSError:
+                    continue
+        if removed:
+            logging.info(f"[ArtifactStore] {removed} contenu(s) orphelin(s) supprimé(s)")
+        return removed
+
+
+artifact_store = ArtifactStore()
@@ -0,0 +1,122 @@
+# app/common/checkpoints.py
+import json
+import time
+import sqlite3
+
+from app.common.db import run_db
+
+# Statuts d'un workflow. Seul "running" (interrompu : redémarrage du serveur, client
+# parti) est repris automatiquement à la reconnexion ; un workflow "failed" échouerait
+# probablement de nouveau et n'est repris que sur demande explicite du client.
+# Annulé explicitement, un workflow n'est plus repris.
+RUN_RUNNING = "running"
+RUN_COMPLETED = "completed"
+RUN_FAILED = "failed"
+RUN_CANCELLED = "cancelled"
+RESUMABLE_STATUSES = (RUN_RUNNING,)
+RETRYABLE_STATUSES = (RUN_RUNNING, RUN_FAILED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS workflow_runs (
+    session_id TEXT PRIMARY KEY,
+    prompt TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS workflow_checkpoints (
+    session_id TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    outputs TEXT NOT NULL,
+    messages TEXT NOT NULL,
+    completed_at REAL NOT NULL,
+    PRIMARY KEY (session_id, stage)
+);
+"""
+
+_schema_ready = False
+
+
+def _ensure_schema(conn: sqlite3.Connection):
+    global _schema_ready
+    if not _schema_ready:
+        conn.executescript(_SCHEMA)
+        _schema_ready = True
+
+
+def _start_run(conn, session_id, prompt):
+    _ensure_schema(conn)
+    now = time.time()
+    conn.execute("DELETE FROM workflow_checkpoints WHERE session_id = ?", (session_id,))
+    conn.execute(
+        "INSERT OR REPLACE INTO workflow_runs (session_id, prompt, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+        (session_id, prompt, RUN_RUNNING, now, now)
+    )
+
+
+def _set_status(conn, session_id, status):
+    _ensure_schema(conn)
+    conn.execute("UPDATE workflow_runs SET status = ?, updated_at = ? WHERE session_id = ?", (status, time.time(), session_id))
+
+
+def _save_stage(conn, session_id, stage, outputs, messages):
+    _ensure_schema(conn)
+    conn.execute(
+        "INSERT OR REPLACE INTO workflow_checkpoints (session_id, stage, outputs, messages, completed_at) VALUES (?, ?, ?, ?, ?)",
+        (session_id, stage, json.dumps(outputs, ensure_ascii=False), json.dumps(messages, ensure_ascii=False), time.time())
+    )
+    conn.execute("UPDATE workflow_runs SET updated_at = ? WHERE session_id = ?", (time.time(), session_id))
+
+
+def _get_run(conn, session_id):
+    _ensure_schema(conn)
+    row = conn.execute("SELECT session_id, prompt, status, created_at, updated_at FROM workflow_runs WHERE session_id = ?", (session_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def _load_stages(conn, session_id):
+    _ensure_schema(conn)
+    rows = conn.execute(
+        "SELECT stage, outputs, messages FROM workflow_checkpoints WHERE session_id = ? ORDER BY completed_at",
+        (session_id,)
+    ).fetchall()
+    return {row["stage"]: {"outputs": json.loads(row["outputs"]), "messages": json.loads(row["messages"])} for row in rows}
+
+
+class CheckpointStore:
+    """
+    Checkpoints durables des workflows dans la base de la plateforme : un enregistrement
+    par session dans `workflow_runs`, et la sortie de chaque étape terminée (clés de
+    project_context et messages à rejouer au client) dans `workflow_checkpoints`.
+    """
+
+    async def start_run(self, session_id: str, prompt: str):
+        """Démarre un nouveau workflow pour la session (efface les checkpoints précédents)."""
+        await run_db(_start_run, session_id, prompt)
+
+    async def save_stage(self, session_id: str, stage: str, outputs: dict, messages: list):
+        await run_db(_save_stage, session_id, stage, outputs, messages)
+
+    async def mark_running(self, session_id: str):
+        """Repasse un workflow repris (éventuellement en échec) à "running" : de nouveau repris automatiquement s'il est interrompu."""
+        await run_db(_set_status, session_id, RUN_RUNNING)
+
+    async def finish_run(self, session_id: str, status: str = RUN_COMPLETED):
+        await run_db(_set_status, session_id, status)
+
+    async def get_run(self, session_id: str):
+        return await run_db(_get_run, session_id)
+
+    async def get_resumable_run(self, session_id: str, retry_failed: bool = False):
+        """Retourne le workflow interrompu de la session (ou en échec, avec `retry_failed`), ou None."""
+        run = await self.get_run(session_id)
+        if run and run["status"] in (RETRYABLE_STATUSES if retry_failed else RESUMABLE_STATUSES):
+            return run
+        return None
+
+    async def load_stages(self, session_id: str) -> dict:
+        """Retourne {étape: {"outputs": ..., "messages": [...]}} pour les étapes terminées."""
+        return await run_db(_load_stages, session_id)
+
+
+checkpoint_store = CheckpointStore()
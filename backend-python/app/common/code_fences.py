@@ -0,0 +1,248 @@
+# app/common/code_fences.py
+import re
+import os
+
+# Alias de langages courants dans les réponses des modèles
+LANGUAGE_ALIASES = {
+    "py": "python",
+    "python3": "python",
+    "js": "javascript",
+    "ts": "typescript",
+    "htm": "html",
+    "sh": "bash",
+    "shell": "bash",
+    "yml": "yaml",
+    "dockerfile": "docker",
+}
+
+# Extension de fichier -> langage (mêmes noms que les blocs de code normalisés)
+EXTENSION_LANGUAGES = {
+    ".py": "python",
+    ".js": "javascript",
+    ".jsx": "jsx",
+    ".ts": "typescript",
+    ".tsx": "tsx",
+    ".html": "html",
+    ".htm": "html",
+    ".css": "css",
+    ".sql": "sql",
+    ".md": "markdown",
+    ".json": "json",
+    ".yml": "yaml",
+    ".yaml": "yaml",
+    ".sh": "bash",
+    ".toml": "toml",
+}
+
+# Nom de fichier plausible : "main.py", "src/App.jsx", "Dockerfile"
+FILENAME_RE = re.compile(r"^(?:[\w.\-]+/)*(?:[\w\-]+\.[A-Za-z0-9]{1,8}|Dockerfile|Makefile|Procfile)$")
+# Nom de fichier annoncé sur la ligne précédant le bloc : "**index.html**", "### `main.py`", "Fichier : style.css"
+HEADING_FILENAME_RE = re.compile(r"[`*_\s:#(]*((?:[\w.\-]+/)*(?:[\w\-]+\.[A-Za-z0-9]{1,8}|Dockerfile|Makefile|Procfile))[`*_\s:)]*$")
+# Commentaire de nom de fichier en première ligne du code : "# main.py", "// App.jsx", "<!-- index.html -->"
+COMMENT_FILENAME_RE = re.compile(r"^\s*(?:#|//|/\*|<!--|--)\s*(?:(?:file|fichier)\s*:\s*)?([\w./\-]+)\s*(?:\*/|-->)?\s*$", re.IGNORECASE)
+
+
+def normalize_language(language: str) -> str:
+    language = (language or "").strip().lower()
+    return LANGUAGE_ALIASES.get(language, language)
+
+
+def language_for_path(path: str) -> str:
+    """Langage d'un fichier d'après son extension ("" si inconnu)."""
+    name = os.path.basename(path)
+    if name == "Dockerfile":
+        return "docker"
+    return EXTENSION_LANGUAGES.get(os.path.splitext(name)[1].lower(), "")
+
+
+def _filename_from_info(info: str):
+    """Nom de fichier dans la ligne d'ouverture : "python main.py", "python:main.py", "python title=main.py"."""
+    for token in re.split(r"[\s:]+", info)[1:]:
+        token = token.split("=", 1)[-1].strip("\"'")
+        if FILENAME_RE.match(token):
+            return token
+    return None
+
+
+class CodeBlock:
+    """Bloc de code Markdown et sa position dans le texte source."""
+
+    __slots__ = ("language", "filename", "info", "code", "start", "end", "code_start", "code_end", "closed")
+
+    def __init__(self, language: str, info: str, start: int, code_start: int, filename: str = None):
+        self.language = language
+        self.info = info # Ligne d'ouverture complète, sans les ```
+        self.filename = filename
+        self.code = ""
+        self.start = start # Début de la ligne d'ouverture
+        self.code_start = code_start
+        self.code_end = code_start
+        self.end = code_start # Fin de la ligne de fermeture
+        self.closed = False
+
+    def to_dict(self) -> dict:
+        return {
+            "language": self.language,
+            "filename": self.filename,
+            "start": self.start,
+            "end": self.end,
+            "code_start": self.code_start,
+            "code_end": self.code_end,
+            "closed": self.closed,
+        }
+
+    def __repr__(self):
+        return f"CodeBlock({self.language!r}, {self.filename!r}, {self.start}:{self.end})"
+
+
+class FenceParser:
+    """
+    Analyseur incrémental des blocs de code Markdown : le texte est fourni par
+    fragments (`feed`, par exemple les tokens streamés d'un agent) et n'est parcouru
+    qu'une fois, ligne par ligne. Chaque bloc terminé est retourné dès sa fermeture.
+    """
+
+    def __init__(self):
+        self.blocks = []
+        self._pending = "" # Ligne en cours, pas encore terminée par un saut de ligne
+        self._offset = 0 # Position dans le texte du début de `_pending`
+        self._previous_line = "" # Dernière ligne non vide hors bloc
+        self._current = None
+        self._fence = ""
+        self._code_lines = []
+
+    def feed(self, text: str) -> list:
+        """Ajoute un fragment de texte ; retourne les blocs fermés par ce fragment."""
+        completed = []
+        self._pending += text
+        while True:
+            newline = self._pending.find("\n")
+            if newline < 0:
+                break
+            line = self._pending[:newline]
+            self._pending = self._pending[newline + 1:]
+            block = self._process_line(line, self._offset, self._offset + newline + 1)
+            self._offset += newline + 1
+            if block is not None:
+                completed.append(block)
+        return completed
+
+    def close(self) -> list:
+        """Termine l'analyse (fin du texte) ; retourne les blocs fermés à cette occasion."""
+        completed = []
+        if self._pending:
+            line, self._pending = self._pending, ""
+            block = self._process_line(line, self._offset, self._offset + len(line))
+            self._offset += len(line)
+            if block is not None:
+                completed.append(block)
+        if self._current is not None:
+            # Bloc jamais fermé (réponse tronquée) : on le garde tel quel
+            self._finish(self._offset, self._offset, closed=False)
+        return completed
+
+    def _process_line(self, line: str, line_start: int, line_end: int):
+        stripped = line.strip()
+        if self._current is None:
+            if stripped.startswith("```"): # Quelle que soit l'indentation (blocs dans des listes, réponses indentées)
+                info = stripped.lstrip("`").strip()
+                fence = stripped[:len(stripped) - len(stripped.lstrip("`"))]
+                language = normalize_language(info.split()[0].split(":")[0]) if info else ""
+                filename = _filename_from_info(info)
+                if filename is None:
+                    match = HEADING_FILENAME_RE.search(self._previous_line)
+                    filename = match.group(1) if match else None
+                self._current = CodeBlock(language, info, line_start, line_end, filename)
+                self._fence = fence
+                self._code_lines = []
+            elif stripped:
+                self._previous_line = stripped
+            return None
+
+        if stripped.startswith(self._fence) and not stripped.lstrip("`"):
+            return self._finish(line_start, line_end, closed=True)
+        code = line.rstrip()
+        trailing = len(code) - len(code.rstrip("`"))
+        if trailing >= len(self._fence) and code.rstrip("`").strip():
+            # Fermeture collée à la dernière ligne de code : "print(3)```"
+            code = code[:-trailing]
+            self._add_code_line(code)
+            return self._finish(line_start + len(code), line_end, closed=True)
+        self._add_code_line(line)
+        return None
+
+    def _add_code_line(self, line: str):
+        if not self._code_lines and self._current.filename is None:
+            match = COMMENT_FILENAME_RE.match(line)
+            if match and FILENAME_RE.match(match.group(1)):
+                self._current.filename = match.group(1)
+        self._code_lines.append(line)
+
+    def _finish(self, code_end: int, end: int, closed: bool):
+        block = self._current
+        block.code = "\n".join(self._code_lines).strip()
+        block.code_end = code_end
+        block.end = end
+        block.closed = closed
+        self.blocks.append(block)
+        self._current = None
+        self._code_lines = []
+        self._previous_line = ""
+        return block
+
+
+def parse_code_blocks(text: str) -> list:
+    """Retourne tous les blocs de code du texte, dans l'ordre, en un seul parcours."""
+    parser = FenceParser()
+    parser.feed(text)
+    parser.close()
+    return parser.blocks
+
+
+class CodeBlockIndex:
+    """Index des blocs de code d'une sortie d'agent, par langage et par nom de fichier."""
+
+    def __init__(self, blocks: list = None):
+        self.blocks = []
+        self.by_language = {}
+        self.by_filename = {}
+        for block in blocks or []:
+            self.add(block)
+
+    @classmethod
+    def from_text(cls, text: str):
+        return cls(parse_code_blocks(text))
+
+    def add(self, block: CodeBlock):
+        self.blocks.append(block)
+        self.by_language.setdefault(block.language, []).append(block)
+        if block.filename:
+            self.by_filename.setdefault(block.filename, block)
+
+    def first(self, *languages) -> str:
+        """Code du premier bloc du premier langage présent parmi `languages`, ou ""."""
+        for language in languages:
+            blocks = self.by_language.get(normalize_language(language))
+            if blocks:
+                return blocks[0].code
+        return ""
+
+    def first_block(self, *languages):
+        for language in languages:
+            blocks = self.by_language.get(normalize_language(language))
+            if blocks:
+                return blocks[0]
+        return None
+
+    def named_blocks(self) -> list:
+        """Blocs dont le nom de fichier a pu être déterminé."""
+        return [block for block in self.blocks if block.filename]
+
+    def __len__(self):
+        return len(self.blocks)
+
+
+def safe_filename(filename: str) -> str:
+    """Chemin relatif sûr pour un nom de fichier proposé par un modèle (pas de '..' ni de chemin absolu)."""
+    parts = [part for part in filename.replace("\\", "/").split("/") if part not in ("", ".", "..")]
+    return os.path.join(*parts) if parts else ""
@@ -0,0 +1,206 @@
+# app/common/context_budget.py
+import os
+import re
+import hashlib
+import logging
+from collections import OrderedDict
+
+from app.common.code_fences import parse_code_blocks
+
+# Estimation grossière : ~4 caractères par token pour les modèles utilisés
+CHARS_PER_TOKEN = 4
+
+# Budget de contexte (en tokens) par étape du workflow, pour l'ensemble des sections injectées
+DEFAULT_CONTEXT_BUDGET = int(os.environ.get("WORKFLOW_CONTEXT_BUDGET", "3000"))
+STAGE_CONTEXT_BUDGETS = {
+    "architecture": 1500,
+    "design": 2500,
+    "content": 2500,
+    "database": 2500,
+    "backend_coding": 3500,
+    "frontend_coding": 4000,
+    "critique": 5000,
+    "optimization": 6000,
+    "devops": 2000,
+    "translation": 1500,
+}
+
+# En dessous de cette fraction du budget, un squelette ou résumé perd trop d'information :
+# on garde plutôt le début et la fin du texte
+MIN_COMPACTION_FILL = float(os.environ.get("CONTEXT_MIN_COMPACTION_FILL", "0.5"))
+
+# Lignes conservées dans un squelette de code : imports, signatures, routes, sélecteurs, balises structurantes
+SKELETON_LINE_RE = re.compile(
+    r"^\s*("
+    r"(from\s+\S+\s+)?import\s|def\s|async\s+def\s|class\s|@|"            # Python
+    r"export\s|function\s|const\s+\w+\s*=\s*(async\s*)?\(|interface\s|type\s+\w+\s*=|"  # JS / TS
+    r"CREATE\s|ALTER\s|"                                                  # SQL
+    r"<(html|head|body|header|nav|main|section|article|aside|footer|form|template)\b|"  # HTML
+    r"[.#]?[\w\-\[\]=\"':, >*]+\s*\{\s*$"                                 # CSS
+    r")",
+    re.IGNORECASE,
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Estime le nombre de tokens d'un texte."""
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Tronque un texte à environ `max_tokens` tokens, avec un marqueur explicite."""
+    max_chars = max(0, max_tokens * CHARS_PER_TOKEN)
+    if len(text) <= max_chars:
+        return text
+    marker = "\n[... tronqué ...]"
+    return text[:max(0, max_chars - len(marker))] + marker
+
+
+def truncate_head_tail(text: str, max_tokens: int) -> str:
+    """Garde le début et la fin d'un texte (2/3 - 1/3) dans `max_tokens` tokens, avec un marqueur explicite."""
+    max_chars = max(0, max_tokens * CHARS_PER_TOKEN)
+    if len(text) <= max_chars:
+        return text
+    marker = "\n[... tronqué ...]\n"
+    kept = max(0, max_chars - len(marker))
+    head = kept * 2 // 3
+    tail = kept - head
+    return text[:head] + marker + (text[-tail:] if tail else "")
+
+
+def looks_like_code(text: str) -> bool:
+    """Vrai si le texte contient des blocs de code Markdown."""
+    return "```" in text
+
+
+def code_skeleton(text: str) -> str:
+    """
+    Réduit une sortie contenant du code à son squelette : titres Markdown hors code,
+    puis pour chaque bloc, les lignes d'import, signatures, routes, sélecteurs CSS
+    et balises HTML structurantes.
+    """
+    lines = []
+    last_end = 0
+    for block in parse_code_blocks(text):
+        for line in text[last_end:block.start].splitlines():
+            if line.lstrip().startswith("#"):
+                lines.append(line)
+        lines.append(f"```{block.info}")
+        lines.extend(line for line in block.code.splitlines() if SKELETON_LINE_RE.match(line))
+        lines.append("```")
+        last_end = block.end
+    lines.extend(line for line in text[last_end:].splitlines() if line.lstrip().startswith("#"))
+    return "\n".join(lines)
+
+
+def extractive_summary(text: str, max_tokens: int) -> str:
+    """
+    Résumé extractif : titres, puces et première phrase de chaque paragraphe,
+    dans l'ordre du texte, jusqu'à épuisement du budget.
+    """
+    budget_chars = max_tokens * CHARS_PER_TOKEN
+    kept = []
+    used = 0
+    for paragraph in re.split(r"\n\s*\n", text):
+        for index, line in enumerate(paragraph.strip().splitlines()):
+            stripped = line.strip()
+            if not stripped:
+                continue
+            if stripped.startswith(("#", "-", "*", "•")) or re.match(r"^\d+[.)]\s", stripped):
+                candidate = stripped
+            elif index == 0:
+                candidate = re.split(r"(?<=[.!?])\s", stripped, maxsplit=1)[0]
+            else:
+                continue
+            if used + len(candidate) + 1 > budget_chars:
+                return "\n".join(kept)
+            kept.append(candidate)
+            used += len(candidate) + 1
+    return "\n".join(kept)
+
+
+class ContextBudgeter:
+    """
+    Fait tenir les sections de contexte injectées dans un prompt dans le budget
+    de tokens de l'étape. Les petites sections sont gardées intactes ; les plus
+    grosses sont remplacées par un squelette de code ou un résumé extractif
+    (mis en cache), puis tronquées en dernier recours.
+    """
+
+    def __init__(self, budgets: dict = None, default_budget: int = DEFAULT_CONTEXT_BUDGET, cache_entries: int = 512):
+        self.budgets = dict(STAGE_CONTEXT_BUDGETS if budgets is None else budgets)
+        self.default_budget = default_budget
+        self.cache_entries = cache_entries
+        self._cache = OrderedDict()
+
+    def budget_for(self, stage: str) -> int:
+        return self.budgets.get(stage, self.default_budget)
+
+    def _allocate(self, sizes: dict, budget: int) -> dict:
+        """Répartition équitable (water-filling) du budget entre sections."""
+        allocation = {}
+        remaining = dict(sizes)
+        left = budget
+        while remaining:
+            share = left // len(remaining)
+            small = {name: size for name, size in remaining.items() if size <= share}
+            if not small:
+                for name in remaining:
+                    allocation[name] = share
+                break
+            for name, size in small.items():
+                allocation[name] = size
+                left -= size
+                del remaining[name]
+        return allocation
+
+    def compact(self, text: str, max_tokens: int) -> str:
+        """Réduit un texte à `max_tokens` tokens au plus (résultat mis en cache)."""
+        if estimate_tokens(text) <= max_tokens:
+            return text
+        key = (hashlib.sha1(text.encode("utf-8")).hexdigest(), max_tokens)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        if looks_like_code(text):
+            compacted = code_skeleton(text)
+        else:
+            compacted = extractive_summary(text, max_tokens)
+        if estimate_tokens(compacted) < max_tokens * MIN_COMPACTION_FILL:
+            # Squelette vide ou bien plus petit que le budget : début et fin du texte d'origine
+            compacted = truncate_head_tail(text, max_tokens)
+        else:
+            compacted = truncate_to_tokens(compacted, max_tokens)
+
+        self._cache[key] = compacted
+        while len(self._cache) > self.cache_entries:
+            self._cache.popitem(last=False)
+        return compacted
+
+    def fit(self, stage: str, **sections) -> dict:
+        """Retourne les sections, compactées si nécessaire pour tenir dans le budget de l'étape."""
+        budget = self.budget_for(stage)
+        sizes = {name: estimate_tokens(text or "") for name, text in sections.items()}
+        total = sum(sizes.values())
+        if total <= budget:
+            return {name: text or "" for name, text in sections.items()}
+
+        # Sections traitées de la plus petite à la plus grosse : ce qu'une section compactée
+        # n'utilise pas de sa part est redistribué aux suivantes
+        fitted = {}
+        remaining = dict(sizes)
+        left = budget
+        for name in sorted(sizes, key=sizes.get):
+            share = self._allocate(remaining, left)[name]
+            fitted[name] = self.compact(sections[name] or "", share)
+            left = max(0, left - estimate_tokens(fitted[name]))
+            del remaining[name]
+        fitted = {name: fitted[name] for name in sections}
+        logging.info(f"[Context] Étape {stage}: {total} → {sum(estimate_tokens(t) for t in fitted.values())} tokens (budget {budget})")
+        return fitted
+
+
+context_budgeter = ContextBudgeter()
@@ -0,0 +1,101 @@
+# app/common/db.py
+import os
+import queue
+import asyncio
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Base SQLite de la plateforme (projets, fichiers, exécutions, checkpoints de workflow)
+PLATFORM_DB = os.environ.get("PLATFORM_DB", os.path.join(BACKEND_ROOT, "collaborative_platform.db"))
+# Connexions ouvertes en permanence (une par requête SQLite simultanée)
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "4"))
+# Requêtes préparées conservées par connexion (cache du module sqlite3)
+DB_STATEMENT_CACHE = 256
+
+
+def connect(db_path: str = None) -> sqlite3.Connection:
+    """Ouvre une connexion à la base de la plateforme."""
+    conn = sqlite3.connect(db_path or PLATFORM_DB, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+class ConnectionPool:
+    """
+    Connexions SQLite ouvertes une fois et réutilisées d'un appel à l'autre : pas
+    d'ouverture de fichier par requête, et chaque connexion garde ses requêtes
+    préparées en cache. Mode WAL : les lectures ne sont pas bloquées par une écriture.
+    Une connexion n'est utilisée que par un thread à la fois.
+    """
+
+    def __init__(self, db_path: str = None, size: int = DB_POOL_SIZE):
+        self.db_path = db_path or PLATFORM_DB
+        self.size = size
+        self._idle = queue.LifoQueue() # Dernière connexion rendue en premier : cache plus chaud
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False, cached_statements=DB_STATEMENT_CACHE)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL") # Sûr en WAL : seule une coupure de courant peut perdre la dernière transaction
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self.size
+            if create:
+                self._created += 1
+        if not create:
+            return self._idle.get() # Toutes les connexions sont prises : on attend la première rendue
+        try:
+            return self._open()
+        except BaseException:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    @contextmanager
+    def connection(self):
+        """Connexion du pool ; la transaction est validée en sortie, annulée en cas d'exception."""
+        conn = self._acquire()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+db_pool = ConnectionPool()
+
+
+async def run_db(fn, *args):
+    """
+    Exécute `fn(conn, *args)` dans un thread avec une connexion du pool, puis valide
+    la transaction. Évite de bloquer la boucle asyncio avec des I/O SQLite.
+    """
+    def _run():
+        with db_pool.connection() as conn:
+            return fn(conn, *args)
+    return await asyncio.to_thread(_run)
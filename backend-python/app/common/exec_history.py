@@ -0,0 +1,305 @@
+# app/common/exec_history.py
+import re
+import os
+import ast
+import uuid
+import asyncio
+import hashlib
+import logging
+import builtins
+import sqlite3
+from datetime import datetime, timezone
+from collections import OrderedDict
+
+from app.common.db import run_db
+
+# Écriture différée de l'historique : un lot par transaction
+EXEC_HISTORY_BATCH = int(os.environ.get("EXEC_HISTORY_BATCH", "100"))
+EXEC_HISTORY_FLUSH_INTERVAL = float(os.environ.get("EXEC_HISTORY_FLUSH_INTERVAL", "0.5"))
+# Exécutions en attente d'écriture ; au-delà (base bloquée), les plus récentes ne sont pas historisées
+EXEC_HISTORY_MAX_PENDING = int(os.environ.get("EXEC_HISTORY_MAX_PENDING", "10000"))
+# Sortie conservée par exécution dans l'historique (caractères par flux)
+EXEC_HISTORY_MAX_OUTPUT = int(os.environ.get("EXEC_HISTORY_MAX_OUTPUT", str(64 * 1024)))
+EXEC_CACHE_ENABLED = os.environ.get("EXEC_CACHE_ENABLED", "1") == "1"
+EXEC_CACHE_SIZE = int(os.environ.get("EXEC_CACHE_SIZE", "512"))
+EXEC_CACHE_MAX_BYTES = int(os.environ.get("EXEC_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+EXECUTIONS_DEFAULT_LIMIT = 50
+EXECUTIONS_MAX_LIMIT = 500
+
+STATUS_SUCCESS = "success"
+STATUS_ERROR = "error"
+STATUS_TIMEOUT = "timeout"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS executions (
+    id TEXT PRIMARY KEY,
+    code TEXT NOT NULL,
+    output TEXT,
+    errors TEXT,
+    duration INTEGER,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    language TEXT,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_executions_timestamp ON executions (timestamp DESC);
+"""
+
+_schema_ready = False
+
+
+def _ensure_schema(conn: sqlite3.Connection):
+    global _schema_ready
+    if not _schema_ready:
+        conn.executescript(_SCHEMA)
+        _schema_ready = True
+
+
+# --- Déterminisme des extraits ---
+
+# Modules dont le résultat dépend de l'horloge, du hasard, du système ou du réseau
+NONDETERMINISTIC_MODULES = {
+    "time", "datetime", "calendar", "random", "secrets", "uuid", "os", "sys", "io", "pathlib",
+    "shutil", "glob", "tempfile", "fileinput", "subprocess", "socket", "ssl", "select", "selectors",
+    "signal", "threading", "multiprocessing", "concurrent", "asyncio", "urllib", "http", "requests",
+    "httpx", "ftplib", "smtplib", "sqlite3", "dbm", "shelve", "platform", "getpass", "pwd", "grp",
+    "resource", "ctypes", "gc", "tracemalloc", "timeit", "sched", "zoneinfo", "webbrowser", "importlib",
+    "numpy", "pandas", "builtins", "inspect",
+}
+# Fonctions natives non déterministes ou aux effets de bord hors du processus
+NONDETERMINISTIC_BUILTINS = {
+    "open", "input", "id", "hash", "set", "frozenset", "eval", "exec", "compile", "__import__",
+    "breakpoint", "globals", "locals", "vars", "memoryview", "setattr", "delattr", "__builtins__",
+}
+# JavaScript : horloge, hasard, processus, modules et minuteries
+JS_NONDETERMINISTIC_RE = re.compile(
+    r"\b(?:Date|Math\s*\.\s*random|performance|process|require|import|crypto|fetch|XMLHttpRequest|WebSocket|"
+    r"setTimeout|setInterval|setImmediate|queueMicrotask|eval|Function|globalThis|Intl|WeakRef|FinalizationRegistry)\b"
+)
+# JavaScript : modification d'un objet global ou intrinsèque (JSON.stringify = ..., prototypes...)
+_JS_GLOBAL_OBJECTS = (r"JSON|Object|Array|String|Number|Boolean|Symbol|BigInt|Math|Promise|RegExp|Error|Map|Set|"
+                      r"WeakMap|WeakSet|Reflect|Proxy|console|Buffer|global|window|self")
+JS_GLOBAL_MUTATION_RE = re.compile(
+    r"\b(?:prototype|__proto__|defineProperty|defineProperties|setPrototypeOf|Proxy|Reflect)\b"
+    rf"|\b(?:{_JS_GLOBAL_OBJECTS})\s*(?:\??\.\s*[\w$]+|\[[^\]]*\])+\s*(?:[-+*/%&|^]|\*\*|<<|>>>?|&&|\|\||\?\?)?=(?!=)"
+    rf"|\bdelete\s+(?:{_JS_GLOBAL_OBJECTS})\b"
+)
+# Adresse mémoire dans une sortie (repr par défaut d'un objet) : varie d'une exécution à l'autre
+MEMORY_ADDRESS_RE = re.compile(r" at 0x[0-9a-fA-F]+")
+
+
+def _assignment_targets(node) -> list:
+    if isinstance(node, ast.Assign):
+        return node.targets
+    if isinstance(node, (ast.AugAssign, ast.AnnAssign)):
+        return [node.target]
+    if isinstance(node, ast.Delete):
+        return node.targets
+    return []
+
+
+def _base_name(node):
+    """Nom à la racine de `a.b[c].d`, ou None."""
+    while isinstance(node, (ast.Attribute, ast.Subscript)):
+        node = node.value
+    return node.id if isinstance(node, ast.Name) else None
+
+
+def _python_is_deterministic(code: str) -> bool:
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return False
+    # Noms de modules importés : modifier leurs attributs change l'état de l'interpréteur
+    imported = {alias.asname or alias.name.split(".")[0]
+                for node in ast.walk(tree) if isinstance(node, (ast.Import, ast.ImportFrom))
+                for alias in node.names}
+    shared = imported | set(dir(builtins))
+    for node in ast.walk(tree):
+        for target in _assignment_targets(node):
+            if isinstance(target, (ast.Attribute, ast.Subscript)) and _base_name(target) in shared:
+                return False # json.dumps = ..., int.__add__ = ..., os.environ["X"] = ...
+        if isinstance(node, ast.Import):
+            if any(alias.name.split(".")[0] in NONDETERMINISTIC_MODULES for alias in node.names):
+                return False
+        elif isinstance(node, ast.ImportFrom):
+            if node.level or (node.module or "").split(".")[0] in NONDETERMINISTIC_MODULES:
+                return False
+        elif isinstance(node, ast.Name) and node.id in NONDETERMINISTIC_BUILTINS:
+            return False
+        elif isinstance(node, (ast.Set, ast.SetComp)):
+            return False # Ordre d'itération des chaînes dépendant de PYTHONHASHSEED
+        elif isinstance(node, (ast.Await, ast.AsyncFor, ast.AsyncWith, ast.Global)):
+            return False
+    return True
+
+
+def is_deterministic(code: str, language: str) -> bool:
+    """
+    Vrai si l'extrait ne fait appel ni à l'horloge, ni au hasard, ni aux E/S, et ne
+    modifie ni modules ni objets globaux : son résultat peut être servi depuis le
+    cache. Analyse prudente (faux en cas de doute).
+    """
+    if language == "python":
+        return _python_is_deterministic(code)
+    if language in ("javascript", "typescript"):
+        return JS_NONDETERMINISTIC_RE.search(code) is None and JS_GLOBAL_MUTATION_RE.search(code) is None
+    return False
+
+
+# --- Cache des résultats ---
+
+class ExecutionCache:
+    """Cache LRU des résultats d'extraits déterministes, par (langage, SHA-256 du code), borné en entrées et en taille."""
+
+    def __init__(self, max_entries: int = EXEC_CACHE_SIZE, max_bytes: int = EXEC_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict() # clé -> (returncode, stdout, stderr, taille)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(code: str, language: str) -> tuple:
+        return language, hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+    def get(self, code: str, language: str):
+        """Retourne (returncode, stdout, stderr) ou None."""
+        if not EXEC_CACHE_ENABLED:
+            return None
+        key = self.key(code, language)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[:3]
+
+    def put(self, code: str, language: str, returncode: int, stdout: str, stderr: str):
+        """Mémorise un résultat complet (ni tronqué ni interrompu) d'un extrait déterministe."""
+        if not EXEC_CACHE_ENABLED or not is_deterministic(code, language):
+            return
+        if MEMORY_ADDRESS_RE.search(stdout) or MEMORY_ADDRESS_RE.search(stderr):
+            return
+        size = len(code) + len(stdout) + len(stderr)
+        if size > self.max_bytes // 4:
+            return
+        key = self.key(code, language)
+        previous = self._entries.pop(key, None)
+        if previous:
+            self.size -= previous[3]
+        self._entries[key] = (returncode, stdout, stderr, size)
+        self.size += size
+        while self._entries and (len(self._entries) > self.max_entries or self.size > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= evicted[3]
+
+
+# --- Historique (table executions) ---
+
+def _insert_executions(conn, rows: list):
+    _ensure_schema(conn)
+    conn.executemany(
+        "INSERT OR IGNORE INTO executions (id, code, output, errors, duration, timestamp, language, status) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        rows
+    )
+
+
+def list_executions(conn, language: str = None, status: str = None, limit: int = EXECUTIONS_DEFAULT_LIMIT) -> list:
+    """Exécutions les plus récentes (format ExecutionResult du frontend)."""
+    _ensure_schema(conn)
+    clauses, params = [], []
+    for column, value in (("language", language), ("status", status)):
+        if value:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    rows = conn.execute(
+        f"SELECT id, code, output, errors, duration, timestamp, language, status FROM executions {where} "
+        "ORDER BY timestamp DESC, rowid DESC LIMIT ?",
+        params + [max(1, min(limit, EXECUTIONS_MAX_LIMIT))]
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+class ExecutionHistory:
+    """
+    Historique des exécutions à écriture différée : `record` ne fait qu'ajouter à une
+    file en mémoire ; une tâche de fond insère les exécutions par lots (jusqu'à
+    EXEC_HISTORY_BATCH, au plus tard après EXEC_HISTORY_FLUSH_INTERVAL secondes),
+    chaque lot dans une seule transaction.
+    """
+
+    def __init__(self, batch_size: int = EXEC_HISTORY_BATCH, flush_interval: float = EXEC_HISTORY_FLUSH_INTERVAL,
+                 max_pending: int = EXEC_HISTORY_MAX_PENDING):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._task = asyncio.create_task(self._writer())
+
+    def record(self, code: str, language: str, status: str, output: str = "", errors: str = "", duration: float = 0.0) -> str:
+        """Ajoute une exécution à l'historique (non bloquant). Retourne son identifiant."""
+        execution_id = str(uuid.uuid4())
+        if self._queue is None:
+            return execution_id
+        row = (
+            execution_id, code, output[:EXEC_HISTORY_MAX_OUTPUT], errors[:EXEC_HISTORY_MAX_OUTPUT],
+            int(duration * 1000), datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"), language, status
+        )
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logging.warning(f"[ExecHistory] File d'écriture pleine : {self.dropped} exécution(s) non historisée(s)")
+        return execution_id
+
+    async def _writer(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            row = await self._queue.get()
+            if row is None:
+                break
+            batch = [row]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    row = await asyncio.wait_for(self._queue.get(), timeout=max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    break
+                if row is None:
+                    stopping = True
+                    break
+                batch.append(row)
+            await self._write(batch)
+
+    async def _write(self, batch: list):
+        try:
+            await run_db(_insert_executions, batch)
+        except sqlite3.Error as e:
+            logging.warning(f"[ExecHistory] Écriture de {len(batch)} exécution(s) impossible: {e}")
+
+    async def stop(self):
+        """Écrit les exécutions en attente puis arrête la tâche d'écriture."""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        try:
+            await asyncio.wait_for(self._task, timeout=10)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+        self._task, self._queue = None, None
+
+
+execution_cache = ExecutionCache()
+execution_history = ExecutionHistory()
@@ -0,0 +1,239 @@
+# app/common/exec_pool.py
+import os
+import sys
+import json
+import shutil
+import asyncio
+import logging
+import tempfile
+
+WORKERS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "exec_workers")
+
+# Workers prêts à l'emploi par langage (processus déjà démarrés, interpréteur chargé)
+EXEC_POOL_SIZE = int(os.environ.get("EXEC_POOL_SIZE", "2"))
+# Exécutions simultanées maximum par langage (au-delà, les requêtes attendent un worker)
+EXEC_MAX_CONCURRENT = int(os.environ.get("EXEC_MAX_CONCURRENT", "4"))
+# Un worker est remplacé après ce nombre d'exécutions, même sans fuite d'état détectée
+EXEC_WORKER_MAX_RUNS = int(os.environ.get("EXEC_WORKER_MAX_RUNS", "50"))
+EXEC_TIMEOUT = float(os.environ.get("EXEC_TIMEOUT", "10"))
+# Taille maximale capturée par flux (stdout, stderr), en caractères
+EXEC_MAX_OUTPUT = int(os.environ.get("EXEC_MAX_OUTPUT", str(256 * 1024)))
+# Délai de démarrage d'un worker
+EXEC_WORKER_START_TIMEOUT = 10
+
+WORKER_COMMANDS = {
+    "python": [sys.executable, "-u", os.path.join(WORKERS_DIR, "python_worker.py")],
+    "javascript": ["node", os.path.join(WORKERS_DIR, "node_worker.js")],
+}
+
+
+class ExecutionOutcome:
+    """
+    Résultat d'une exécution (mêmes attributs que subprocess.CompletedProcess, plus les
+    indicateurs du pool). `clean` est faux si l'extrait a pu être influencé ou a laissé
+    un état dans le worker : son résultat ne doit pas être mis en cache.
+    """
+
+    def __init__(self, returncode: int, stdout: str = "", stderr: str = "", truncated: bool = False, timed_out: bool = False,
+                 clean: bool = True):
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.truncated = truncated
+        self.timed_out = timed_out
+        self.clean = clean
+
+
+class _Worker:
+    """Processus préchargé exécutant les extraits un par un (protocole JSON par ligne, voir exec_workers/)."""
+
+    def __init__(self, process: asyncio.subprocess.Process):
+        self.process = process
+        self.runs = 0
+
+    @property
+    def alive(self) -> bool:
+        return self.process.returncode is None
+
+    async def request(self, payload: dict, on_output=None) -> dict:
+        """Envoie une requête et retourne la réponse ; les fragments de sortie streamés sont passés à `on_output`."""
+        self.process.stdin.write((json.dumps(payload) + "\n").encode("utf-8"))
+        await self.process.stdin.drain()
+        while True:
+            line = await self.process.stdout.readline()
+            if not line:
+                raise ConnectionError(f"worker arrêté (code {await self.process.wait()})")
+            message = json.loads(line)
+            if "stream" not in message:
+                return message
+            if on_output is not None:
+                on_output(message["stream"], message["data"])
+
+    async def kill(self):
+        if self.alive:
+            try:
+                self.process.kill()
+            except ProcessLookupError:
+                pass
+        await self.process.wait()
+
+    async def close(self):
+        """Arrêt normal : fermeture de stdin, puis kill si le worker ne se termine pas."""
+        if self.alive:
+            try:
+                self.process.stdin.close()
+                await asyncio.wait_for(self.process.wait(), timeout=2)
+            except (asyncio.TimeoutError, OSError):
+                pass
+        await self.kill()
+
+
+class WarmProcessPool:
+    """
+    Pool de workers préchargés pour un langage : chaque extrait s'exécute dans un
+    processus déjà démarré au lieu d'un nouvel interpréteur. Un worker est remplacé
+    après EXEC_WORKER_MAX_RUNS exécutions, dès qu'il signale un état résiduel
+    (thread, dossier courant, globales...), et tué s'il dépasse le délai.
+    """
+
+    def __init__(self, language: str, command: list, size: int = EXEC_POOL_SIZE,
+                 max_concurrent: int = EXEC_MAX_CONCURRENT, max_runs: int = EXEC_WORKER_MAX_RUNS):
+        self.language = language
+        self.command = command
+        self.size = size
+        self.max_runs = max_runs
+        self._idle = []
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._refill_task = None
+        self._closed = False
+
+    async def _spawn(self) -> _Worker:
+        process = await asyncio.create_subprocess_exec(
+            *self.command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            cwd=tempfile.gettempdir(), # Exécute dans un répertoire temporaire isolé
+            limit=EXEC_MAX_OUTPUT * 8 + 4096, # Une réponse (stdout et stderr encodés en JSON) tient sur une ligne
+        )
+        worker = _Worker(process)
+        try:
+            ready = await asyncio.wait_for(process.stdout.readline(), timeout=EXEC_WORKER_START_TIMEOUT)
+            if not ready:
+                raise ConnectionError(f"le worker {self.language} s'est arrêté au démarrage")
+        except BaseException:
+            await worker.kill()
+            raise
+        return worker
+
+    def _schedule_refill(self):
+        if self._closed or (self._refill_task and not self._refill_task.done()):
+            return
+        self._refill_task = asyncio.create_task(self._refill())
+
+    async def _refill(self):
+        """Complète la réserve de workers prêts, en arrière-plan."""
+        while not self._closed and len(self._idle) < self.size:
+            try:
+                worker = await self._spawn()
+            except Exception as e:
+                logging.warning(f"[ExecPool] Démarrage d'un worker {self.language} impossible: {e}")
+                return
+            if self._closed or len(self._idle) >= self.size:
+                await worker.close()
+                return
+            self._idle.append(worker)
+
+    async def start(self):
+        await self._refill()
+
+    async def _acquire(self) -> _Worker:
+        while self._idle:
+            worker = self._idle.pop()
+            if worker.alive:
+                self._schedule_refill()
+                return worker
+        self._schedule_refill()
+        return await self._spawn() # Réserve vide : démarrage à froid
+
+    async def _release(self, worker: _Worker, reusable: bool):
+        if reusable and not self._closed and worker.alive and worker.runs < self.max_runs and len(self._idle) < self.size:
+            self._idle.append(worker)
+            return
+        if reusable:
+            await worker.close()
+        else:
+            await worker.kill() # Worker bloqué ou dans un état inconnu : pas d'arrêt propre
+        self._schedule_refill()
+
+    async def run(self, code: str, timeout: float = EXEC_TIMEOUT, max_output: int = EXEC_MAX_OUTPUT,
+                  on_output=None) -> ExecutionOutcome:
+        """
+        Exécute `code` dans un worker. Avec `on_output(flux, texte)`, la sortie est transmise
+        au fil de l'eau au lieu d'être retournée. Lève FileNotFoundError si l'interpréteur est introuvable.
+        """
+        async with self._slots:
+            worker = await self._acquire()
+            worker.runs += 1
+            try:
+                # Le worker applique lui-même le délai aux tâches asynchrones de l'extrait ;
+                # le délai côté serveur couvre le code bloquant (boucle infinie...).
+                payload = {"code": code, "timeout": timeout, "max_output": max_output, "stream": on_output is not None}
+                response = await asyncio.wait_for(worker.request(payload, on_output), timeout=timeout + 1)
+            except asyncio.TimeoutError:
+                await self._release(worker, reusable=False)
+                return ExecutionOutcome(returncode=-9, timed_out=True, clean=False)
+            except (ConnectionError, ValueError, OSError) as e:
+                # Worker arrêté par l'extrait (os._exit, signal...) ou réponse illisible
+                await self._release(worker, reusable=False)
+                return ExecutionOutcome(returncode=worker.process.returncode or 1, stderr=f"Processus d'exécution interrompu: {e}",
+                                        clean=False)
+            except BaseException:
+                await self._release(worker, reusable=False)
+                raise
+            # Un worker n'est réutilisé que s'il était propre : propre après l'extrait, il l'était avant
+            clean = not response.get("dirty") and not response.get("timed_out")
+            await self._release(worker, reusable=clean)
+            return ExecutionOutcome(
+                returncode=response["returncode"],
+                stdout=response["stdout"],
+                stderr=response["stderr"],
+                truncated=response.get("truncated", False),
+                timed_out=response.get("timed_out", False),
+                clean=clean,
+            )
+
+    async def close(self):
+        self._closed = True
+        if self._refill_task:
+            self._refill_task.cancel()
+        workers, self._idle = self._idle, []
+        await asyncio.gather(*(worker.close() for worker in workers), return_exceptions=True)
+
+
+class ExecutionPools:
+    """Pools par langage ; un langage dont l'interpréteur est absent n'a pas de pool."""
+
+    def __init__(self, commands: dict = WORKER_COMMANDS):
+        self.commands = commands
+        self.pools = {}
+
+    async def start(self):
+        for language, command in self.commands.items():
+            if shutil.which(command[0]) is None:
+                logging.warning(f"[ExecPool] '{command[0]}' introuvable : pas de pool {language}")
+                continue
+            pool = WarmProcessPool(language, command)
+            self.pools[language] = pool
+            await pool.start()
+        logging.info(f"[ExecPool] Pools prêts: {', '.join(self.pools) or 'aucun'}")
+
+    def get(self, language: str):
+        return self.pools.get(language)
+
+    async def stop(self):
+        pools, self.pools = list(self.pools.values()), {}
+        await asyncio.gather(*(pool.close() for pool in pools), return_exceptions=True)
+
+
+execution_pools = ExecutionPools()
@@ -0,0 +1,120 @@
+# app/common/exec_stream.py
+import os
+import codecs
+import asyncio
+from collections import deque
+
+# Sortie en attente d'envoi au client, par exécution (caractères) : au-delà, les plus
+# anciens fragments non envoyés sont abandonnés et remplacés par un marqueur
+EXEC_STREAM_BUFFER = int(os.environ.get("EXEC_STREAM_BUFFER", str(64 * 1024)))
+# Taille des lectures sur les pipes d'un processus
+EXEC_READ_CHUNK = 4096
+
+TRUNCATION_MARKER = "\n… [sortie tronquée]"
+
+
+def dropped_marker(count: int) -> str:
+    return f"\n… [{count} caractères omis] …\n"
+
+
+class OutputRing:
+    """
+    Tampon circulaire borné des fragments de sortie (flux, texte) en attente d'envoi.
+    `push` ne bloque jamais (la lecture des pipes n'attend pas un client lent) ; si le
+    client ne suit pas, les fragments les plus anciens sont abandonnés et comptés.
+    """
+
+    def __init__(self, capacity: int = EXEC_STREAM_BUFFER):
+        self.capacity = capacity
+        self.chunks = deque()
+        self.size = 0
+        self.dropped = 0
+        self.closed = False
+        self._ready = asyncio.Event()
+
+    def push(self, stream: str, text: str):
+        if not text or self.closed:
+            return
+        self.chunks.append((stream, text))
+        self.size += len(text)
+        while self.size > self.capacity:
+            oldest_stream, oldest = self.chunks.popleft()
+            excess = self.size - self.capacity
+            if len(oldest) > excess:
+                # On garde la fin du fragment le plus ancien
+                self.chunks.appendleft((oldest_stream, oldest[excess:]))
+                self.size -= excess
+                self.dropped += excess
+            else:
+                self.size -= len(oldest)
+                self.dropped += len(oldest)
+        self._ready.set()
+
+    def close(self):
+        """Plus aucun fragment : `drain` retourne ce qui reste puis une liste vide."""
+        self.closed = True
+        self._ready.set()
+
+    async def drain(self) -> tuple:
+        """
+        Attend des fragments et les retire tous, en fusionnant les fragments consécutifs
+        d'un même flux. Retourne (fragments, nombre de caractères abandonnés depuis le
+        dernier appel) ; fragments vide quand le tampon est fermé et vide.
+        """
+        while not self.chunks and not self.closed:
+            self._ready.clear()
+            await self._ready.wait()
+        merged = []
+        for stream, text in self.chunks:
+            if merged and merged[-1][0] == stream:
+                merged[-1][1].append(text)
+            else:
+                merged.append((stream, [text]))
+        self.chunks.clear()
+        self.size = 0
+        dropped, self.dropped = self.dropped, 0
+        return [(stream, "".join(parts)) for stream, parts in merged], dropped
+
+
+async def pump_output(reader: asyncio.StreamReader, stream: str, sink, max_output: int) -> bool:
+    """
+    Lit un pipe par morceaux et transmet le texte décodé à `sink(stream, texte)` jusqu'à
+    `max_output` caractères ; la suite est lue et ignorée (le processus n'est pas bloqué
+    sur un pipe plein). Retourne True si la sortie a été tronquée.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    sent = 0
+    truncated = False
+    while True:
+        data = await reader.read(EXEC_READ_CHUNK)
+        text = decoder.decode(data, final=not data)
+        if text:
+            part = text[:max(0, max_output - sent)]
+            if part:
+                sink(stream, part)
+                sent += len(part)
+            truncated = truncated or len(part) < len(text)
+        if not data:
+            return truncated
+
+
+class OutputCapture:
+    """Copie bornée (`limit` caractères par flux) de la sortie transmise au fil de l'eau, pour l'historique."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.parts = {"stdout": [], "stderr": []}
+        self.sizes = {"stdout": 0, "stderr": 0}
+        self.truncated = False
+
+    def push(self, stream: str, text: str):
+        if stream not in self.parts:
+            return
+        part = text[:max(0, self.limit - self.sizes[stream])]
+        self.truncated = self.truncated or len(part) < len(text)
+        if part:
+            self.parts[stream].append(part)
+            self.sizes[stream] += len(part)
+
+    def text(self, stream: str) -> str:
+        return "".join(self.parts[stream])
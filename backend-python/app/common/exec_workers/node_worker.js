@@ -0,0 +1,286 @@
+// app/common/exec_workers/node_worker.js
+//
+// Worker Node.js préchargé du pool d'exécution (voir app/common/exec_pool.py).
+// Même protocole que python_worker.py : une requête JSON par ligne sur stdin
+//   {"code": "...", "max_output": 65536, "timeout": 10, "stream": false}
+// et une réponse JSON par ligne sur stdout
+//   {"returncode": 0, "stdout": "...", "stderr": "...", "truncated": false, "timed_out": false, "dirty": false}
+// Avec "stream": true, chaque écriture est transmise aussitôt ({"stream": "stdout", "data": "..."})
+// et la réponse finale ne reprend pas la sortie.
+//
+// Chaque extrait est compilé comme un module CommonJS neuf (équivalent de `node fichier.js`),
+// dans un contexte `vm` neuf : ses globales et ses objets intrinsèques (JSON, prototypes...)
+// ne sont pas ceux du worker. Le protocole n'utilise que des références prises au démarrage.
+// La réponse est envoyée quand les ressources ouvertes par l'extrait (timers, sockets...)
+// sont refermées ; `dirty` signale un état partagé modifié (globales et intrinsèques du
+// worker, process, modules chargés, variables d'environnement) ou des ressources encore actives.
+'use strict';
+
+const vm = require('vm');
+const path = require('path');
+const Module = require('module');
+const readline = require('readline');
+
+const stringify = JSON.stringify;
+const parse = JSON.parse;
+const protocolWrite = process.stdout.write.bind(process.stdout);
+const stdoutWrite = process.stdout.write;
+const stderrWrite = process.stderr.write;
+const ownWrite = new Set([process.stdout, process.stderr].filter((stream) => Object.hasOwn(stream, 'write')));
+
+function restoreWrite(stream, write) {
+  if (ownWrite.has(stream)) stream.write = write;
+  else delete stream.write; // Méthode héritée du prototype, comme au démarrage
+}
+
+function send(message) {
+  protocolWrite(stringify(message) + '\n');
+}
+
+class ExitSignal {
+  constructor(code) {
+    this.code = code;
+  }
+}
+
+function limitedWriter(name, limit, stream) {
+  const capture = { parts: [], size: 0, truncated: false };
+  capture.write = (chunk, encoding, callback) => {
+    const text = typeof chunk === 'string' ? chunk : Buffer.from(chunk).toString('utf8');
+    const part = text.slice(0, Math.max(0, limit - capture.size));
+    capture.truncated = capture.truncated || part.length < text.length;
+    capture.size += part.length;
+    if (part && stream) send({ stream: name, data: part });
+    else if (part) capture.parts.push(part);
+    const done = typeof encoding === 'function' ? encoding : callback;
+    if (typeof done === 'function') process.nextTick(done);
+    return true;
+  };
+  capture.value = () => capture.parts.join('');
+  return capture;
+}
+
+function formatError(error) {
+  // Erreurs créées dans le contexte de l'extrait : `instanceof Error` (du worker) est faux
+  const isError = error !== null && typeof error === 'object' && typeof error.stack === 'string';
+  if (isError) {
+    // Trace limitée au code de l'extrait, sans les frames du worker et de Node
+    const lines = error.stack.split('\n');
+    const end = lines.findIndex((line) => line.includes('node:internal/vm') || line.includes(__filename));
+    return `${(end > 0 ? lines.slice(0, end) : lines).join('\n')}\n`;
+  }
+  return `Uncaught ${typeof error === 'string' ? error : stringify(error)}\n`;
+}
+
+function activeResources() {
+  return process.getActiveResourcesInfo().length;
+}
+
+const realExit = process.exit;
+const cwd = process.cwd();
+
+// --- Empreinte de l'état partagé entre extraits ---
+const SHARED_NAMES = [
+  'Object', 'Function', 'Array', 'String', 'Number', 'Boolean', 'Symbol', 'BigInt', 'Promise', 'RegExp', 'Date',
+  'Error', 'TypeError', 'RangeError', 'SyntaxError', 'Map', 'Set', 'WeakMap', 'WeakSet', 'ArrayBuffer',
+  'Uint8Array', 'Buffer', 'URL', 'URLSearchParams', 'TextEncoder', 'TextDecoder', 'EventEmitter',
+];
+const SHARED_OBJECTS = [globalThis, JSON, Math, Reflect, console, process, process.stdout, process.stderr, Module];
+for (const name of SHARED_NAMES) {
+  const value = name === 'EventEmitter' ? require('events') : globalThis[name];
+  if (value) SHARED_OBJECTS.push(value, value.prototype);
+}
+// Chaîne de prototypes des flux du protocole (Socket, Writable...)
+for (let proto = Object.getPrototypeOf(process.stdout); proto && proto !== Object.prototype; proto = Object.getPrototypeOf(proto)) {
+  SHARED_OBJECTS.push(proto);
+}
+
+function describe(target) {
+  // Propriétés propres : valeur (ou accesseurs) comparées par identité
+  const entries = new Map();
+  for (const key of Reflect.ownKeys(target)) {
+    const descriptor = Reflect.getOwnPropertyDescriptor(target, key);
+    entries.set(key, 'value' in descriptor ? [descriptor.value] : [descriptor.get, descriptor.set]);
+  }
+  return entries;
+}
+
+function sameDescription(before, after) {
+  if (before.size !== after.size) return false;
+  for (const [key, values] of before) {
+    const current = after.get(key);
+    if (!current || current.length !== values.length || current.some((value, i) => !Object.is(value, values[i]))) return false;
+  }
+  return true;
+}
+
+function sharedState() {
+  return {
+    objects: SHARED_OBJECTS.map(describe),
+    modules: Object.keys(Module._cache).join('\n'),
+    env: stringify(Object.entries(process.env)),
+  };
+}
+
+function moduleTargets(exports) {
+  // Exports d'un module intégré et prototypes des classes qu'il exporte
+  const targets = [exports];
+  for (const value of Object.values(exports)) {
+    if (typeof value === 'function' && value.prototype) targets.push(value.prototype);
+  }
+  return targets;
+}
+
+function sharedStateChanged(before, builtins) {
+  const after = sharedState();
+  return after.modules !== before.modules
+    || after.env !== before.env
+    || before.objects.some((description, i) => !sameDescription(description, after.objects[i]))
+    || [...builtins.values()].some(({ targets, descriptions }) =>
+      targets.some((target, i) => !sameDescription(descriptions[i], describe(target))));
+}
+
+const CONTEXT_GLOBALS = [
+  'console', 'process', 'Buffer', 'URL', 'URLSearchParams', 'TextEncoder', 'TextDecoder', 'AbortController',
+  'AbortSignal', 'Event', 'EventTarget', 'performance', 'structuredClone', 'queueMicrotask', 'atob', 'btoa', 'fetch',
+  'setTimeout', 'clearTimeout', 'setInterval', 'clearInterval', 'setImmediate', 'clearImmediate',
+];
+
+function createContext() {
+  const sandbox = {};
+  for (const name of CONTEXT_GLOBALS) {
+    if (globalThis[name] !== undefined) sandbox[name] = globalThis[name];
+  }
+  const context = vm.createContext(sandbox);
+  sandbox.global = vm.runInContext('globalThis', context);
+  return context;
+}
+
+function snippetRequire(filename, builtins) {
+  // Modules intégrés (fs, path...) : partagés avec le worker, leurs exports sont surveillés
+  const base = Module.createRequire(filename);
+  const requireFn = (id) => {
+    const exports = base(id);
+    const name = typeof id === 'string' ? id.replace(/^node:/, '') : '';
+    if (Module.isBuiltin(name) && exports && (typeof exports === 'object' || typeof exports === 'function') && !builtins.has(exports)) {
+      const targets = moduleTargets(exports);
+      builtins.set(exports, { targets, descriptions: targets.map(describe) });
+    }
+    return exports;
+  };
+  requireFn.resolve = base.resolve;
+  requireFn.cache = base.cache;
+  return requireFn;
+}
+
+function nextTick() {
+  return new Promise((resolve) => setImmediate(resolve));
+}
+
+async function run(request) {
+  const maxOutput = request.max_output || 65536;
+  const deadline = Date.now() + (request.timeout || 10) * 1000;
+  const stdout = limitedWriter('stdout', maxOutput, request.stream);
+  const stderr = limitedWriter('stderr', maxOutput, request.stream);
+  let returncode = 0;
+  let exited = false;
+  const baselineResources = activeResources();
+  const before = sharedState();
+  const builtins = new Map();
+
+  const onError = (error) => {
+    if (error instanceof ExitSignal) {
+      exited = true;
+      returncode = error.code;
+      return;
+    }
+    stderr.write(formatError(error));
+    returncode = 1;
+  };
+  process.exit = (code) => {
+    throw new ExitSignal(code === undefined ? (process.exitCode || 0) : Number(code) || 0);
+  };
+  process.stdout.write = stdout.write;
+  process.stderr.write = stderr.write;
+  process.on('uncaughtException', onError);
+  process.on('unhandledRejection', onError);
+  process.exitCode = undefined;
+
+  const filename = path.join(cwd, '[eval].js');
+  try {
+    const snippet = new Module(filename, null);
+    snippet.filename = filename;
+    snippet.paths = Module._nodeModulePaths(cwd);
+    const wrapper = vm.compileFunction(request.code, ['exports', 'require', 'module', '__filename', '__dirname'], {
+      filename,
+      parsingContext: createContext(),
+    });
+    wrapper.call(snippet.exports, snippet.exports, snippetRequire(filename, builtins), snippet, filename, cwd);
+  } catch (error) {
+    onError(error);
+  }
+
+  // Attente de la fin des callbacks asynchrones de l'extrait (timers, promesses, E/S)
+  await nextTick();
+  while (!exited && activeResources() > baselineResources && Date.now() < deadline) {
+    await new Promise((resolve) => setTimeout(resolve, 2));
+  }
+  await nextTick();
+  const timedOut = !exited && activeResources() > baselineResources;
+
+  process.removeListener('uncaughtException', onError);
+  process.removeListener('unhandledRejection', onError);
+  restoreWrite(process.stdout, stdoutWrite);
+  restoreWrite(process.stderr, stderrWrite);
+  process.exit = realExit;
+  if (!exited && returncode === 0 && process.exitCode) returncode = process.exitCode;
+  process.exitCode = undefined;
+
+  const changed = sharedStateChanged(before, builtins);
+  return {
+    returncode,
+    stdout: stdout.value(),
+    stderr: stderr.value(),
+    truncated: stdout.truncated || stderr.truncated,
+    timed_out: timedOut,
+    dirty: timedOut || changed || process.cwd() !== cwd || activeResources() > baselineResources,
+  };
+}
+
+async function main() {
+  // Premier passage à vide : initialise ce que Node crée à la première utilisation
+  // (globales paresseuses, écouteurs des flux), pour que l'empreinte reste stable ensuite
+  await run({ code: 'console.log(); console.error()' });
+
+  const input = readline.createInterface({ input: process.stdin, terminal: false });
+  const queue = [];
+  let busy = false;
+  let closed = false;
+
+  async function drain() {
+    if (busy) return;
+    busy = true;
+    while (queue.length) {
+      send(await run(queue.shift()));
+    }
+    busy = false;
+    if (closed) realExit.call(process, 0);
+  }
+
+  input.on('line', (line) => {
+    if (!line.trim()) return;
+    queue.push(parse(line));
+    drain();
+  });
+  // Fermeture de stdin : le pool arrête le worker, une fois les requêtes en cours traitées
+  input.on('close', () => {
+    closed = true;
+    if (!busy) realExit.call(process, 0);
+  });
+
+  send({ ready: true });
+}
+
+// Les extraits n'héritent ni des arguments ni du module du worker
+process.argv = [process.argv[0], path.join(cwd, '[eval].js')];
+main();
@@ -0,0 +1,227 @@
+# app/common/exec_workers/python_worker.py
+"""
+Worker Python préchargé du pool d'exécution (voir app/common/exec_pool.py).
+
+Protocole : une requête JSON par ligne sur l'entrée standard
+    {"code": "...", "max_output": 65536, "timeout": 10, "stream": false}
+et une réponse JSON par ligne sur la sortie standard
+    {"returncode": 0, "stdout": "...", "stderr": "...", "truncated": false, "timed_out": false, "dirty": false}
+Avec "stream": true, chaque écriture de l'extrait est transmise aussitôt sous la forme
+    {"stream": "stdout", "data": "..."}
+et la réponse finale ne reprend pas la sortie.
+
+Chaque extrait s'exécute dans un espace de noms `__main__` neuf, comme `python -c`.
+`dirty` signale un état qui survivrait à l'exécution (thread encore actif, dossier
+courant, sys.path, variables d'environnement, builtins, module importé ou attribut de
+module ou de classe modifié) : le pool remplace alors le worker.
+"""
+import os
+import sys
+import json
+import time
+import builtins
+import threading
+import traceback
+
+# Le protocole utilise des copies des descripteurs 0 et 1 ; les originaux pointent vers
+# /dev/null pour que les sous-processus lancés par un extrait ne corrompent pas les échanges.
+_protocol_in = os.fdopen(os.dup(0), "r", encoding="utf-8")
+_protocol_out = os.fdopen(os.dup(1), "w", encoding="utf-8")
+_devnull = os.open(os.devnull, os.O_RDWR)
+os.dup2(_devnull, 0)
+os.dup2(_devnull, 1)
+sys.stdin = open(os.devnull, "r", encoding="utf-8")
+
+
+_protocol_lock = threading.Lock() # Les threads de l'extrait peuvent écrire en même temps
+
+
+def _send(message: dict):
+    with _protocol_lock:
+        _protocol_out.write(json.dumps(message) + "\n")
+        _protocol_out.flush()
+
+
+class _LimitedWriter:
+    """Capture d'un flux de sortie, tronquée au-delà de `limit` caractères ; transmise au fil de l'eau si `stream`."""
+
+    def __init__(self, name: str, limit: int, stream: bool = False):
+        self.name = name
+        self.limit = limit
+        self.stream = stream
+        self.parts = []
+        self.pending = [] # Mode stream : ligne en cours, transmise au saut de ligne (comme sur un terminal)
+        self.size = 0
+        self.truncated = False
+
+    def write(self, text):
+        if not isinstance(text, str):
+            raise TypeError(f"write() argument must be str, not {type(text).__name__}")
+        remaining = self.limit - self.size
+        if remaining <= 0:
+            self.truncated = self.truncated or bool(text)
+            return len(text)
+        part = text[:remaining]
+        self.truncated = len(part) < len(text)
+        self.size += len(part)
+        if not self.stream:
+            self.parts.append(part)
+        elif part:
+            self.pending.append(part)
+            if "\n" in part or sum(map(len, self.pending)) >= 4096:
+                self.flush()
+        return len(text)
+
+    def flush(self):
+        if self.pending:
+            data, self.pending = "".join(self.pending), []
+            _send({"stream": self.name, "data": data})
+
+    def isatty(self):
+        return False
+
+    def writable(self):
+        return True
+
+    @property
+    def encoding(self):
+        return "utf-8"
+
+    def getvalue(self) -> str:
+        return "".join(self.parts)
+
+
+# Modules courants chargés d'avance : les importer ne modifie pas sys.modules
+PRELOADED_MODULES = (
+    "json", "math", "random", "re", "string", "time", "datetime", "collections", "itertools", "functools",
+    "operator", "statistics", "decimal", "fractions", "textwrap", "pprint", "dataclasses", "typing", "enum",
+    "heapq", "bisect", "copy", "hashlib", "base64", "uuid", "io", "csv", "fnmatch", "glob", "pathlib",
+)
+
+
+def _same_entries(before: dict, after) -> bool:
+    """Mêmes clés et mêmes objets (comparaison par identité)."""
+    return before.keys() == after.keys() and all(after[name] is value for name, value in before.items())
+
+
+def _module_state() -> dict:
+    """Contenu (par identité) de chaque module chargé et des classes qu'il définit."""
+    modules, classes = {}, {}
+    for name, module in list(sys.modules.items()):
+        namespace = getattr(module, "__dict__", None)
+        if not isinstance(namespace, dict):
+            modules[name] = (module, None) # Pseudo-module (typing.io...) : identité seule
+            continue
+        entries = dict(namespace)
+        modules[name] = (module, entries)
+        for value in entries.values():
+            if isinstance(value, type) and id(value) not in classes:
+                classes[id(value)] = (value, dict(vars(value)))
+    return {"modules": modules, "classes": classes}
+
+
+# État des modules après le démarrage : inchangé tant que le worker est propre (un
+# worker modifié reste signalé `dirty` à chaque exécution suivante). Conteneur modifié en
+# place : l'espace de noms de ce module fait lui-même partie de l'empreinte.
+_baseline = {}
+
+
+def _snapshot():
+    return (os.getcwd(), list(sys.path), dict(os.environ), dict(vars(builtins)), _baseline.get("modules"))
+
+
+def _is_dirty(snapshot) -> bool:
+    cwd, path, environ, builtins_dict, module_state = snapshot
+    if threading.active_count() > 1:
+        return True
+    if os.getcwd() != cwd or sys.path != path or dict(os.environ) != environ:
+        return True
+    if not _same_entries(builtins_dict, vars(builtins)):
+        return True
+    if module_state is None:
+        return False
+    # Module importé, remplacé ou modifié (attribut ajouté, remplacé, supprimé) : état
+    # visible par l'extrait suivant
+    if sys.modules.keys() != module_state["modules"].keys():
+        return True
+    for name, (module, entries) in module_state["modules"].items():
+        if sys.modules[name] is not module or (entries is not None and not _same_entries(entries, module.__dict__)):
+            return True
+    return any(not _same_entries(entries, vars(cls)) for cls, entries in module_state["classes"].values())
+
+
+def _join_threads(deadline: float) -> bool:
+    """Attend les threads non démons lancés par l'extrait, comme l'interpréteur à sa sortie. Faux si le délai expire."""
+    for thread in threading.enumerate():
+        if thread is threading.main_thread() or thread.daemon:
+            continue
+        thread.join(max(0.0, deadline - time.monotonic()))
+        if thread.is_alive():
+            return False
+    return True
+
+
+def run(code: str, max_output: int, timeout: float, stream: bool = False) -> dict:
+    deadline = time.monotonic() + timeout
+    stdout, stderr = _LimitedWriter("stdout", max_output, stream), _LimitedWriter("stderr", max_output, stream)
+    snapshot = _snapshot()
+    namespace = {"__name__": "__main__", "__builtins__": builtins}
+    returncode = 0
+    sys.stdout, sys.stderr = stdout, stderr
+    try:
+        exec(compile(code, "<string>", "exec"), namespace)
+    except SystemExit as e:
+        # Même convention que l'interpréteur : code entier, None -> 0, message -> stderr et 1
+        if e.code is None:
+            returncode = 0
+        elif isinstance(e.code, int):
+            returncode = e.code
+        else:
+            print(e.code, file=stderr)
+            returncode = 1
+    except BaseException as e:
+        # Trace sans la frame du worker, comme pour `python -c`
+        stderr.write("".join(traceback.format_exception(type(e), e, e.__traceback__.tb_next)))
+        returncode = 1
+    finally:
+        timed_out = not _join_threads(deadline)
+        for stream in (stdout, stderr):
+            stream.flush()
+        sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+        namespace.clear()
+    return {
+        "returncode": returncode,
+        "stdout": stdout.getvalue(),
+        "stderr": stderr.getvalue(),
+        "truncated": stdout.truncated or stderr.truncated,
+        "timed_out": timed_out,
+        "dirty": timed_out or _is_dirty(snapshot),
+    }
+
+
+def _warm_up():
+    """Charge les modules courants et ce que le premier extrait chargerait (trace d'erreur, sortie)."""
+    for name in PRELOADED_MODULES:
+        try:
+            __import__(name)
+        except ImportError:
+            pass
+    for code in ("print()", "raise ValueError()", "raise SystemExit('')"):
+        run(code, 1024, 1.0)
+
+
+def main():
+    sys.argv = ["-c"]
+    _warm_up()
+    _baseline["modules"] = _module_state()
+    _send({"ready": True})
+    for line in _protocol_in:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        _send(run(request["code"], int(request.get("max_output", 65536)), float(request.get("timeout", 10)),
+                  bool(request.get("stream"))))
+
+
+if __name__ == "__main__":
+    main()
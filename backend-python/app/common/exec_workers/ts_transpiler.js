@@ -0,0 +1,78 @@
+// app/common/exec_workers/ts_transpiler.js
+//
+// Service de transpilation TypeScript -> JavaScript (voir app/common/ts_transpile.py).
+// Le compilateur est chargé une seule fois ; chaque requête ne fait que retirer les types
+// (ts.transpileModule, sans vérification de types), comme `ts-node --transpile-only`.
+//
+// Arguments : dossiers où chercher le paquet `typescript`.
+// Protocole : une requête JSON par ligne sur stdin   {"code": "...", "file": "snippet.ts"}
+//             une réponse JSON par ligne sur stdout  {"output": "..."} ou {"error": "..."}
+// Au démarrage : {"ready": true, "version": "5.x"} ou {"ready": false, "error": "..."}.
+'use strict';
+
+const readline = require('readline');
+
+function compilerOptions(ts) {
+  return {
+    module: ts.ModuleKind.CommonJS, // Exécuté par le worker Node comme un module CommonJS
+    target: ts.ScriptTarget.ES2022,
+    esModuleInterop: true,
+    sourceMap: false,
+    isolatedModules: true,
+  };
+}
+
+function send(message) {
+  process.stdout.write(JSON.stringify(message) + '\n');
+}
+
+function loadTypeScript(searchPaths) {
+  const resolved = require.resolve('typescript', { paths: searchPaths.filter(Boolean) });
+  return require(resolved);
+}
+
+function formatDiagnostic(ts, diagnostic) {
+  const message = ts.flattenDiagnosticMessageText(diagnostic.messageText, '\n');
+  if (diagnostic.file && diagnostic.start !== undefined) {
+    const { line, character } = diagnostic.file.getLineAndCharacterOfPosition(diagnostic.start);
+    return `${diagnostic.file.fileName}(${line + 1},${character + 1}): error TS${diagnostic.code}: ${message}`;
+  }
+  return `error TS${diagnostic.code}: ${message}`;
+}
+
+function main() {
+  let ts;
+  try {
+    ts = loadTypeScript(process.argv.slice(2));
+  } catch (error) {
+    send({ ready: false, error: `typescript introuvable: ${error.message.split('\n')[0]}` });
+    process.exit(0);
+  }
+  const options = compilerOptions(ts);
+  send({ ready: true, version: ts.version });
+
+  const input = readline.createInterface({ input: process.stdin, terminal: false });
+  input.on('line', (line) => {
+    if (!line.trim()) return;
+    let request;
+    try {
+      request = JSON.parse(line);
+      const result = ts.transpileModule(request.code, {
+        compilerOptions: options,
+        fileName: request.file || 'snippet.ts',
+        reportDiagnostics: true,
+      });
+      const errors = (result.diagnostics || []).filter((d) => d.category === ts.DiagnosticCategory.Error);
+      if (errors.length) {
+        send({ error: errors.map((d) => formatDiagnostic(ts, d)).join('\n') });
+      } else {
+        send({ output: result.outputText });
+      }
+    } catch (error) {
+      send({ error: String((error && error.stack) || error) });
+    }
+  });
+  input.on('close', () => process.exit(0));
+}
+
+main();
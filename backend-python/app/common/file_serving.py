@@ -0,0 +1,111 @@
+# app/common/file_serving.py
+import os
+import gzip
+import mimetypes
+
+from app.common.artifact_store import atomic_write_bytes, is_hidden_path
+
+try:
+    import brotli # Facultatif : variantes .br si le paquet est installé
+except ImportError:
+    brotli = None
+
+# En dessous de cette taille, la compression ne vaut pas un aller-retour disque
+COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", "1024"))
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml", "image/svg+xml")
+# Types que mimetypes ne connaît pas toujours
+EXTRA_MEDIA_TYPES = {".jsx": "text/javascript", ".tsx": "text/plain", ".ts": "text/plain", ".md": "text/markdown", ".py": "text/x-python", ".sql": "text/plain"}
+
+
+def resolve_artifact_path(root: str, session_id: str, file_path: str):
+    """
+    Chemin absolu d'un fichier généré, ou None s'il sort du dossier de la session
+    ou désigne un fichier interne du stockage.
+    """
+    if is_hidden_path(session_id) or is_hidden_path(file_path) or "/" in session_id or "\\" in session_id:
+        return None
+    session_dir = os.path.realpath(os.path.join(root, session_id))
+    full_path = os.path.realpath(os.path.join(session_dir, file_path))
+    if not full_path.startswith(session_dir + os.sep):
+        return None
+    return full_path
+
+
+def media_type_for(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower()
+    media_type = EXTRA_MEDIA_TYPES.get(extension) or mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if media_type.startswith("text/") or media_type in ("application/json", "application/javascript"):
+        media_type += "; charset=utf-8"
+    return media_type
+
+
+def etag_for(stat_result: os.stat_result, encoding: str = None) -> str:
+    """
+    ETag fort dérivé de l'inode, de la taille et de la date : change à chaque réécriture
+    atomique. Chaque variante précompressée a le sien (suffixe -gz / -br).
+    """
+    suffix = {"gzip": "-gz", "br": "-br"}.get(encoding, "")
+    return f'"{stat_result.st_ino:x}-{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}{suffix}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Vrai si l'en-tête If-None-Match désigne `etag` (comparaison faible, RFC 9110)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in candidates
+
+
+def accepted_encodings(accept_encoding: str) -> list:
+    """Encodages précompressés acceptés par le client, par ordre de préférence du serveur."""
+    accepted = set()
+    for item in (accept_encoding or "").lower().split(","):
+        name, _, params = item.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip())
+    encodings = []
+    if brotli is not None and "br" in accepted:
+        encodings.append("br")
+    if "gzip" in accepted:
+        encodings.append("gzip")
+    return encodings
+
+
+def is_compressible(media_type: str, size: int) -> bool:
+    return size >= COMPRESS_MIN_SIZE and media_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def _variant_path(path: str, encoding: str) -> str:
+    directory, name = os.path.split(path)
+    # Fichier caché à côté de l'artefact : exclu des listings et de /files
+    return os.path.join(directory, f".{name}.{'br' if encoding == 'br' else 'gz'}")
+
+
+def compressed_variant(path: str, stat_result: os.stat_result, encoding: str):
+    """
+    Retourne le chemin de la variante précompressée du fichier (créée ou recréée si
+    le fichier a changé), ou None si elle n'apporte rien. La variante porte la date
+    exacte du fichier source : un fichier relié à un autre contenu, même plus ancien,
+    invalide donc la variante. Appel synchrone : à exécuter dans un thread.
+    """
+    variant = _variant_path(path, encoding)
+    try:
+        variant_stat = os.stat(variant)
+        if variant_stat.st_mtime_ns == stat_result.st_mtime_ns:
+            # Une variante vide signifie que la compression n'apporte rien pour ce contenu
+            return variant if variant_stat.st_size else None
+    except FileNotFoundError:
+        pass
+    with open(path, "rb") as f:
+        data = f.read()
+    if encoding == "br":
+        compressed = brotli.compress(data, quality=11)
+    else:
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+    worthwhile = len(compressed) < len(data)
+    atomic_write_bytes(variant, compressed if worthwhile else b"")
+    os.utime(variant, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns))
+    return variant if worthwhile else None
@@ -0,0 +1,242 @@
+# app/common/file_versions.py
+import os
+import json
+import zlib
+import difflib
+import hashlib
+import asyncio
+import logging
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+from app.common.db import run_db
+
+# Instantané complet au plus toutes les FILE_SNAPSHOT_INTERVAL versions : une version se
+# reconstruit en appliquant au plus FILE_SNAPSHOT_INTERVAL - 1 deltas
+FILE_SNAPSHOT_INTERVAL = int(os.environ.get("FILE_SNAPSHOT_INTERVAL", "20"))
+# Compaction : les versions plus anciennes que FILE_VERSION_RETENTION_DAYS sont supprimées,
+# sauf les FILE_VERSIONS_KEEP plus récentes de chaque fichier
+FILE_VERSION_RETENTION_DAYS = float(os.environ.get("FILE_VERSION_RETENTION_DAYS", "30"))
+FILE_VERSIONS_KEEP = int(os.environ.get("FILE_VERSIONS_KEEP", "50"))
+FILE_VERSION_COMPACT_INTERVAL = float(os.environ.get("FILE_VERSION_COMPACT_INTERVAL", str(6 * 3600)))
+
+KIND_SNAPSHOT = "snapshot"
+KIND_DELTA = "delta"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS file_versions (
+    file_id TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    created_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (file_id, version)
+);
+"""
+
+_schema_ready = False
+
+
+def _ensure_schema(conn: sqlite3.Connection):
+    global _schema_ready
+    if not _schema_ready:
+        conn.executescript(_SCHEMA)
+        _schema_ready = True
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
+
+# --- Encodage ---
+
+def make_delta(old: str, new: str) -> bytes:
+    """
+    Delta ligne à ligne de `old` vers `new`, compressé : liste d'opérations [début, fin]
+    (lignes copiées depuis `old`) ou texte inséré.
+    """
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    operations = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old_lines, new_lines).get_opcodes():
+        if tag == "equal":
+            operations.append([i1, i2])
+        elif tag in ("replace", "insert"):
+            operations.append("".join(new_lines[j1:j2]))
+    return zlib.compress(json.dumps(operations, ensure_ascii=False).encode("utf-8"), 6)
+
+
+def apply_delta(old: str, data: bytes) -> str:
+    old_lines = old.splitlines(keepends=True)
+    return "".join(
+        "".join(old_lines[operation[0]:operation[1]]) if isinstance(operation, list) else operation
+        for operation in json.loads(zlib.decompress(data))
+    )
+
+
+def _snapshot(content: str) -> bytes:
+    return zlib.compress(content.encode("utf-8"), 6)
+
+
+# --- Écriture ---
+
+def record_version(conn, file_id: str, version: int, content: str, previous: str = None):
+    """
+    Enregistre la version `version` d'un fichier (dans la transaction de la mise à jour).
+    `previous` est le contenu de la version précédente ; la version est stockée en delta
+    par rapport à celle-ci, ou en instantané complet au début d'une chaîne, tous les
+    FILE_SNAPSHOT_INTERVAL versions, ou quand les deltas cumulés dépassent un instantané.
+    """
+    _ensure_schema(conn)
+    snapshot = _snapshot(content)
+    kind, data = KIND_SNAPSHOT, snapshot
+    if previous is not None and version > 1:
+        # Chaîne courante : deltas depuis le dernier instantané
+        chain = conn.execute(
+            "SELECT version, kind, length(data) AS stored FROM file_versions "
+            "WHERE file_id = ? AND version < ? ORDER BY version DESC LIMIT ?",
+            (file_id, version, FILE_SNAPSHOT_INTERVAL)
+        ).fetchall()
+        if not chain or chain[0]["version"] != version - 1:
+            # Fichier antérieur à l'historique : la version précédente devient le premier instantané
+            _insert(conn, file_id, version - 1, KIND_SNAPSHOT, _snapshot(previous), previous)
+            chain = [{"version": version - 1, "kind": KIND_SNAPSHOT, "stored": 0}]
+        delta_bytes, chain_length = 0, 0
+        for row in chain:
+            if row["kind"] == KIND_SNAPSHOT:
+                break
+            delta_bytes += row["stored"]
+            chain_length += 1
+        else:
+            chain_length = FILE_SNAPSHOT_INTERVAL # Pas d'instantané dans la fenêtre : on en refait un
+        if chain_length + 1 < FILE_SNAPSHOT_INTERVAL:
+            delta = make_delta(previous, content)
+            if delta_bytes + len(delta) < len(snapshot):
+                kind, data = KIND_DELTA, delta
+    _insert(conn, file_id, version, kind, data, content)
+
+
+def _insert(conn, file_id: str, version: int, kind: str, data: bytes, content: str):
+    encoded = content.encode("utf-8")
+    conn.execute(
+        "INSERT OR REPLACE INTO file_versions (file_id, version, kind, data, size, sha256, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (file_id, version, kind, data, len(encoded), hashlib.sha256(encoded).hexdigest(), _now())
+    )
+
+
+def delete_versions(conn, file_ids: list):
+    _ensure_schema(conn)
+    conn.executemany("DELETE FROM file_versions WHERE file_id = ?", [(file_id,) for file_id in file_ids])
+
+
+# --- Lecture ---
+
+def list_versions(conn, file_id: str) -> list:
+    """Versions enregistrées d'un fichier (sans contenu), de la plus récente à la plus ancienne."""
+    _ensure_schema(conn)
+    rows = conn.execute(
+        "SELECT version, kind, size, length(data) AS stored, sha256, created_at FROM file_versions "
+        "WHERE file_id = ? ORDER BY version DESC",
+        (file_id,)
+    ).fetchall()
+    return [
+        {"version": row["version"], "kind": row["kind"], "size": row["size"], "storedSize": row["stored"],
+         "sha256": row["sha256"], "createdAt": row["created_at"].replace(" ", "T") + "Z"}
+        for row in rows
+    ]
+
+
+def get_version(conn, file_id: str, version: int):
+    """Contenu d'une version : dernier instantané puis deltas jusqu'à `version`. None si inconnue."""
+    _ensure_schema(conn)
+    base = conn.execute(
+        "SELECT MAX(version) FROM file_versions WHERE file_id = ? AND version <= ? AND kind = ?",
+        (file_id, version, KIND_SNAPSHOT)
+    ).fetchone()[0]
+    if base is None:
+        return None
+    rows = conn.execute(
+        "SELECT version, kind, data, sha256 FROM file_versions WHERE file_id = ? AND version BETWEEN ? AND ? ORDER BY version",
+        (file_id, base, version)
+    ).fetchall()
+    if not rows or rows[-1]["version"] != version or len(rows) != version - base + 1:
+        return None # Version supprimée par la compaction, ou chaîne incomplète
+    content = zlib.decompress(rows[0]["data"]).decode("utf-8")
+    for row in rows[1:]:
+        content = apply_delta(content, row["data"])
+    if hashlib.sha256(content.encode("utf-8")).hexdigest() != rows[-1]["sha256"]:
+        raise ValueError(f"Version {version} du fichier {file_id} corrompue")
+    return content
+
+
+# --- Compaction ---
+
+def compact_file(conn, file_id: str, keep: int = FILE_VERSIONS_KEEP, retention_days: float = FILE_VERSION_RETENTION_DAYS) -> int:
+    """
+    Supprime les versions anciennes d'un fichier (au-delà des `keep` plus récentes et plus
+    vieilles que `retention_days`). La plus ancienne version conservée devient un
+    instantané, les suivantes restent reconstructibles. Retourne le nombre de versions supprimées.
+    """
+    _ensure_schema(conn)
+    cutoff_date = (datetime.now(timezone.utc) - timedelta(days=retention_days)).strftime("%Y-%m-%d %H:%M:%S")
+    versions = [row[0] for row in conn.execute(
+        "SELECT version FROM file_versions WHERE file_id = ? ORDER BY version DESC", (file_id,)
+    ).fetchall()]
+    if len(versions) <= keep:
+        return 0
+    removable = [row[0] for row in conn.execute(
+        "SELECT version FROM file_versions WHERE file_id = ? AND version < ? AND created_at < ? ORDER BY version DESC",
+        (file_id, versions[keep - 1], cutoff_date)
+    ).fetchall()]
+    if not removable:
+        return 0
+    # Première version conservée au-dessus de la coupure : matérialisée avant suppression de sa base
+    oldest_kept = conn.execute(
+        "SELECT MIN(version) FROM file_versions WHERE file_id = ? AND version > ?", (file_id, removable[0])
+    ).fetchone()[0]
+    content = get_version(conn, file_id, oldest_kept)
+    if content is None:
+        return 0
+    conn.execute(
+        "UPDATE file_versions SET kind = ?, data = ? WHERE file_id = ? AND version = ?",
+        (KIND_SNAPSHOT, _snapshot(content), file_id, oldest_kept)
+    )
+    return conn.execute(
+        "DELETE FROM file_versions WHERE file_id = ? AND version < ?", (file_id, oldest_kept)
+    ).rowcount
+
+
+def files_to_compact(conn, keep: int = FILE_VERSIONS_KEEP) -> list:
+    """Fichiers qui ont plus de `keep` versions."""
+    _ensure_schema(conn)
+    return [row[0] for row in conn.execute(
+        "SELECT file_id FROM file_versions GROUP BY file_id HAVING COUNT(*) > ?", (keep,)
+    ).fetchall()]
+
+
+async def compact_all(keep: int = FILE_VERSIONS_KEEP, retention_days: float = FILE_VERSION_RETENTION_DAYS) -> int:
+    """
+    Compacte les fichiers qui ont plus de `keep` versions, une transaction par fichier :
+    le verrou d'écriture n'est tenu que le temps d'un fichier. Retourne le nombre de
+    versions supprimées.
+    """
+    file_ids = await run_db(files_to_compact, keep)
+    removed = 0
+    for file_id in file_ids:
+        removed += await run_db(compact_file, file_id, keep, retention_days)
+    if removed:
+        logging.info(f"[FileVersions] Compaction : {removed} version(s) supprimée(s) sur {len(file_ids)} fichier(s)")
+    return removed
+
+
+async def run_compaction(interval: float = FILE_VERSION_COMPACT_INTERVAL):
+    """Boucle de fond qui compacte périodiquement l'historique des fichiers."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await compact_all()
+        except Exception as e:
+            logging.error(f"[FileVersions] Échec de la compaction: {e}")
@@ -0,0 +1,267 @@
+# app/common/job_queue.py
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict, deque
+
+from app.common.metrics import metrics, WORKFLOW_QUEUE_WAIT_SECONDS, WORKFLOW_JOBS
+
+# Nombre de workflows exécutés simultanément par le processus
+WORKFLOW_MAX_WORKERS = int(os.environ.get("WORKFLOW_MAX_WORKERS", "2"))
+# Nombre maximal de jobs en attente d'un worker (au-delà, la soumission est refusée)
+WORKFLOW_MAX_QUEUED = int(os.environ.get("WORKFLOW_MAX_QUEUED", "100"))
+# Nombre de jobs terminés conservés en mémoire pour consultation de leur statut/résultat
+WORKFLOW_JOB_RETENTION = int(os.environ.get("WORKFLOW_JOB_RETENTION", "200"))
+# Délai (s) laissé à un client déconnecté pour se réabonner avant l'annulation de son job
+WORKFLOW_ABANDON_GRACE = float(os.environ.get("WORKFLOW_ABANDON_GRACE", "30"))
+# Délai (s) d'envoi d'un message à un abonné ; au-delà, l'abonné bloqué est retiré
+WORKFLOW_SUBSCRIBER_SEND_TIMEOUT = float(os.environ.get("WORKFLOW_SUBSCRIBER_SEND_TIMEOUT", "5"))
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+JOB_FINISHED_STATUSES = (JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED)
+
+# Raisons d'annulation
+CANCEL_REQUESTED = "requested" # Demande explicite du client
+CANCEL_ABANDONED = "abandoned" # Plus aucun client abonné après le délai de grâce
+
+
+class JobQueueFull(Exception):
+    """La file des jobs a atteint WORKFLOW_MAX_QUEUED."""
+
+
+def _serialize(message: dict) -> str:
+    return json.dumps(message, ensure_ascii=False)
+
+
+class JobChannel:
+    """
+    Canal de progression d'un job : se comporte comme un WebSocket (`send_json`) pour
+    le workflow et diffuse chaque message à tous les abonnés. Les messages circulent
+    sous forme de dictionnaires et ne sont sérialisés qu'à l'envoi aux abonnés ; ceux
+    hors `agent_delta` sont conservés pour être rejoués aux abonnés tardifs.
+    """
+
+    def __init__(self, history_size: int = 500):
+        self.subscribers = []
+        self.history = deque(maxlen=history_size)
+        self.messages = [] # Messages `agent_message` définitifs (pour le résultat du job)
+
+    async def send_json(self, message: dict):
+        message_type = message.get("type")
+        if message_type != "agent_delta":
+            self.history.append(message)
+            if message_type == "agent_message" and message.get("content") != "...":
+                self.messages.append(message)
+        if self.subscribers:
+            text = _serialize(message) # Une seule sérialisation pour tous les abonnés
+            # Envois en parallèle : un abonné lent ne retarde ni les autres ni le workflow
+            await asyncio.gather(*(self._send(websocket, text) for websocket in list(self.subscribers)))
+
+    async def _send(self, websocket, text: str):
+        try:
+            await asyncio.wait_for(websocket.send_text(text), WORKFLOW_SUBSCRIBER_SEND_TIMEOUT)
+        except asyncio.TimeoutError:
+            logging.warning(f"[JobChannel] Abonné retiré : envoi bloqué plus de {WORKFLOW_SUBSCRIBER_SEND_TIMEOUT}s")
+            self.unsubscribe(websocket)
+        except Exception as e:
+            # Client parti : on le désabonne sans interrompre le job
+            logging.info(f"[JobChannel] Abonné retiré après échec d'envoi: {e}")
+            self.unsubscribe(websocket)
+
+    async def subscribe(self, websocket, replay: bool = True):
+        """Abonne un client ; avec `replay`, lui renvoie d'abord l'historique du job."""
+        if replay:
+            for message in list(self.history):
+                await websocket.send_text(_serialize(message))
+        if websocket not in self.subscribers:
+            self.subscribers.append(websocket)
+
+    def unsubscribe(self, websocket):
+        if websocket in self.subscribers:
+            self.subscribers.remove(websocket)
+
+
+class Job:
+    """Exécution en arrière-plan d'un workflow, suivie par son canal de progression."""
+
+    def __init__(self, runner, session_id: str, prompt: str, kind: str = "website_creation"):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.runner = runner # Coroutine async(job) -> résultat
+        self.session_id = session_id
+        self.prompt = prompt
+        self.kind = kind
+        self.status = JOB_QUEUED
+        self.channel = JobChannel()
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_reason = None
+        self.task = None # Tâche asyncio du job pendant son exécution
+        self.done = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in JOB_FINISHED_STATUSES
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "session_id": self.session_id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "stages_done": sorted({m.get("stage") for m in self.channel.messages if m.get("stage") != "init"}),
+            "subscribers": len(self.channel.subscribers),
+            "error": self.error,
+            "cancel_reason": self.cancel_reason,
+        }
+
+
+class JobQueue:
+    """
+    File de jobs en mémoire exécutée par un pool borné de workers asyncio.
+    Un seul job actif (en attente ou en cours) par session.
+    """
+
+    def __init__(self, max_workers: int = WORKFLOW_MAX_WORKERS, max_queued: int = WORKFLOW_MAX_QUEUED,
+                 retention: int = WORKFLOW_JOB_RETENTION, abandon_grace: float = WORKFLOW_ABANDON_GRACE):
+        self.max_workers = max(1, max_workers)
+        self.max_queued = max_queued
+        self.retention = retention
+        self.abandon_grace = abandon_grace
+        self.jobs = OrderedDict() # job_id -> Job
+        self._queue = None
+        self._workers = []
+        self._abandon_timers = {} # job_id -> asyncio.TimerHandle
+
+    def start(self):
+        """Démarre les workers (à appeler depuis la boucle asyncio, au démarrage du serveur)."""
+        if self._workers:
+            return
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._worker(i), name=f"job-worker:{i}") for i in range(self.max_workers)]
+        logging.info(f"[JobQueue] {self.max_workers} worker(s) démarré(s)")
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def queued_count(self) -> int:
+        return sum(1 for job in self.jobs.values() if job.status == JOB_QUEUED)
+
+    def get(self, job_id: str):
+        return self.jobs.get(job_id)
+
+    def active_job_for(self, session_id: str):
+        """Job en attente ou en cours de la session, ou None."""
+        return next((job for job in self.jobs.values() if job.session_id == session_id and not job.finished), None)
+
+    def submit(self, runner, session_id: str, prompt: str, kind: str = "website_creation") -> Job:
+        """Ajoute un job à la file ; lève JobQueueFull si la file est pleine."""
+        if self._queue is None:
+            self.start()
+        if self.queued_count() >= self.max_queued:
+            raise JobQueueFull(f"{self.max_queued} jobs déjà en attente")
+        job = Job(runner, session_id, prompt, kind)
+        self.jobs[job.job_id] = job
+        self._queue.put_nowait(job)
+        self._evict_finished()
+        logging.info(f"[JobQueue] Job {job.job_id} ({kind}) soumis pour la session {session_id}")
+        return job
+
+    def cancel(self, job_id: str, reason: str = CANCEL_REQUESTED) -> bool:
+        """
+        Annule un job : retiré de la file s'il attend encore, sinon sa tâche est annulée,
+        ce qui ferme le flux HTTP vers Ollama et saute les étapes restantes.
+        """
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return False
+        job.cancel_reason = job.cancel_reason or reason
+        if job.task is None:
+            self._finish_cancelled(job)
+        else:
+            job.task.cancel()
+        logging.info(f"[JobQueue] Annulation du job {job_id} ({reason})")
+        return True
+
+    def _finish_cancelled(self, job: Job):
+        job.status = JOB_CANCELLED
+        job.finished_at = time.time()
+        WORKFLOW_JOBS.inc(status=job.status)
+        job.done.set()
+
+    def watch_abandon(self, job: Job):
+        """
+        À appeler quand un abonné d'un job se désabonne : s'il n'en reste aucun, le job
+        est annulé si personne ne s'est réabonné au bout de `abandon_grace` secondes.
+        """
+        if job.finished or job.channel.subscribers or job.job_id in self._abandon_timers:
+            return
+
+        def check():
+            self._abandon_timers.pop(job.job_id, None)
+            if not job.channel.subscribers:
+                self.cancel(job.job_id, CANCEL_ABANDONED)
+
+        self._abandon_timers[job.job_id] = asyncio.get_running_loop().call_later(self.abandon_grace, check)
+
+    def _evict_finished(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.retention)]:
+            del self.jobs[job_id]
+
+    async def _worker(self, index: int):
+        while True:
+            job = await self._queue.get()
+            try:
+                if not job.finished: # Job annulé pendant son attente
+                    await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job):
+        job.status = JOB_RUNNING
+        job.started_at = time.time()
+        WORKFLOW_QUEUE_WAIT_SECONDS.observe(job.started_at - job.created_at)
+        job.task = asyncio.create_task(job.runner(job), name=f"job:{job.job_id}")
+        try:
+            job.result = await job.task
+            job.status = JOB_COMPLETED
+        except asyncio.CancelledError:
+            if job.cancel_reason is None:
+                raise # Arrêt du worker lui-même (arrêt du serveur)
+            job.status = JOB_CANCELLED
+            await job.channel.send_json({"type": "workflow_cancelled", "job_id": job.job_id, "reason": job.cancel_reason})
+        except Exception as e:
+            logging.exception(f"[JobQueue] Job {job.job_id} en échec")
+            job.status = JOB_FAILED
+            job.error = str(e)
+            await job.channel.send_json({"type": "error", "job_id": job.job_id, "message": f"Erreur interne: {e}"})
+        finally:
+            if not job.task.done():
+                job.task.cancel() # Worker annulé : le job l'est aussi
+            job.task = None
+            job.finished_at = time.time()
+            WORKFLOW_JOBS.inc(status=job.status)
+            job.done.set()
+            timer = self._abandon_timers.pop(job.job_id, None)
+            if timer:
+                timer.cancel()
+
+
+job_queue = JobQueue()
+metrics.gauge("workflow_jobs_queued", "Jobs de workflow en attente d'un worker", function=job_queue.queued_count)
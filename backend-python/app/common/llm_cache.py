@@ -0,0 +1,204 @@
+# app/common/llm_cache.py
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "1") != "0"
+LLM_CACHE_DB = os.environ.get("LLM_CACHE_DB", os.path.join(BACKEND_ROOT, "llm_cache.db"))
+LLM_CACHE_MEMORY_ENTRIES = int(os.environ.get("LLM_CACHE_MEMORY_ENTRIES", "256"))
+LLM_CACHE_TTL = int(os.environ.get("LLM_CACHE_TTL", str(7 * 24 * 3600))) # secondes
+LLM_CACHE_MAX_DISK_BYTES = int(os.environ.get("LLM_CACHE_MAX_DISK_BYTES", str(256 * 1024 * 1024)))
+
+
+class _LeaderCancelled(Exception):
+    """Levée chez les appels en attente quand l'appel qui générait la réponse a été annulé."""
+
+
+class LLMResponseCache:
+    """
+    Cache adressé par contenu des réponses LLM, en deux niveaux :
+    - une LRU bornée en mémoire ;
+    - une table SQLite persistante avec TTL et éviction par taille totale.
+
+    Les appels identiques concurrents sont fusionnés : un seul génère,
+    les autres attendent son résultat.
+    """
+
+    def __init__(self, db_path: str = LLM_CACHE_DB, memory_entries: int = LLM_CACHE_MEMORY_ENTRIES,
+                 ttl: int = LLM_CACHE_TTL, max_disk_bytes: int = LLM_CACHE_MAX_DISK_BYTES):
+        self.db_path = db_path
+        self.memory_entries = memory_entries
+        self.ttl = ttl
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict() # key -> (content, created_at)
+        self._inflight = {} # key -> asyncio.Future
+        self._db = None
+        self._db_lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0}
+
+    @staticmethod
+    def make_key(model: str, messages: list, options: dict = None) -> str:
+        """Hash stable du modèle, des messages et des options de génération."""
+        payload = json.dumps({"model": model, "messages": messages, "options": options or {}},
+                             sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    # --- Niveau disque (SQLite, appelé via asyncio.to_thread) ---
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    content TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache(last_access)")
+            self._db.commit()
+        return self._db
+
+    def _disk_get(self, key: str):
+        with self._db_lock:
+            db = self._connect()
+            row = db.execute("SELECT content, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if not row:
+                return None
+            if time.time() - row[1] > self.ttl:
+                db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                db.commit()
+                return None
+            db.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (time.time(), key))
+            db.commit()
+            return row
+
+    def _disk_set(self, key: str, model: str, content: str, created_at: float):
+        size = len(content.encode("utf-8"))
+        with self._db_lock:
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, model, content, size, created_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, content, size, created_at, created_at)
+            )
+            db.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl,))
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+            if total > self.max_disk_bytes:
+                # Éviction des entrées les moins récemment utilisées jusqu'à repasser sous la limite
+                excess = total - self.max_disk_bytes
+                victims = []
+                for victim_key, victim_size in db.execute("SELECT key, size FROM llm_cache ORDER BY last_access ASC"):
+                    if excess <= 0:
+                        break
+                    victims.append((victim_key,))
+                    excess -= victim_size
+                db.executemany("DELETE FROM llm_cache WHERE key = ?", victims)
+            db.commit()
+
+    # --- Niveau mémoire (LRU) ---
+    def _memory_get(self, key: str):
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry[1] > self.ttl:
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return entry[0]
+
+    def _memory_set(self, key: str, content: str, created_at: float):
+        self._memory[key] = (content, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    async def get(self, key: str):
+        """Retourne la réponse en cache ou None."""
+        content = self._memory_get(key)
+        if content is not None:
+            self.stats["memory_hits"] += 1
+            return content
+        try:
+            row = await asyncio.to_thread(self._disk_get, key)
+        except sqlite3.Error as e:
+            logging.warning(f"[LLMCache] Lecture disque impossible: {e}")
+            row = None
+        if row is not None:
+            self.stats["disk_hits"] += 1
+            self._memory_set(key, row[0], row[1])
+            return row[0]
+        return None
+
+    async def set(self, key: str, model: str, content: str):
+        created_at = time.time()
+        self._memory_set(key, content, created_at)
+        try:
+            await asyncio.to_thread(self._disk_set, key, model, content, created_at)
+        except sqlite3.Error as e:
+            logging.warning(f"[LLMCache] Écriture disque impossible: {e}")
+
+    async def get_or_generate(self, key: str, model: str, generate, cacheable=None):
+        """
+        Retourne la réponse en cache, ou appelle `await generate()` et met le résultat en cache.
+        Si `generate` lève une exception, rien n'est mis en cache et l'exception est propagée
+        à tous les appels fusionnés. Une réponse vide, ou refusée par `cacheable(content)`
+        (réponse de remplacement), est transmise aux appels fusionnés sans être mise en cache.
+        """
+        while True:
+            content = await self.get(key)
+            if content is not None:
+                return content
+
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                self.stats["coalesced"] += 1
+                try:
+                    return await asyncio.shield(inflight)
+                except _LeaderCancelled:
+                    continue # L'appel leader a été annulé : on retente, éventuellement comme leader
+
+            self.stats["misses"] += 1
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[key] = future
+            try:
+                content = await generate()
+            except asyncio.CancelledError:
+                future.set_exception(_LeaderCancelled())
+                raise
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            else:
+                future.set_result(content) # Les appels fusionnés n'attendent pas l'écriture du cache
+                if content and content.strip() and (cacheable is None or cacheable(content)):
+                    await self.set(key, model, content)
+                return content
+            finally:
+                self._inflight.pop(key, None)
+                if not future.done():
+                    future.set_exception(_LeaderCancelled())
+                # Marque l'exception comme consommée pour éviter l'avertissement
+                # "exception was never retrieved" quand aucun appel n'attendait
+                future.exception()
+
+
+_cache = None
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """Retourne le cache partagé par le processus."""
+    global _cache
+    if _cache is None:
+        _cache = LLMResponseCache()
+    return _cache
@@ -0,0 +1,197 @@
+# app/common/llm_scheduler.py
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict, deque, Counter
+from contextlib import asynccontextmanager
+
+from app.common.model_affinity import ModelSwapTracker
+from app.common.metrics import LLM_QUEUE_WAIT_SECONDS
+
+# Voies de priorité : la plus petite valeur est servie en premier
+PRIORITY_INTERACTIVE = 0 # /chat et requêtes d'un utilisateur qui attend
+PRIORITY_BATCH = 1 # Étapes de workflow
+LANE_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BATCH: "batch"}
+
+LLM_MAX_CONCURRENT = int(os.environ.get("LLM_MAX_CONCURRENT", "4"))
+LLM_MAX_CONCURRENT_PER_MODEL = int(os.environ.get("LLM_MAX_CONCURRENT_PER_MODEL", "2"))
+# Au-delà de cette attente (s), une requête passe devant celles qui réutilisent un modèle déjà chargé
+LLM_AFFINITY_MAX_WAIT = float(os.environ.get("LLM_AFFINITY_MAX_WAIT", "20"))
+
+
+def parse_model_limits(spec: str) -> dict:
+    """Analyse une spécification du type "agent-critique=1,agent-optimiseur=2"."""
+    limits = {}
+    for item in (spec or "").split(","):
+        if "=" in item:
+            model, limit = item.split("=", 1)
+            limits[model.strip()] = int(limit)
+    return limits
+
+
+class _Waiter:
+    def __init__(self, model: str, session_id: str, priority: int):
+        self.model = model
+        self.session_id = session_id
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class LLMScheduler:
+    """
+    Ordonnanceur central des appels LLM :
+    - plafond global et plafond par modèle d'appels simultanés vers Ollama ;
+    - voies de priorité (interactif avant workflow) ;
+    - tourniquet équitable entre sessions à l'intérieur d'une voie, en servant d'abord,
+      toutes sessions confondues, les requêtes dont le modèle de base est déjà chargé ;
+    - statistiques de temps d'attente en file et de changements de modèle.
+    """
+
+    def __init__(self, max_concurrent: int = LLM_MAX_CONCURRENT, default_model_limit: int = LLM_MAX_CONCURRENT_PER_MODEL,
+                 model_limits: dict = None, affinity_max_wait: float = LLM_AFFINITY_MAX_WAIT):
+        self.max_concurrent = max_concurrent
+        self.default_model_limit = default_model_limit
+        self.model_limits = dict(model_limits or {})
+        self.affinity_max_wait = affinity_max_wait
+        self.swaps = ModelSwapTracker() # Modèles de base chargés, vus par l'ordonnanceur
+        self._loads_by_session = OrderedDict() # session_id -> chargements de modèle provoqués (préchargements compris)
+        self.active_total = 0
+        self.active_by_model = Counter()
+        self._lanes = {} # priorité -> OrderedDict(session_id -> deque[_Waiter])
+        self._last_grant = OrderedDict() # session_id -> numéro du dernier créneau accordé
+        self._grant_counter = 0
+        self._recent_waits = {} # priorité -> deque des derniers temps d'attente
+        self.wait_totals = Counter() # priorité -> somme des attentes (s)
+        self.wait_counts = Counter() # priorité -> nombre de requêtes servies
+
+    def model_limit(self, model: str) -> int:
+        return self.model_limits.get(model, self.default_model_limit)
+
+    def _can_start(self, model: str) -> bool:
+        return self.active_total < self.max_concurrent and self.active_by_model[model] < self.model_limit(model)
+
+    def _pick(self, lane: OrderedDict):
+        """
+        Parmi les sessions ayant une requête démarrable, choisit d'abord celles qui ont
+        trop attendu, puis celles dont le modèle de base est déjà chargé, puis les autres ;
+        à l'intérieur de chaque groupe, la session servie le moins récemment.
+        """
+        best = None
+        now = time.monotonic()
+        for session_id, queue in lane.items():
+            # Une requête annulée reste dans sa file jusqu'à ce que sa tâche reprenne la main : ignorée
+            waiter = next((w for w in queue if not w.future.done() and self._can_start(w.model)), None)
+            if waiter is None:
+                continue
+            if now - waiter.enqueued_at > self.affinity_max_wait:
+                affinity = -1
+            else:
+                affinity = 0 if self.swaps.is_resident(waiter.model) else 1
+            rank = (affinity, self._last_grant.get(session_id, -1))
+            if best is None or rank < best[0]:
+                best = (rank, session_id, waiter)
+        return best
+
+    def _dispatch(self):
+        """Attribue les créneaux libres aux requêtes en attente, voie prioritaire d'abord."""
+        while self.active_total < self.max_concurrent:
+            picked = None
+            for priority in sorted(self._lanes):
+                picked = self._pick(self._lanes[priority])
+                if picked is not None:
+                    break
+            if picked is None:
+                return
+            _, session_id, waiter = picked
+            self._dequeue(waiter)
+            self._grant_counter += 1
+            self._last_grant[session_id] = self._grant_counter
+            self._last_grant.move_to_end(session_id)
+            while len(self._last_grant) > 10000:
+                self._last_grant.popitem(last=False)
+            self.active_total += 1
+            self.active_by_model[waiter.model] += 1
+            if self.swaps.record(waiter.model):
+                self._loads_by_session[session_id] = self._loads_by_session.get(session_id, 0) + 1
+                self._loads_by_session.move_to_end(session_id)
+                while len(self._loads_by_session) > 10000:
+                    self._loads_by_session.popitem(last=False)
+            waiter.future.set_result(None)
+
+    def loads_for(self, session_id: str) -> int:
+        """Chargements de modèle de base attribués aux créneaux de la session (appels et préchargements)."""
+        return self._loads_by_session.get(session_id, 0)
+
+    def _release(self, model: str):
+        self.active_total -= 1
+        self.active_by_model[model] -= 1
+        if self.active_by_model[model] <= 0:
+            del self.active_by_model[model]
+        self._dispatch()
+
+    def _dequeue(self, waiter: _Waiter):
+        lane = self._lanes.get(waiter.priority, {})
+        queue = lane.get(waiter.session_id)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del lane[waiter.session_id]
+
+    def _record_wait(self, priority: int, waited: float):
+        self.wait_totals[priority] += waited
+        self.wait_counts[priority] += 1
+        self._recent_waits.setdefault(priority, deque(maxlen=500)).append(waited)
+
+    @asynccontextmanager
+    async def slot(self, model: str, session_id: str = None, priority: int = PRIORITY_BATCH):
+        """Attend un créneau pour `model` puis le libère à la sortie du bloc."""
+        waiter = _Waiter(model, session_id or "anonymous", priority)
+        lane = self._lanes.setdefault(priority, OrderedDict())
+        lane.setdefault(waiter.session_id, deque()).append(waiter)
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self._release(model) # Créneau accordé juste avant l'annulation
+            else:
+                self._dequeue(waiter)
+            raise
+
+        waited = time.monotonic() - waiter.enqueued_at
+        self._record_wait(priority, waited)
+        LLM_QUEUE_WAIT_SECONDS.observe(waited, model=model, priority=LANE_NAMES.get(priority, priority))
+        if waited > 1:
+            logging.info(f"[LLMScheduler] {model} ({waiter.session_id}) a attendu {waited:.2f}s en file")
+        try:
+            yield waited
+        finally:
+            self._release(model)
+
+    def snapshot(self) -> dict:
+        """État courant et statistiques d'attente, par voie de priorité."""
+        lanes = {}
+        for priority in sorted(set(self._lanes) | set(self.wait_counts)):
+            recent = sorted(self._recent_waits.get(priority, []))
+            count = self.wait_counts[priority]
+            lanes[LANE_NAMES.get(priority, str(priority))] = {
+                "queued": sum(len(q) for q in self._lanes.get(priority, {}).values()),
+                "sessions_waiting": len(self._lanes.get(priority, {})),
+                "served": count,
+                "avg_wait": self.wait_totals[priority] / count if count else 0.0,
+                "p95_wait": recent[int(len(recent) * 0.95) - 1] if recent else 0.0,
+                "max_wait": recent[-1] if recent else 0.0,
+            }
+        return {
+            "max_concurrent": self.max_concurrent,
+            "active_total": self.active_total,
+            "active_by_model": dict(self.active_by_model),
+            "model_swaps": self.swaps.swaps,
+            "resident_base_models": list(self.swaps.resident),
+            "lanes": lanes,
+        }
+
+
+llm_scheduler = LLMScheduler(model_limits=parse_model_limits(os.environ.get("LLM_MODEL_LIMITS", "")))
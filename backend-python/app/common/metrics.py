@@ -0,0 +1,207 @@
+# app/common/metrics.py
+import bisect
+import threading
+
+# Format texte d'exposition Prometheus (GET /metrics)
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LLM_LATENCY_BUCKETS = (0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 180, 300)
+QUEUE_WAIT_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+EXECUTE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+TOKENS_PER_SECOND_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 300, 500, 1000, 2000)
+
+
+def _escape(value, quotes: bool = True) -> str:
+    value = str(value).replace("\\", "\\\\").replace("\n", "\\n")
+    return value.replace('"', '\\"') if quotes else value # Guillemets échappés seulement dans les étiquettes
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Métrique à étiquettes : une valeur (ou un histogramme) par combinaison de valeurs d'étiquettes."""
+    type_name = None
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock() # Observations possibles depuis les threads de run_db
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} : étiquettes attendues {self.labels}, reçues {tuple(labels)}")
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def _label_text(self, key: tuple, extra: dict = None) -> str:
+        pairs = list(zip(self.labels, key)) + list((extra or {}).items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{label}="{_escape(value)}"' for label, value in pairs) + "}"
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {_escape(self.documentation, quotes=False)}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        return [f"{self.name}{self._label_text(key)} {_format_value(value)}" for key, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), function=None):
+        super().__init__(name, documentation, labels)
+        self._function = function # Valeur lue à l'exposition (gauge sans étiquettes)
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def _samples(self):
+        if self._function is not None:
+            return [f"{self.name} {_format_value(self._function())}"]
+        return [f"{self.name}{self._label_text(key)} {_format_value(value)}" for key, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = LLM_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value) # Premier seuil >= valeur (le dernier compte = +Inf)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self):
+        lines = []
+        for key, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{self._label_text(key, {'le': _format_value(float(bound))})} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{self._label_text(key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Registre en mémoire des métriques du processus, exposées au format texte Prometheus."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Métrique déjà enregistrée: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: tuple = ()) -> Counter:
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: tuple = (), function=None) -> Gauge:
+        return self._register(Gauge(name, documentation, labels, function))
+
+    def histogram(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = LLM_LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+# --- Appels LLM (agents) ---
+LLM_REQUEST_SECONDS = metrics.histogram(
+    "llm_request_duration_seconds", "Durée des appels aux agents (attente en file comprise)", ("agent", "model", "mode"))
+LLM_FIRST_TOKEN_SECONDS = metrics.histogram(
+    "llm_first_token_seconds", "Délai avant le premier fragment d'une réponse streamée", ("agent", "model"))
+LLM_REQUESTS = metrics.counter(
+    "llm_requests_total", "Appels aux agents par issue (ok, cache, timeout, request_error, error)", ("agent", "model", "outcome"))
+LLM_FALLBACKS = metrics.counter(
+    "llm_fallbacks_total", "Réponses de repli renvoyées après un échec d'appel à Ollama", ("agent", "model", "reason"))
+LLM_QUEUE_WAIT_SECONDS = metrics.histogram(
+    "llm_queue_wait_seconds", "Attente d'un créneau de l'ordonnanceur LLM", ("model", "priority"), QUEUE_WAIT_BUCKETS)
+
+# --- Débit d'Ollama (champs prompt_eval_count / eval_count / *_duration des réponses) ---
+OLLAMA_PROMPT_TOKENS = metrics.counter("ollama_prompt_tokens_total", "Tokens de prompt évalués par Ollama", ("model",))
+OLLAMA_EVAL_TOKENS = metrics.counter("ollama_eval_tokens_total", "Tokens générés par Ollama", ("model",))
+OLLAMA_PROMPT_TOKENS_PER_SECOND = metrics.histogram(
+    "ollama_prompt_tokens_per_second", "Débit d'évaluation du prompt par appel", ("model",), TOKENS_PER_SECOND_BUCKETS)
+OLLAMA_EVAL_TOKENS_PER_SECOND = metrics.histogram(
+    "ollama_eval_tokens_per_second", "Débit de génération par appel", ("model",), TOKENS_PER_SECOND_BUCKETS)
+OLLAMA_LOAD_SECONDS = metrics.histogram(
+    "ollama_load_duration_seconds", "Chargement du modèle avant l'appel (load_duration)", ("model",), QUEUE_WAIT_BUCKETS)
+
+# --- Workflows, WebSocket, /execute ---
+WORKFLOW_QUEUE_WAIT_SECONDS = metrics.histogram(
+    "workflow_queue_wait_seconds", "Attente d'un worker par les jobs de workflow", (), QUEUE_WAIT_BUCKETS)
+WORKFLOW_JOBS = metrics.counter("workflow_jobs_total", "Jobs de workflow terminés par statut", ("status",))
+WEBSOCKET_CONNECTIONS = metrics.gauge("websocket_connections", "Connexions WebSocket ouvertes", ("endpoint",))
+WEBSOCKET_CONNECTIONS_TOTAL = metrics.counter("websocket_connections_total", "Connexions WebSocket acceptées", ("endpoint",))
+EXECUTE_SECONDS = metrics.histogram(
+    "execute_duration_seconds", "Durée des exécutions de code (/execute et /execute/ws)", ("language", "status", "cached"),
+    EXECUTE_BUCKETS)
+
+
+def observe_ollama_usage(model: str, data: dict):
+    """Compteurs de tokens et débits d'une réponse Ollama (durées en nanosecondes)."""
+    prompt_tokens, prompt_duration = data.get("prompt_eval_count") or 0, data.get("prompt_eval_duration") or 0
+    eval_tokens, eval_duration = data.get("eval_count") or 0, data.get("eval_duration") or 0
+    if prompt_tokens:
+        OLLAMA_PROMPT_TOKENS.inc(prompt_tokens, model=model)
+        if prompt_duration:
+            OLLAMA_PROMPT_TOKENS_PER_SECOND.observe(prompt_tokens / (prompt_duration / 1e9), model=model)
+    if eval_tokens:
+        OLLAMA_EVAL_TOKENS.inc(eval_tokens, model=model)
+        if eval_duration:
+            OLLAMA_EVAL_TOKENS_PER_SECOND.observe(eval_tokens / (eval_duration / 1e9), model=model)
+    if data.get("load_duration"):
+        OLLAMA_LOAD_SECONDS.observe(data["load_duration"] / 1e9, model=model)
@@ -0,0 +1,76 @@
+# app/common/model_affinity.py
+import os
+import logging
+from collections import OrderedDict
+from functools import lru_cache
+
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+MODELFILES_DIR = os.path.join(BACKEND_ROOT, "agents_modelfiles")
+
+# Nombre de modèles de base qui tiennent simultanément en RAM sur nos nœuds Ollama
+OLLAMA_RESIDENT_MODELS = int(os.environ.get("OLLAMA_RESIDENT_MODELS", "2"))
+
+# Modèle Ollama personnalisé -> Modelfile qui le construit
+MODELFILES = {
+    "agent-visionnaire": "visionnaire.modelfile",
+    "agent-architecte": "architecte.modelfile",
+    "agent-frontend-engineer": "frontend_engineer.modelfile",
+    "agent-backend-engineer": "backend_engineer.modelfile",
+    "agent-designer-ui-ux": "designer_ui_ux.modelfile",
+    "agent-seo-content-expert": "seo_content_expert.modelfile",
+    "agent-database-specialist": "database_specialist.modelfile",
+    "agent-deployer-devops": "deployer_devops.modelfile",
+    "agent-critique": "critique.modelfile",
+    "agent-optimiseur": "optimiseur.modelfile",
+    "agent-translator": "translator_agent.modelfile",
+    "agent-ingenieur": "ingenieur.modelfile",
+}
+
+
+@lru_cache(maxsize=None)
+def base_model_of(model: str) -> str:
+    """
+    Modèle de base (ligne FROM du Modelfile) d'un modèle personnalisé. Les modèles
+    qui partagent une base partagent leurs poids : passer de l'un à l'autre ne
+    coûte pas de rechargement. Sans Modelfile connu, le modèle est sa propre base.
+    """
+    modelfile = MODELFILES.get(model.removesuffix(":latest"))
+    if not modelfile:
+        return model
+    try:
+        with open(os.path.join(MODELFILES_DIR, modelfile), encoding="utf-8") as f:
+            for line in f:
+                if line.strip().upper().startswith("FROM "):
+                    return line.split("#", 1)[0].split(None, 1)[1].strip()
+    except (OSError, IndexError) as e:
+        logging.warning(f"[Affinity] Lecture du Modelfile {modelfile} impossible: {e}")
+    return model
+
+
+class ModelSwapTracker:
+    """
+    Simule la mémoire d'Ollama comme une LRU de `capacity` modèles de base et compte
+    les changements de modèle (chargement d'une base absente) au fil des appels.
+    """
+
+    def __init__(self, capacity: int = OLLAMA_RESIDENT_MODELS):
+        self.capacity = max(1, capacity)
+        self.resident = OrderedDict()
+        self.swaps = 0
+        self.calls = 0
+
+    def is_resident(self, model: str) -> bool:
+        return base_model_of(model) in self.resident
+
+    def record(self, model: str) -> bool:
+        """Enregistre un appel à `model`; retourne True s'il a provoqué un chargement."""
+        base = base_model_of(model)
+        self.calls += 1
+        if base in self.resident:
+            self.resident.move_to_end(base)
+            return False
+        self.swaps += 1
+        self.resident[base] = True
+        while len(self.resident) > self.capacity:
+            self.resident.popitem(last=False)
+        return True
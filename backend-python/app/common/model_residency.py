@@ -0,0 +1,113 @@
+# app/common/model_residency.py
+import os
+import asyncio
+import logging
+from collections import Counter
+
+from app.common.ollama_client import get_ollama_client
+from app.common.llm_scheduler import llm_scheduler, PRIORITY_BATCH
+
+# keep_alive envoyé à Ollama : long si le modèle resservira bientôt, court sinon
+OLLAMA_KEEP_ALIVE_HOT = os.environ.get("OLLAMA_KEEP_ALIVE_HOT", "30m")
+OLLAMA_KEEP_ALIVE_IDLE = os.environ.get("OLLAMA_KEEP_ALIVE_IDLE", "2m")
+# Modèles préchargés au démarrage du serveur (ceux des premières étapes du workflow)
+OLLAMA_WARMUP_MODELS = [m for m in os.environ.get("OLLAMA_WARMUP_MODELS", "agent-visionnaire,agent-architecte").split(",") if m]
+
+
+def _same_model(name: str, wanted: str) -> bool:
+    """Ollama suffixe les noms par un tag (":latest") : on compare sans le tag par défaut."""
+    return name == wanted or name == f"{wanted}:latest"
+
+
+class ModelResidencyManager:
+    """
+    Gère la présence en mémoire des modèles Ollama :
+    - préchargement (warm-up) des modèles dont un workflow va avoir besoin ;
+    - choix du keep_alive de chaque requête selon les utilisations encore prévues ;
+    - liste des modèles actuellement chargés (/api/ps).
+    """
+
+    def __init__(self, hot_keep_alive: str = OLLAMA_KEEP_ALIVE_HOT, idle_keep_alive: str = OLLAMA_KEEP_ALIVE_IDLE):
+        self.hot_keep_alive = hot_keep_alive
+        self.idle_keep_alive = idle_keep_alive
+        self._plans = {} # run_id -> Counter(modèle -> utilisations restantes)
+        self._warming = {} # modèle -> asyncio.Task
+
+    # --- Planification ---
+    def plan(self, run_id: str, models: list):
+        """Déclare les modèles qu'un workflow va utiliser (un élément par appel prévu)."""
+        self._plans[run_id] = Counter(models)
+
+    def consume(self, run_id: str, model: str):
+        """Signale qu'un appel prévu vient d'avoir lieu."""
+        plan = self._plans.get(run_id)
+        if plan and plan[model] > 0:
+            plan[model] -= 1
+
+    def finish(self, run_id: str):
+        self._plans.pop(run_id, None)
+
+    def upcoming_uses(self, model: str) -> int:
+        return sum(plan[model] for plan in self._plans.values())
+
+    def keep_alive_for(self, model: str) -> str:
+        """keep_alive à envoyer pour un appel à `model`, compte tenu des appels encore prévus."""
+        return self.hot_keep_alive if self.upcoming_uses(model) > 0 else self.idle_keep_alive
+
+    # --- Préchargement ---
+    async def _load(self, model: str, keep_alive: str, session_id: str = None):
+        try:
+            # Le chargement occupe un créneau de l'ordonnanceur : plafonné comme un appel, et
+            # compté dans ses chargements de modèle
+            async with llm_scheduler.slot(model, session_id or "prefetch", PRIORITY_BATCH):
+                # Une génération sans prompt charge le modèle sans rien produire
+                response = await get_ollama_client().post("/api/generate", json={"model": model, "prompt": "", "keep_alive": keep_alive}, timeout=300)
+                response.raise_for_status()
+            logging.info(f"[Residency] Modèle {model} chargé (keep_alive={keep_alive})")
+        except Exception as e:
+            logging.warning(f"[Residency] Préchargement de {model} impossible: {e}")
+        finally:
+            self._warming.pop(model, None)
+
+    def prefetch(self, models: list, keep_alive: str = None, session_id: str = None):
+        """Lance en arrière-plan le chargement des modèles (sans attendre), pour le compte de `session_id`."""
+        for model in models:
+            if model and model not in self._warming:
+                self._warming[model] = asyncio.create_task(self._load(model, keep_alive or self.hot_keep_alive, session_id))
+
+    async def warm_up(self, models: list):
+        """Précharge les modèles disponibles, l'un après l'autre pour ne pas saturer la RAM."""
+        available = await self.available_models()
+        for model in models:
+            if available is not None and not any(_same_model(name, model) for name in available):
+                logging.warning(f"[Residency] Modèle {model} absent d'Ollama, préchargement ignoré (ollama create {model} ...)")
+                continue
+            await self._load(model, self.hot_keep_alive)
+
+    # --- État ---
+    async def available_models(self):
+        """Modèles installés (/api/tags), ou None si Ollama ne répond pas."""
+        try:
+            response = await get_ollama_client().get("/api/tags", timeout=10)
+            response.raise_for_status()
+            return [m.get("name") for m in response.json().get("models", [])]
+        except Exception as e:
+            logging.warning(f"[Residency] Ollama indisponible: {e}")
+            return None
+
+    async def resident_models(self) -> list:
+        """Modèles actuellement chargés en mémoire par Ollama (/api/ps)."""
+        response = await get_ollama_client().get("/api/ps", timeout=10)
+        response.raise_for_status()
+        return [
+            {
+                "name": m.get("name"),
+                "expires_at": m.get("expires_at"),
+                "size_vram": m.get("size_vram"),
+                "upcoming_uses": self.upcoming_uses(m.get("name", "").removesuffix(":latest")),
+            }
+            for m in response.json().get("models", [])
+        ]
+
+
+model_residency = ModelResidencyManager()
@@ -0,0 +1,47 @@
+# app/common/ollama_client.py
+import os
+import logging
+
+import httpx
+
+OLLAMA_BASE_URL = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
+
+# Limites du pool de connexions partagé vers Ollama
+OLLAMA_MAX_CONNECTIONS = int(os.environ.get("OLLAMA_MAX_CONNECTIONS", "32"))
+OLLAMA_MAX_KEEPALIVE = int(os.environ.get("OLLAMA_MAX_KEEPALIVE", "16"))
+
+_client = None
+
+
+def get_ollama_client() -> httpx.AsyncClient:
+    """
+    Retourne le client HTTP asynchrone partagé par tout le processus.
+    Il est créé à la demande si le hook de démarrage n'a pas encore été appelé.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=OLLAMA_BASE_URL,
+            limits=httpx.Limits(
+                max_connections=OLLAMA_MAX_CONNECTIONS,
+                max_keepalive_connections=OLLAMA_MAX_KEEPALIVE,
+                keepalive_expiry=60,
+            ),
+            timeout=httpx.Timeout(180, connect=10),
+        )
+        logging.info(f"[Ollama] Client partagé créé ({OLLAMA_BASE_URL}, {OLLAMA_MAX_CONNECTIONS} connexions max)")
+    return _client
+
+
+async def start_ollama_client():
+    """Hook de démarrage FastAPI : ouvre le pool de connexions."""
+    get_ollama_client()
+
+
+async def close_ollama_client():
+    """Hook d'arrêt FastAPI : ferme proprement toutes les connexions du pool."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        logging.info("[Ollama] Client partagé fermé")
@@ -0,0 +1,297 @@
+# app/common/projects.py
+import json
+import uuid
+import base64
+import sqlite3
+from datetime import datetime, timezone
+
+from app.common.code_fences import language_for_path
+from app.common.file_versions import record_version, delete_versions
+from app.common import search_index
+
+PROJECTS_DEFAULT_LIMIT = 100
+PROJECTS_MAX_LIMIT = 1000
+FILES_DEFAULT_LIMIT = 500
+FILES_MAX_LIMIT = 5000
+
+# Mêmes tables que la base d'origine. L'index des fichiers couvre les colonnes listées :
+# un listing ne lit jamais les lignes de la table (ni le contenu, stocké dans la ligne).
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT,
+    language TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    is_shared BOOLEAN DEFAULT FALSE
+);
+CREATE TABLE IF NOT EXISTS files (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    content TEXT,
+    language TEXT,
+    size INTEGER,
+    last_modified TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    version INTEGER DEFAULT 1,
+    project_id TEXT,
+    FOREIGN KEY (project_id) REFERENCES projects (id)
+);
+CREATE INDEX IF NOT EXISTS idx_files_project_path
+    ON files (project_id, path, id, name, language, size, last_modified, version);
+CREATE INDEX IF NOT EXISTS idx_projects_updated ON projects (updated_at DESC, id DESC);
+"""
+
+_FILE_COLUMNS = "id, name, path, language, size, last_modified, version, project_id"
+_PROJECT_COLUMNS = "id, name, description, language, created_at, updated_at, is_shared"
+
+_schema_ready = False
+
+
+def _ensure_schema(conn: sqlite3.Connection):
+    global _schema_ready
+    if not _schema_ready:
+        conn.executescript(_SCHEMA)
+        _schema_ready = True
+
+
+def _now() -> str:
+    """Horodatage UTC au format de CURRENT_TIMESTAMP (plus les millisecondes) : même ordre de tri."""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
+
+def _iso(timestamp) -> str:
+    """"2024-05-01 12:00:00.123" (UTC) -> "2024-05-01T12:00:00.123Z" pour le frontend."""
+    if not timestamp:
+        return timestamp
+    return str(timestamp).replace(" ", "T") + ("" if str(timestamp).endswith("Z") else "Z")
+
+
+def encode_cursor(values: list) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    """Valeurs de clé d'un curseur ; lève ValueError s'il est invalide."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception as e:
+        raise ValueError(f"Curseur invalide: {e}")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Curseur invalide")
+    if any(isinstance(value, bool) or not isinstance(value, (str, int)) for value in values):
+        raise ValueError("Curseur invalide: valeurs de clé attendues (texte ou entier)")
+    return values
+
+
+def _begin_write(conn):
+    """
+    Prend le verrou d'écriture avant les vérifications de chemin : deux créations ou
+    renommages concurrents (connexions différentes du pool) ne peuvent pas passer
+    tous deux la vérification puis écrire le même chemin.
+    """
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+
+
+def project_to_dict(row) -> dict:
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "description": row["description"] or "",
+        "language": row["language"],
+        "createdAt": _iso(row["created_at"]),
+        "updatedAt": _iso(row["updated_at"]),
+        "isShared": bool(row["is_shared"]),
+        "files": [], # Chargés à part : GET /api/projects/{id}/files
+    }
+
+
+def file_to_dict(row, content: str = None) -> dict:
+    data = {
+        "id": row["id"],
+        "name": row["name"],
+        "path": row["path"],
+        "language": row["language"],
+        "size": row["size"] or 0,
+        "lastModified": _iso(row["last_modified"]),
+        "version": row["version"] or 1,
+        "projectId": row["project_id"],
+    }
+    if content is not None:
+        data["content"] = content
+    return data
+
+
+# --- Projets ---
+
+def list_projects(conn, cursor: str = None, limit: int = PROJECTS_DEFAULT_LIMIT) -> tuple:
+    """Projets du plus récemment modifié au plus ancien (keyset sur updated_at, id). Retourne (projets, curseur suivant)."""
+    _ensure_schema(conn)
+    limit = max(1, min(limit, PROJECTS_MAX_LIMIT))
+    where, params = "", []
+    if cursor:
+        updated_at, project_id = decode_cursor(cursor, 2)
+        where = "WHERE (updated_at, id) < (?, ?)" # Comparaison de n-uplets : parcours d'index depuis le curseur
+        params = [updated_at, project_id]
+    rows = conn.execute(
+        f"SELECT {_PROJECT_COLUMNS} FROM projects {where} ORDER BY updated_at DESC, id DESC LIMIT ?",
+        params + [limit + 1]
+    ).fetchall()
+    next_cursor = encode_cursor([rows[limit - 1]["updated_at"], rows[limit - 1]["id"]]) if len(rows) > limit else None
+    return [project_to_dict(row) for row in rows[:limit]], next_cursor
+
+
+def get_project(conn, project_id: str):
+    _ensure_schema(conn)
+    row = conn.execute(f"SELECT {_PROJECT_COLUMNS} FROM projects WHERE id = ?", (project_id,)).fetchone()
+    return project_to_dict(row) if row else None
+
+
+def create_project(conn, name: str, description: str = "", language: str = None, is_shared: bool = False,
+                   files: list = None) -> dict:
+    """Crée un projet et ses fichiers initiaux éventuels ({name, path, content, language})."""
+    _ensure_schema(conn)
+    project_id = str(uuid.uuid4())
+    now = _now()
+    conn.execute(
+        "INSERT INTO projects (id, name, description, language, created_at, updated_at, is_shared) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (project_id, name, description, language, now, now, bool(is_shared))
+    )
+    project = get_project(conn, project_id)
+    project["files"] = [
+        create_file(conn, project_id, file.get("name") or file.get("path"), file.get("path"),
+                    file.get("content") or "", file.get("language"))
+        for file in files or []
+        if file.get("name") or file.get("path")
+    ]
+    return project
+
+
+def update_project(conn, project_id: str, fields: dict):
+    """Met à jour les champs fournis (name, description, language, is_shared). Retourne le projet ou None."""
+    _ensure_schema(conn)
+    allowed = {key: value for key, value in fields.items() if key in ("name", "description", "language", "is_shared")}
+    assignments = ", ".join(f"{column} = ?" for column in allowed)
+    cursor = conn.execute(
+        f"UPDATE projects SET {assignments + ', ' if assignments else ''}updated_at = ? WHERE id = ?",
+        list(allowed.values()) + [_now(), project_id]
+    )
+    return get_project(conn, project_id) if cursor.rowcount else None
+
+
+def delete_project(conn, project_id: str) -> bool:
+    _ensure_schema(conn)
+    file_ids = [row[0] for row in conn.execute("SELECT id FROM files WHERE project_id = ?", (project_id,))]
+    delete_versions(conn, file_ids)
+    search_index.remove_documents(conn, search_index.SOURCE_FILE, file_ids)
+    conn.execute("DELETE FROM files WHERE project_id = ?", (project_id,))
+    return conn.execute("DELETE FROM projects WHERE id = ?", (project_id,)).rowcount > 0
+
+
+def _touch_project(conn, project_id: str, timestamp: str):
+    conn.execute("UPDATE projects SET updated_at = ? WHERE id = ?", (timestamp, project_id))
+
+
+# --- Fichiers ---
+
+def _index_file(conn, project_id: str, file_id: str):
+    row = conn.execute("SELECT path, content, language FROM files WHERE id = ?", (file_id,)).fetchone()
+    search_index.index_document(conn, search_index.SOURCE_FILE, file_id, row["path"], row["content"] or "",
+                                project_id=project_id, language=row["language"])
+
+
+def list_files(conn, project_id: str, cursor: str = None, limit: int = FILES_DEFAULT_LIMIT) -> tuple:
+    """
+    Métadonnées des fichiers d'un projet, par chemin (keyset sur path, id), sans leur
+    contenu. Retourne (fichiers, curseur suivant ou None).
+    """
+    _ensure_schema(conn)
+    limit = max(1, min(limit, FILES_MAX_LIMIT))
+    clause, params = "", [project_id]
+    if cursor:
+        path, file_id = decode_cursor(cursor, 2)
+        clause = "AND (path, id) > (?, ?)" # Comparaison de n-uplets : recherche directe dans l'index
+        params += [path, file_id]
+    rows = conn.execute(
+        f"SELECT {_FILE_COLUMNS} FROM files WHERE project_id = ? {clause} ORDER BY path, id LIMIT ?",
+        params + [limit + 1]
+    ).fetchall()
+    next_cursor = encode_cursor([rows[limit - 1]["path"], rows[limit - 1]["id"]]) if len(rows) > limit else None
+    return [file_to_dict(row) for row in rows[:limit]], next_cursor
+
+
+def get_file(conn, project_id: str, file_id: str, with_content: bool = True):
+    _ensure_schema(conn)
+    columns = _FILE_COLUMNS + (", content" if with_content else "")
+    row = conn.execute(f"SELECT {columns} FROM files WHERE id = ? AND project_id = ?", (file_id, project_id)).fetchone()
+    if row is None:
+        return None
+    return file_to_dict(row, (row["content"] or "") if with_content else None)
+
+
+def create_file(conn, project_id: str, name: str, path: str = None, content: str = "", language: str = None) -> dict:
+    """Crée un fichier. Lève LookupError si le projet n'existe pas, FileExistsError si le chemin est pris."""
+    _ensure_schema(conn)
+    if conn.execute("SELECT 1 FROM projects WHERE id = ?", (project_id,)).fetchone() is None:
+        raise LookupError(project_id)
+    path = path or name
+    _begin_write(conn)
+    if conn.execute("SELECT 1 FROM files WHERE project_id = ? AND path = ? LIMIT 1", (project_id, path)).fetchone():
+        raise FileExistsError(path)
+    file_id = str(uuid.uuid4())
+    now = _now()
+    conn.execute(
+        "INSERT INTO files (id, name, path, content, language, size, last_modified, version, project_id) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?)",
+        (file_id, name, path, content, language or language_for_path(path), len(content.encode("utf-8")), now, project_id)
+    )
+    record_version(conn, file_id, 1, content)
+    _index_file(conn, project_id, file_id)
+    _touch_project(conn, project_id, now)
+    return get_file(conn, project_id, file_id)
+
+
+def update_file(conn, project_id: str, file_id: str, fields: dict):
+    """
+    Met à jour le contenu et/ou name, path, language d'un fichier ; un nouveau contenu
+    incrémente la version, enregistrée dans l'historique (delta par rapport à la précédente).
+    Retourne le fichier ou None ; FileExistsError si le chemin est pris.
+    """
+    _ensure_schema(conn)
+    _begin_write(conn)
+    current = conn.execute(
+        "SELECT path, content, version FROM files WHERE id = ? AND project_id = ?", (file_id, project_id)
+    ).fetchone()
+    if current is None:
+        return None
+    allowed = {key: value for key, value in fields.items() if key in ("name", "path", "language") and value is not None}
+    if "path" in allowed and allowed["path"] != current["path"]:
+        if conn.execute("SELECT 1 FROM files WHERE project_id = ? AND path = ? LIMIT 1", (project_id, allowed["path"])).fetchone():
+            raise FileExistsError(allowed["path"])
+    assignments, params = [f"{column} = ?" for column in allowed], list(allowed.values())
+    content = fields.get("content")
+    if content is not None:
+        assignments += ["content = ?", "size = ?", "version = version + 1"]
+        params += [content, len(content.encode("utf-8"))]
+    now = _now()
+    conn.execute(
+        f"UPDATE files SET {', '.join(assignments + ['last_modified = ?'])} WHERE id = ? AND project_id = ?",
+        params + [now, file_id, project_id]
+    )
+    if content is not None:
+        record_version(conn, file_id, (current["version"] or 1) + 1, content, current["content"] or "")
+    _index_file(conn, project_id, file_id)
+    _touch_project(conn, project_id, now)
+    return get_file(conn, project_id, file_id)
+
+
+def delete_file(conn, project_id: str, file_id: str) -> bool:
+    _ensure_schema(conn)
+    deleted = conn.execute("DELETE FROM files WHERE id = ? AND project_id = ?", (file_id, project_id)).rowcount > 0
+    if deleted:
+        delete_versions(conn, [file_id])
+        search_index.remove_documents(conn, search_index.SOURCE_FILE, [file_id])
+        _touch_project(conn, project_id, _now())
+    return deleted
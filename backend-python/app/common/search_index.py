@@ -0,0 +1,207 @@
+# app/common/search_index.py
+import os
+import html
+import logging
+import sqlite3
+from urllib.parse import quote
+
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+# Au-delà, seul le début du fichier est indexé
+SEARCH_MAX_DOCUMENT_BYTES = int(os.environ.get("SEARCH_MAX_DOCUMENT_BYTES", str(1024 * 1024)))
+SNIPPET_TOKENS = 16
+SNIPPET_START, SNIPPET_END, SNIPPET_ELLIPSIS = "<mark>", "</mark>", "…"
+# Marqueurs demandés à snippet() (caractères à usage privé), remplacés par <mark></mark>
+# une fois le texte de l'extrait échappé pour HTML
+_SNIPPET_OPEN, _SNIPPET_CLOSE = "\ue000", "\ue001"
+
+SOURCE_ARTIFACT = "artifact" # Fichier généré (generated_code/<session>/<chemin>)
+SOURCE_FILE = "file"         # Fichier d'un projet (table files)
+
+# Index plein texte (FTS5) : chemin et contenu. Les métadonnées de filtrage sont dans
+# search_documents, dont l'id sert de rowid à l'index (mise à jour sans parcours de l'index).
+# "_" sépare les termes : "user" trouve load_user_profile, et "load_user_profile" est
+# cherché comme une phrase (termes consécutifs) ; index de préfixes pour "term*".
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_documents (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    key TEXT NOT NULL,
+    session_id TEXT,
+    project_id TEXT,
+    path TEXT NOT NULL,
+    agent TEXT,
+    language TEXT,
+    UNIQUE (source, key)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+    path, content, tokenize = "unicode61 remove_diacritics 2", prefix = '2 3'
+);
+"""
+
+_schema_ready = False
+
+
+def _ensure_schema(conn: sqlite3.Connection):
+    global _schema_ready
+    if not _schema_ready:
+        row = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'search_index'").fetchone()
+        if row is not None and "tokenchars" in row[0]:
+            # Index créé avec l'ancien tokenizer : supprimé, puis reconstruit au démarrage (is_empty)
+            logging.info("[SearchIndex] Tokenizer modifié : l'index de recherche sera reconstruit")
+            conn.executescript("DROP TABLE search_index; DROP TABLE IF EXISTS search_documents;")
+        conn.executescript(_SCHEMA)
+        _schema_ready = True
+
+
+def _text(content):
+    """Texte indexable d'un contenu, ou None pour un fichier binaire."""
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    content = content[:SEARCH_MAX_DOCUMENT_BYTES]
+    if b"\0" in content[:8192]:
+        return None
+    return content.decode("utf-8", errors="ignore")
+
+
+def index_document(conn, source: str, key: str, path: str, content, session_id: str = None,
+                   project_id: str = None, agent: str = None, language: str = None):
+    """Ajoute ou remplace un document de l'index (dans la transaction de l'écriture)."""
+    _ensure_schema(conn)
+    text = _text(content)
+    if text is None:
+        remove_documents(conn, source, [key])
+        return
+    row = conn.execute("SELECT id FROM search_documents WHERE source = ? AND key = ?", (source, key)).fetchone()
+    if row is not None:
+        conn.execute("DELETE FROM search_index WHERE rowid = ?", (row[0],))
+        conn.execute(
+            "UPDATE search_documents SET session_id = ?, project_id = ?, path = ?, agent = ?, language = ? WHERE id = ?",
+            (session_id, project_id, path, agent, language, row[0])
+        )
+        document_id = row[0]
+    else:
+        document_id = conn.execute(
+            "INSERT INTO search_documents (source, key, session_id, project_id, path, agent, language) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (source, key, session_id, project_id, path, agent, language)
+        ).lastrowid
+    conn.execute("INSERT INTO search_index (rowid, path, content) VALUES (?, ?, ?)", (document_id, path, text))
+
+
+def remove_documents(conn, source: str, keys: list):
+    _ensure_schema(conn)
+    for key in keys:
+        row = conn.execute("SELECT id FROM search_documents WHERE source = ? AND key = ?", (source, key)).fetchone()
+        if row is not None:
+            conn.execute("DELETE FROM search_index WHERE rowid = ?", (row[0],))
+            conn.execute("DELETE FROM search_documents WHERE id = ?", (row[0],))
+
+
+def artifact_key(session_id: str, path: str) -> str:
+    return f"{session_id}/{path}"
+
+
+def build_match(query: str) -> str:
+    """
+    Expression FTS5 d'une recherche saisie : chaque mot est cherché tel quel (tous
+    requis), un `*` final cherche le préfixe. Lève ValueError si la recherche est vide.
+    """
+    terms = []
+    for word in query.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*")
+        if word:
+            terms.append('"' + word.replace('"', '""') + '"' + ("*" if prefix else ""))
+    if not terms:
+        raise ValueError("Recherche vide")
+    return " ".join(terms)
+
+
+def search(conn, query: str, session_id: str = None, agent: str = None, language: str = None,
+           source: str = None, project_id: str = None, limit: int = SEARCH_DEFAULT_LIMIT, offset: int = 0) -> list:
+    """
+    Documents correspondant à `query`, du plus pertinent au moins pertinent (BM25, le
+    chemin pèse plus que le contenu), avec un extrait échappé pour HTML où les termes
+    sont entourés de <mark></mark>. Lève ValueError si la recherche est invalide.
+    """
+    _ensure_schema(conn)
+    clauses, params = ["search_index MATCH ?"], [build_match(query)]
+    for column, value in (("session_id", session_id), ("agent", agent), ("language", language),
+                          ("source", source), ("project_id", project_id)):
+        if value:
+            clauses.append(f"d.{column} = ?")
+            params.append(value)
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    try:
+        rows = conn.execute(
+            "SELECT d.source, d.key, d.session_id, d.project_id, d.path, d.agent, d.language, "
+            f"snippet(search_index, 1, ?, ?, ?, {SNIPPET_TOKENS}) AS snippet, bm25(search_index, 4.0, 1.0) AS score "
+            f"FROM search_index JOIN search_documents d ON d.id = search_index.rowid "
+            f"WHERE {' AND '.join(clauses)} ORDER BY score LIMIT ? OFFSET ?",
+            [_SNIPPET_OPEN, _SNIPPET_CLOSE, SNIPPET_ELLIPSIS] + params + [limit, max(0, offset)]
+        ).fetchall()
+    except sqlite3.OperationalError as e:
+        raise ValueError(f"Recherche invalide: {e}")
+    results = []
+    for row in rows:
+        result = {
+            "source": row["source"],
+            "path": row["path"],
+            "agent": row["agent"],
+            "language": row["language"],
+            "snippet": _snippet_html(row["snippet"]),
+            "score": round(-row["score"], 4), # bm25() est négatif : plus petit = plus pertinent
+        }
+        if row["source"] == SOURCE_FILE:
+            result.update(project_id=row["project_id"], file_id=row["key"],
+                          content_url=f"/api/projects/{quote(row['project_id'], safe='')}/files/{quote(row['key'], safe='')}")
+        else:
+            result.update(session_id=row["session_id"],
+                          content_url=f"/get_code_content?session_id={quote(row['session_id'], safe='')}"
+                                      f"&file_path={quote(row['path'], safe='')}",
+                          raw_url=f"/files/{quote(row['session_id'], safe='')}/{quote(row['path'])}")
+        results.append(result)
+    return results
+
+
+def _snippet_html(snippet: str) -> str:
+    """Extrait du contenu indexé (texte brut non fiable) échappé, termes trouvés entre <mark></mark>."""
+    if not snippet:
+        return ""
+    escaped = html.escape(snippet)
+    return escaped.replace(_SNIPPET_OPEN, SNIPPET_START).replace(_SNIPPET_CLOSE, SNIPPET_END)
+
+
+def _has_table(conn, name: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+
+def is_empty(conn) -> bool:
+    _ensure_schema(conn)
+    return conn.execute("SELECT 1 FROM search_documents LIMIT 1").fetchone() is None
+
+
+def rebuild(conn, store) -> int:
+    """
+    Indexe les fichiers générés (d'après l'index des artefacts, contenus lus sur disque)
+    et les fichiers de projets. Sert aux données antérieures à l'index de recherche.
+    """
+    _ensure_schema(conn)
+    count = 0
+    artifacts = conn.execute("SELECT session_id, path, agent, language FROM artifacts").fetchall() if _has_table(conn, "artifacts") else []
+    for row in artifacts:
+        try:
+            with open(os.path.join(store.session_dir(row["session_id"]), row["path"]), "rb") as f:
+                content = f.read(SEARCH_MAX_DOCUMENT_BYTES)
+        except OSError:
+            continue
+        index_document(conn, SOURCE_ARTIFACT, artifact_key(row["session_id"], row["path"]), row["path"], content,
+                       session_id=row["session_id"], agent=row["agent"], language=row["language"])
+        count += 1
+    if _has_table(conn, "files"):
+        for row in conn.execute("SELECT id, project_id, path, content, language FROM files"):
+            index_document(conn, SOURCE_FILE, row["id"], row["path"], row["content"] or "",
+                           project_id=row["project_id"], language=row["language"])
+            count += 1
+    logging.info(f"[SearchIndex] Index de recherche reconstruit : {count} document(s)")
+    return count
@@ -0,0 +1,90 @@
+# app/common/stage_graph.py
+import asyncio
+import logging
+
+
+class Stage:
+    """Étape d'un workflow : une coroutine et la liste des étapes dont elle dépend."""
+
+    def __init__(self, name: str, func, depends_on: list = None, agent_name: str = None):
+        self.name = name
+        self.func = func # Fonction async sans argument qui exécute l'étape
+        self.depends_on = list(depends_on or [])
+        self.agent_name = agent_name # Agent principal de l'étape (informatif)
+
+
+class StageGraph:
+    """
+    Exécute un ensemble d'étapes sous forme de graphe de dépendances (DAG).
+
+    Dès que toutes les dépendances d'une étape sont terminées, elle est lancée,
+    en parallèle des autres étapes prêtes, dans la limite de `max_concurrency`.
+    Quand il y a plus d'étapes prêtes que de places, `order_ready` (facultatif)
+    choisit l'ordre de lancement ; sinon l'ordre de déclaration est respecté.
+    Après chaque étape réussie, `on_stage_done` (coroutine facultative) est attendu
+    avec le nom de l'étape, par exemple pour enregistrer un checkpoint.
+    """
+
+    def __init__(self, max_concurrency: int = 3, order_ready=None, on_stage_done=None):
+        self.max_concurrency = max(1, max_concurrency)
+        self.order_ready = order_ready # Callable(list[Stage]) -> list[Stage]
+        self.on_stage_done = on_stage_done # Callable(str) -> coroutine
+        self.stages = {}
+
+    def add_stage(self, name: str, func, depends_on: list = None, agent_name: str = None) -> Stage:
+        """Déclare une étape. Les dépendances doivent être déclarées avant elle."""
+        if name in self.stages:
+            raise ValueError(f"Étape '{name}' déjà déclarée")
+        for dependency in depends_on or []:
+            if dependency not in self.stages:
+                raise ValueError(f"Étape '{name}' dépend de '{dependency}' qui n'est pas déclarée")
+        stage = Stage(name, func, depends_on, agent_name)
+        self.stages[name] = stage
+        return stage
+
+    def dependents(self, name: str) -> list:
+        """Étapes qui dépendent directement de `name`."""
+        return [stage for stage in self.stages.values() if name in stage.depends_on]
+
+    def _ready_stages(self, pending: dict, done: set) -> list:
+        """Retourne les étapes en attente dont toutes les dépendances sont terminées."""
+        return [stage for stage in pending.values() if all(dep in done for dep in stage.depends_on)]
+
+    async def run(self, completed=None):
+        """
+        Exécute toutes les étapes, sauf celles de `completed` (déjà terminées lors
+        d'une exécution précédente). Si une étape lève une exception, les étapes
+        en cours sont annulées et l'exception est propagée.
+        """
+        done = set(completed or []) & set(self.stages)
+        pending = {name: stage for name, stage in self.stages.items() if name not in done}
+        running = {}
+
+        try:
+            while pending or running:
+                free_slots = self.max_concurrency - len(running)
+                ready = self._ready_stages(pending, done)
+                if self.order_ready and len(ready) > 1:
+                    ready = self.order_ready(ready)
+                for stage in ready[:free_slots]:
+                    logging.info(f"[StageGraph] Lancement de l'étape '{stage.name}'")
+                    task = asyncio.create_task(stage.func(), name=f"stage:{stage.name}")
+                    running[task] = stage
+                    del pending[stage.name]
+
+                if not running:
+                    # Aucune étape lançable alors qu'il en reste : dépendance impossible à satisfaire
+                    raise RuntimeError(f"Étapes bloquées: {list(pending)}")
+
+                finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    stage = running.pop(task)
+                    task.result() # Propage l'exception éventuelle de l'étape
+                    done.add(stage.name)
+                    if self.on_stage_done:
+                        await self.on_stage_done(stage.name)
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
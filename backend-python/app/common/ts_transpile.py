@@ -0,0 +1,164 @@
+# app/common/ts_transpile.py
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import tempfile
+
+from app.common.db import BACKEND_ROOT
+from app.common.artifact_store import atomic_write_bytes
+from app.common.exec_pool import WORKERS_DIR
+
+# Cache disque du JavaScript produit, par empreinte du source (et version du compilateur)
+TS_CACHE_DIR = os.environ.get("TS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "ts-transpile-cache"))
+TS_CACHE_MAX_AGE = float(os.environ.get("TS_CACHE_MAX_AGE_DAYS", "7")) * 86400
+TS_TRANSPILE_TIMEOUT = 10
+# Dossiers où chercher le paquet `typescript` (TYPESCRIPT_PATH, puis le frontend qui l'a en dépendance)
+TYPESCRIPT_SEARCH_PATHS = [path for path in os.environ.get("TYPESCRIPT_PATH", "").split(os.pathsep) if path] + [
+    os.path.join(os.path.dirname(BACKEND_ROOT), "Frontend"),
+    BACKEND_ROOT,
+]
+# À incrémenter si les options de compilation de ts_transpiler.js changent
+TRANSPILE_OPTIONS_VERSION = "1"
+
+
+class TranspileError(Exception):
+    """Erreur de syntaxe TypeScript (diagnostics du compilateur)."""
+
+
+def _read_cached(path: str):
+    try:
+        with open(path, encoding="utf-8") as f:
+            output = f.read()
+    except FileNotFoundError:
+        return None
+    try:
+        os.utime(path) # Date d'accès pour l'élagage
+    except OSError:
+        pass
+    return output
+
+
+def _prune_cache(directory: str, max_age: float) -> int:
+    """Supprime les entrées du cache inutilisées depuis `max_age` secondes."""
+    removed = 0
+    limit = time.time() - max_age
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                if os.stat(path).st_mtime < limit:
+                    os.unlink(path)
+                    removed += 1
+            except OSError:
+                continue
+    return removed
+
+
+class TypeScriptTranspiler:
+    """
+    Service de transpilation TypeScript : un processus Node garde le compilateur chargé
+    et retire les types des extraits (sans vérification), le résultat est mis en cache sur
+    disque. Si le paquet `typescript` est introuvable, `transpile` retourne None et
+    /execute garde l'exécuteur `npx ts-node`.
+    """
+
+    def __init__(self, cache_dir: str = TS_CACHE_DIR, search_paths: list = None):
+        self.cache_dir = cache_dir
+        self.search_paths = search_paths or TYPESCRIPT_SEARCH_PATHS
+        self.version = None
+        self.available = None # None : pas encore démarré
+        self._process = None
+        self._lock = asyncio.Lock()
+
+    async def _ensure_started(self) -> bool:
+        if self._process is not None and self._process.returncode is None:
+            return True
+        if self.available is False:
+            return False
+        try:
+            self._process = await asyncio.create_subprocess_exec(
+                "node", os.path.join(WORKERS_DIR, "ts_transpiler.js"), *self.search_paths,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+                limit=16 * 1024 * 1024,
+            )
+            ready = json.loads(await asyncio.wait_for(self._process.stdout.readline(), timeout=TS_TRANSPILE_TIMEOUT) or b"{}")
+        except (OSError, ValueError, asyncio.TimeoutError) as e:
+            ready = {"ready": False, "error": str(e) or type(e).__name__}
+        if not ready.get("ready"):
+            logging.warning(f"[TypeScript] Transpilation indisponible, repli sur ts-node: {ready.get('error', 'service arrêté')}")
+            await self._kill()
+            self.available = False
+            return False
+        self.version = ready.get("version")
+        self.available = True
+        logging.info(f"[TypeScript] Service de transpilation prêt (typescript {self.version})")
+        return True
+
+    async def start(self):
+        async with self._lock:
+            await self._ensure_started()
+        await asyncio.to_thread(_prune_cache, self.cache_dir, TS_CACHE_MAX_AGE)
+
+    def _cache_path(self, code: str) -> str:
+        key = hashlib.sha256(f"{self.version}\0{TRANSPILE_OPTIONS_VERSION}\0{code}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], f"{key}.js")
+
+    async def _request(self, code: str) -> dict:
+        self._process.stdin.write((json.dumps({"code": code, "file": "snippet.ts"}) + "\n").encode("utf-8"))
+        await self._process.stdin.drain()
+        line = await self._process.stdout.readline()
+        if not line:
+            raise ConnectionError("service de transpilation arrêté")
+        return json.loads(line)
+
+    async def transpile(self, code: str):
+        """
+        JavaScript (CommonJS) correspondant à `code`, ou None si le service est
+        indisponible. Lève TranspileError pour une erreur de syntaxe.
+        """
+        if self.available is False:
+            return None
+        async with self._lock:
+            if not await self._ensure_started():
+                return None
+        cache_path = self._cache_path(code)
+        output = await asyncio.to_thread(_read_cached, cache_path)
+        if output is not None:
+            return output
+
+        async with self._lock:
+            if not await self._ensure_started():
+                return None
+            try:
+                response = await asyncio.wait_for(self._request(code), timeout=TS_TRANSPILE_TIMEOUT)
+            except (asyncio.TimeoutError, ConnectionError, ValueError, OSError) as e:
+                # Service bloqué ou arrêté : redémarré à la prochaine demande
+                logging.warning(f"[TypeScript] Échec de la transpilation: {e or type(e).__name__}")
+                await self._kill()
+                return None
+        if "error" in response:
+            raise TranspileError(response["error"])
+        output = response["output"]
+        await asyncio.to_thread(atomic_write_bytes, cache_path, output.encode("utf-8"))
+        return output
+
+    async def _kill(self):
+        if self._process is not None and self._process.returncode is None:
+            try:
+                self._process.kill()
+            except ProcessLookupError:
+                pass
+            await self._process.wait()
+        self._process = None
+
+    async def stop(self):
+        async with self._lock:
+            await self._kill()
+
+
+ts_transpiler = TypeScriptTranspiler()
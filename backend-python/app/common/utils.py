@@ -1,8 +1,11 @@
 # app/common/utils.py
 import json
+import time
 from datetime import datetime
 from fastapi import WebSocket
 
+from app.common.code_fences import parse_code_blocks
+
 async def send_agent_message(agent_name: str, status: str, content: str, stage: str, websocket: WebSocket, elapsed: float = None):
     """
     Envoie un message d'agent via WebSocket avec un format standardisé.
@@ -26,10 +29,71 @@ async def send_agent_message(agent_name: str, status: str, content: str, stage:
     }
     
     try:
-        await websocket.send_text(json.dumps(message, ensure_ascii=False))
+        await websocket.send_json(message)
     except Exception as e:
         print(f"Erreur lors de l'envoi du message WebSocket: {e}")
 
+async def send_agent_delta(agent_name: str, delta: str, stage: str, websocket: WebSocket, seq: int = 0):
+    """
+    Envoie un fragment de réponse d'agent (streaming) via WebSocket.
+
+    Args:
+        agent_name: Nom de l'agent
+        delta: Texte généré depuis le fragment précédent
+        stage: Étape du workflow
+        websocket: Connexion WebSocket
+        seq: Numéro d'ordre du fragment pour cet agent et cette étape
+    """
+    message = {
+        "type": "agent_delta",
+        "agent": agent_name,
+        "delta": delta,
+        "stage": stage,
+        "seq": seq,
+        "timestamp": datetime.now().isoformat()
+    }
+
+    try:
+        await websocket.send_json(message)
+    except Exception as e:
+        print(f"Erreur lors de l'envoi du fragment WebSocket: {e}")
+
+class AgentDeltaBatcher:
+    """
+    Regroupe les tokens streamés par un agent et les envoie en messages `agent_delta`
+    dès que `max_chars` caractères sont accumulés ou que `max_delay` secondes se
+    sont écoulées depuis le dernier envoi, pour ne pas inonder le WebSocket.
+    """
+
+    def __init__(self, agent_name: str, stage: str, websocket: WebSocket, max_delay: float = 0.1, max_chars: int = 256):
+        self.agent_name = agent_name
+        self.stage = stage
+        self.websocket = websocket
+        self.max_delay = max_delay
+        self.max_chars = max_chars
+        self.buffer = []
+        self.buffered_chars = 0
+        self.seq = 0
+        self.last_flush = time.monotonic()
+
+    async def push(self, delta: str):
+        """Ajoute un fragment au tampon et l'envoie si la fenêtre est pleine."""
+        self.buffer.append(delta)
+        self.buffered_chars += len(delta)
+        if self.buffered_chars >= self.max_chars or time.monotonic() - self.last_flush >= self.max_delay:
+            await self.flush()
+
+    async def flush(self):
+        """Envoie le contenu du tampon s'il n'est pas vide."""
+        self.last_flush = time.monotonic()
+        if not self.buffer:
+            return
+        text = "".join(self.buffer)
+        self.buffer = []
+        self.buffered_chars = 0
+        await send_agent_delta(self.agent_name, text, self.stage, self.websocket, self.seq)
+        self.seq += 1
+
 def format_agent_response(agent_name: str, role: str, content: str, execution_time: float = None) -> str:
     """
     Formate une réponse d'agent de manière standardisée.
@@ -60,19 +124,16 @@ def extract_code_blocks(text: str) -> dict:
     Returns:
         Dictionnaire {langage: code}
     """
-    import re
-    
-    # Pattern pour matcher les blocs de code ```langage ... ```
-    pattern = r'```(\w+)\s*\n(.*?)\n```'
-    matches = re.findall(pattern, text, re.DOTALL)
-    
     code_blocks = {}
-    for language, code in matches:
+    for block in parse_code_blocks(text):
+        language, code = block.language, block.code
+        if not language:
+            continue
         if language in code_blocks:
             # Si le langage existe déjà, on concatène
-            code_blocks[language] += f"\n\n# --- Bloc additionnel ---\n\n{code.strip()}"
+            code_blocks[language] += f"\n\n# --- Bloc additionnel ---\n\n{code}"
         else:
-            code_blocks[language] = code.strip()
+            code_blocks[language] = code
     
     return code_blocks
 
@@ -12,22 +12,46 @@ if project_root not in sys.path:
 
 # Imports des modules de votre application
 # Ces imports sont maintenant absolus par rapport à la racine du projet qui est dans sys.path
-from app.agents import agents, get_agent_by_name
-from app.common.utils import send_agent_message
-
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from app.agents import agents, get_agent_by_name, agent_registry
+from app.workflow import submit_workflow_job, resume_interrupted_workflow, workflow_result
+from app.common.job_queue import job_queue, JobQueueFull
+from app.common.ollama_client import start_ollama_client, close_ollama_client
+from app.common.llm_scheduler import llm_scheduler, PRIORITY_INTERACTIVE
+from app.common.model_residency import model_residency, OLLAMA_WARMUP_MODELS
+from app.common.artifact_store import artifact_store, is_hidden_path
+from app.common.artifact_index import query_files, parse_timestamp, LIST_CODE_DEFAULT_LIMIT
+from app.common.artifact_index import is_empty as artifact_index_is_empty, reindex as reindex_artifacts
+from app.common.db import run_db
+from app.common.metrics import metrics, METRICS_CONTENT_TYPE, EXECUTE_SECONDS, WEBSOCKET_CONNECTIONS, WEBSOCKET_CONNECTIONS_TOTAL
+from app.common import search_index
+from app.common.search_index import SEARCH_DEFAULT_LIMIT
+from app.common import projects as project_store
+from app.common.projects import PROJECTS_DEFAULT_LIMIT, FILES_DEFAULT_LIMIT
+from app.common import file_versions
+from app.common.archive import list_archive_files, stream_zip
+from app.common.exec_pool import execution_pools, ExecutionOutcome, EXEC_TIMEOUT, EXEC_MAX_OUTPUT
+from app.common.exec_stream import OutputRing, OutputCapture, pump_output, dropped_marker, TRUNCATION_MARKER
+from app.common.ts_transpile import ts_transpiler, TranspileError
+from app.common.exec_history import (execution_cache, execution_history, list_executions, EXEC_HISTORY_MAX_OUTPUT,
+                                     EXECUTIONS_DEFAULT_LIMIT, STATUS_SUCCESS, STATUS_ERROR, STATUS_TIMEOUT)
+from app.common.file_serving import (resolve_artifact_path, media_type_for, etag_for, etag_matches,
+                                     accepted_encodings, is_compressible, compressed_variant)
+
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import Response, FileResponse, StreamingResponse, JSONResponse
 from pydantic import BaseModel
+from typing import Optional, List
 import json
-import glob
 from datetime import datetime
 import subprocess
 import tempfile
 import asyncio
 import time
 import traceback
-import aiofiles # Utilisé pour les opérations de fichiers asynchrones
+import uuid
+import re
+from urllib.parse import quote
 
 app = FastAPI(title="Multi-Agents IA Chat", version="1.0.0")
 
@@ -38,398 +62,90 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"], # Pagination des listes de projets et de fichiers
 )
 
+# Identifiant de session fourni par le client : sert de nom de répertoire des artefacts
+SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# --- Cycle de vie : pool de connexions Ollama, préchargement des modèles, nettoyage des sessions ---
+background_tasks = []
+
+@app.on_event("startup")
+async def startup_event():
+    await start_ollama_client()
+    # Avant tout workflow : supprime les contenus qui ne sont plus liés à aucune session
+    await asyncio.to_thread(artifact_store.collect_garbage)
+    # Index de /list_code et de /search : construits une fois, en arrière-plan, à partir des données existantes
+    background_tasks.append(asyncio.create_task(_build_indexes()))
+    job_queue.start()
+    # Interpréteurs préchargés et historique à écriture différée pour /execute
+    await execution_pools.start()
+    execution_history.start()
+    # Compilateur TypeScript chargé une fois, en arrière-plan (repli sur ts-node s'il est absent)
+    background_tasks.append(asyncio.create_task(ts_transpiler.start()))
+    background_tasks.append(asyncio.create_task(agent_registry.run_idle_sweeper()))
+    background_tasks.append(asyncio.create_task(file_versions.run_compaction()))
+    # Préchargement en arrière-plan pour ne pas retarder le démarrage du serveur
+    background_tasks.append(asyncio.create_task(model_residency.warm_up(OLLAMA_WARMUP_MODELS)))
+
+async def _build_indexes():
+    if await run_db(artifact_index_is_empty):
+        await asyncio.to_thread(reindex_artifacts, artifact_store)
+    if await run_db(search_index.is_empty):
+        await run_db(search_index.rebuild, artifact_store)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for task in background_tasks:
+        task.cancel()
+    await job_queue.stop()
+    await execution_pools.stop()
+    await execution_history.stop() # Écrit les exécutions encore en attente
+    await ts_transpiler.stop()
+    await close_ollama_client()
+
 # --- Modèles Pydantic ---
 class ChatMessage(BaseModel):
     agent_name: str
     message: str
+    session_id: Optional[str] = None # Conserve l'historique de conversation entre appels
+
+class WorkflowRequest(BaseModel):
+    prompt: str
+    agents: List[str] = [] # Agents choisis dans l'interface (l'équipe du workflow est fixe)
+    context: dict = {}
+    session_id: Optional[str] = None
 
 class CodeExecutionRequest(BaseModel):
     code: str
     language: str
 
-# --- Fonctions utilitaires du workflow ---
-def extract_code_block(text, language_tag):
-    """Extrait le premier bloc de code pour le langage donné."""
-    try:
-        start = text.index(f"```{language_tag}") + len(f"```{language_tag}")
-        end = text.index("```", start)
-        return text[start:end].strip()
-    except ValueError:
-        return ""
-
-async def ensure_agent_exists(agent_name, stage, websocket):
-    """Vérifie qu'un agent existe, sinon envoie un message d'erreur."""
-    agent = get_agent_by_name(agent_name)
-    if not agent:
-        # Utilisation de agent_name ici car nous n'avons pas d'objet agent valide
-        await send_agent_message("System", "Erreur critique", f"Agent {agent_name} introuvable. Vérifiez agents.py.", stage, websocket, elapsed=None)
-    return agent
-
-# --- Fonction principale de workflow pour la création de site web ---
-async def run_website_creation_workflow(websocket: WebSocket, prompt: str, session_id: str):
-    """
-    Orchestre une équipe d'agents IA pour réaliser la création d'un site web complet,
-    en envoyant des mises à jour en temps réel via WebSocket.
-    """
-    project_context = {
-        "user_request": prompt,
-        "vision": "",
-        "architecture_plan": "",
-        "ui_design_proposals": "",
-        "seo_content": "",
-        "database_schema": "",
-        "backend_code": "",
-        "frontend_code": "",
-        "critique_reports": {},
-        "optimized_code": {"frontend": "", "backend": ""},
-        "deployment_scripts": "",
-        "translations": {}
-    }
-
-    generated_files_dir = os.path.join("generated_code", session_id)
-    os.makedirs(generated_files_dir, exist_ok=True)
-
-    # Vérification et initialisation des agents nécessaires pour le workflow
-    visionnaire = await ensure_agent_exists("Mike", "init", websocket)
-    if not visionnaire: return
-    
-    architecte = await ensure_agent_exists("Bob", "init", websocket)
-    if not architecte: return
-
-    designer = await ensure_agent_exists("UIDesigner", "init", websocket)
-    if not designer: return
-
-    seo_expert = await ensure_agent_exists("SEOCopty", "init", websocket)
-    if not seo_expert: return
-
-    db_specialist = await ensure_agent_exists("DBMaster", "init", websocket)
-    # db_specialist n'est pas critique, donc pas de 'return' ici s'il est None
-
-    backend_engineer_agent = await ensure_agent_exists("BackEngineer", "init", websocket)
-    if not backend_engineer_agent: return
-
-    frontend_engineer_agent = await ensure_agent_exists("FrontEngineer", "init", websocket)
-    if not frontend_engineer_agent: return
-
-    critique = await ensure_agent_exists("TheCritique", "init", websocket)
-    if not critique: return
-
-    optimiseur = await ensure_agent_exists("TheOptimizer", "init", websocket)
-    if not optimiseur: return
-
-    deployer = await ensure_agent_exists("DevOpsGuy", "init", websocket)
-    # deployer n'est pas critique, donc pas de 'return' ici s'il est None
-
-    # --- Démarrage du Workflow ---
-    await send_agent_message("System", "Démarrage du workflow", "Lancement de la séquence de développement de site web.", "init", websocket, elapsed=None)
-
-    # ----------------- Étape 1 : Vision du projet -----------------
-    # Correction: Passer agent.name à send_agent_message
-    await send_agent_message(visionnaire.name, "Démarre l'analyse des besoins et définit la vision du projet.", "...", "vision", websocket)
-    start_time = time.time()
-    # Correction: Utiliser asyncio.to_thread pour aask car aask est synchrone
-    vision_response = await asyncio.to_thread(visionnaire.aask, prompt) 
-    elapsed = time.time() - start_time
-    project_context["vision"] = vision_response
-    # Correction: Passer agent.name à send_agent_message
-    await send_agent_message(visionnaire.name, "Vision définie", vision_response, "vision", websocket, elapsed)
-
-    # ----------------- Étape 2 : Architecture -----------------
-    # Correction: Passer agent.name à send_agent_message
-    await send_agent_message(architecte.name, "Conçoit l'architecture technique du site web.", "...", "architecture", websocket)
-    start_time = time.time()
-    architecture_prompt = (
-        f"Basé sur la vision suivante: '{project_context['vision']}', "
-        "propose un plan d'architecture détaillé pour un site web de restaurant italien. "
-        "Le plan doit inclure la structure technique du frontend (React), du backend (FastAPI) et la base de données (si nécessaire, ex: pour les réservations, le menu). "
-        "Démontre la structure des dossiers et les interfaces principales (API). "
-        "Mets en évidence les considérations de performance, sécurité et scalabilité."
-    )
-    # Correction: Utiliser asyncio.to_thread pour aask
-    architecture_plan = await asyncio.to_thread(architecte.aask, architecture_prompt) 
-    elapsed = time.time() - start_time
-    project_context["architecture_plan"] = architecture_plan
-    # Correction: Passer agent.name à send_agent_message
-    await send_agent_message(architecte.name, "Plan d'architecture généré", architecture_plan, "architecture", websocket, elapsed)
-    
-    async with aiofiles.open(os.path.join(generated_files_dir, "architecture_plan.md"), "w", encoding="utf-8") as f:
-        await f.write(architecture_plan)
-
-    # ----------------- Étape 3 : Le Designer UI/UX -----------------
-    # Correction: Passer agent.name à send_agent_message
-    await send_agent_message(designer.name, "Propose des éléments de design UI/UX et la charte graphique.", "...", "design", websocket)
-    start_time = time.time()
-    design_prompt = (
-        f"Basé sur le plan d'architecture: '{project_context['architecture_plan']}' et la vision: '{project_context['vision']}', "
-        "propose des éléments de design UI/UX pour un site web de restaurant italien. "
-        "Inclue palettes de couleurs (HEX/RGB), typographies (noms de polices, styles), "
-        "agencements de page pour l'accueil, le menu et les réservations, et suggestions d'icônes. "
-        "Fournis des extraits CSS pertinents pour ces styles."
-    )
-    # Correction: Utiliser asyncio.to_thread pour aask
-    design_proposals = await asyncio.to_thread(designer.aask, design_prompt) 
-    elapsed = time.time() - start_time
-    project_context["ui_design_proposals"] = design_proposals
-    # Correction: Passer agent.name à send_agent_message
-    await send_agent_message(designer.name, "Propositions de design UI/UX", design_proposals, "design", websocket, elapsed)
-    
-    async with aiofiles.open(os.path.join(generated_files_dir, "ui_design_proposals.md"), "w", encoding="utf-8") as f:
-        await f.write(design_proposals)
-
-    # ----------------- Étape 4 : L'Expert SEO / Contenu -----------------
-    # Correction: Passer agent.name à send_agent_message
-    await send_agent_message(seo_expert.name, "Génère le contenu textuel et les recommandations SEO.", "...", "content", websocket)
-    start_time = time.time()
-    seo_prompt = (
-        f"Basé sur la vision: '{project_context['vision']}' et le plan d'architecture: '{project_context['architecture_plan']}', "
-        "génère du contenu textuel pour les pages principales d'un site de restaurant italien (Accueil, Menu, Réservation, Contact, À propos). "
-        "Inclue des mots-clés pertinents pour le SEO, des titres accrocheurs et propose des balises meta (<title>, <meta description>)."
-    )
-    # Correction: Utiliser asyncio.to_thread pour aask
-    seo_content = await asyncio.to_thread(seo_expert.aask, seo_prompt) 
-    elapsed = time.time() - start_time
-    project_context["seo_content"] = seo_content
-    # Correction: Passer agent.name à send_agent_message
-    await send_agent_message(seo_expert.name, "Contenu et SEO générés", seo_content, "content", websocket, elapsed)
-    
-    async with aiofiles.open(os.path.join(generated_files_dir, "seo_content.md"), "w", encoding="utf-8") as f:
-        await f.write(seo_content)
-
-    # ----------------- Étape 5 : Spécialiste Base de Données (si nécessaire) -----------------
-    if db_specialist:
-        # Correction: Passer agent.name à send_agent_message
-        await send_agent_message(db_specialist.name, "Conçoit le schéma de base de données.", "...", "database", websocket)
-        start_time = time.time()
-        db_prompt = (
-            f"Basé sur le plan d'architecture: '{project_context['architecture_plan']}' et la vision: '{project_context['vision']}', "
-            "propose un schéma de base de données (tables, champs, relations, index) pour un site de restaurant italien "
-            "(ex: gestion du menu, des réservations, des utilisateurs). "
-            "Fournis les instructions SQL de création de table ou les modèles ORM (SQLAlchemy pour Python)."
-        )
-        # Correction: Utiliser asyncio.to_thread pour aask
-        database_schema = await asyncio.to_thread(db_specialist.aask, db_prompt) 
-        elapsed = time.time() - start_time
-        project_context["database_schema"] = database_schema
-        async with aiofiles.open(os.path.join(generated_files_dir, "database_schema.sql"), "w", encoding="utf-8") as f:
-            await f.write(database_schema)
-        # Correction: Passer agent.name à send_agent_message
-        await send_agent_message(db_specialist.name, "Schéma de BDD généré", database_schema, "database", websocket, elapsed)
-    else:
-        await send_agent_message("System", "Info", "Agent Spécialiste Base de Données (DBMaster) non disponible ou non nécessaire pour cette demande.", "database", websocket, elapsed=None)
-
-
-    # ----------------- Étape 6 : Ingénieur Backend -----------------
-    if backend_engineer_agent:
-        # Correction: Passer agent.name à send_agent_message
-        await send_agent_message(backend_engineer_agent.name, "Génère le code backend (FastAPI).", "...", "backend_coding", websocket)
-        start_time = time.time()
-        backend_prompt = (
-            f"Basé sur le plan d'architecture: '{project_context['architecture_plan']}', "
-            f"la vision: '{project_context['vision']}', et le schéma de BDD (si existant): '{project_context['database_schema']}', "
-            "écris le code backend FastAPI pour un site de restaurant italien. "
-            "Inclue les routes API pour gérer le menu, les réservations, et potentiellement l'authentification. "
-            "Fournis le code Python complet pour les fichiers clés (ex: main.py, models.py, services.py), en utilisant des blocs de code Markdown."
-        )
-        # Correction: Utiliser asyncio.to_thread pour aask
-        backend_code = await asyncio.to_thread(backend_engineer_agent.aask, backend_prompt) 
-        elapsed = time.time() - start_time
-        project_context["backend_code"] = backend_code
-        
-        async with aiofiles.open(os.path.join(generated_files_dir, "backend_code_raw_output.md"), "w", encoding="utf-8") as f:
-            await f.write(backend_code)
-        try:
-            extracted_backend_code = extract_code_block(backend_code, "python")
-            if extracted_backend_code:
-                async with aiofiles.open(os.path.join(generated_files_dir, "backend_app.py"), "w", encoding="utf-8") as f:
-                    await f.write(extracted_backend_code)
-                # Correction: Passer agent.name à send_agent_message
-                await send_agent_message(backend_engineer_agent.name, "Code Backend généré et sauvegardé", extracted_backend_code[:500] + "...", "backend_coding", websocket, elapsed)
-            else:
-                # Correction: Passer agent.name à send_agent_message
-                await send_agent_message(backend_engineer_agent.name, "Code Backend généré (mais extraction difficile)", backend_code, "backend_coding", websocket, elapsed)
-        except Exception as e:
-            # Correction: Passer agent.name à send_agent_message
-            await send_agent_message(backend_engineer_agent.name, "Erreur de sauvegarde/parsing Backend", f"Impossible d'extraire le code Python: {e}\nRaw Output: {backend_code}", "backend_coding", websocket, elapsed)
-    else:
-        await send_agent_message("System", "Info", "Agent Ingénieur Backend (BackEngineer) non disponible ou non critique.", "backend_coding", websocket, elapsed=None)
-
-
-    # --- Étape 7 : Ingénieur Frontend ---
-    if frontend_engineer_agent:
-        # Correction: Passer agent.name à send_agent_message
-        await send_agent_message(frontend_engineer_agent.name, "Génère le code frontend (React, HTML, CSS).", "...", "frontend_coding", websocket)
-        start_time = time.time()
-        frontend_prompt = (
-            f"Basé sur le plan d'architecture: '{project_context['architecture_plan']}', "
-            f"les propositions de design UI/UX: '{project_context['ui_design_proposals']}', "
-            f"le contenu SEO: '{project_context['seo_content']}', "
-            f"et les routes API du backend: '{project_context['backend_code'][:1000]}...', "
-            "écris le code React, HTML et CSS pour un site web de restaurant italien. "
-            "Inclue les pages Accueil, Menu, Réservation, Contact. "
-            "Structure le code en composants réutilisables. "
-            "Fournis le code complet (ex: App.jsx, index.html, style.css), en utilisant des blocs de code Markdown pour chaque fichier."
-        )
-        # Correction: Utiliser asyncio.to_thread pour aask
-        frontend_code = await asyncio.to_thread(frontend_engineer_agent.aask, frontend_prompt) 
-        elapsed = time.time() - start_time
-        project_context["frontend_code"] = frontend_code
-
-        async with aiofiles.open(os.path.join(generated_files_dir, "frontend_code_raw_output.md"), "w", encoding="utf-8") as f:
-            await f.write(frontend_code)
-        try:
-            extracted_html = extract_code_block(frontend_code, "html")
-            extracted_css = extract_code_block(frontend_code, "css")
-            extracted_js_jsx = extract_code_block(frontend_code, "javascript") or extract_code_block(frontend_code, "jsx")
-
-            if extracted_html:
-                async with aiofiles.open(os.path.join(generated_files_dir, "index.html"), "w", encoding="utf-8") as f:
-                    await f.write(extracted_html)
-            
-            if extracted_css:
-                async with aiofiles.open(os.path.join(generated_files_dir, "style.css"), "w", encoding="utf-8") as f:
-                    await f.write(extracted_css)
-
-            if extracted_js_jsx:
-                js_filename = "App.jsx" if "import React" in extracted_js_jsx else "script.js"
-                async with aiofiles.open(os.path.join(generated_files_dir, js_filename), "w", encoding="utf-8") as f:
-                    await f.write(extracted_js_jsx)
-            
-            if extracted_html or extracted_css or extracted_js_jsx:
-                # Correction: Passer agent.name à send_agent_message
-                await send_agent_message(frontend_engineer_agent.name, "Code Frontend généré et sauvegardé", "HTML, CSS, JS/JSX générés et enregistrés.", "frontend_coding", websocket, elapsed)
-            else:
-                # Correction: Passer agent.name à send_agent_message
-                await send_agent_message(frontend_engineer_agent.name, "Code Frontend généré (parsing complexe)", frontend_code, "frontend_coding", websocket, elapsed)
-                
-        except Exception as e:
-            # Correction: Passer agent.name à send_agent_message
-            await send_agent_message(frontend_engineer_agent.name, "Erreur de sauvegarde/parsing Frontend", f"Impossible d'extraire le code: {e}\nRaw Output: {frontend_code}", "frontend_coding", websocket, elapsed)
-    else:
-        await send_agent_message("System", "Info", "Agent Ingénieur Frontend (FrontEngineer) non disponible ou non critique.", "frontend_coding", websocket, elapsed=None)
-
-
-    # --- Étape 8 : Le Critique ---
-    # Correction: Passer agent.name à send_agent_message
-    if critique: # Ajout de cette vérification car ensure_agent_exists peut retourner None
-        await send_agent_message(critique.name, "Analyse le code généré pour les erreurs et failles de sécurité.", "...", "critique", websocket)
-        start_time = time.time()
-        critique_prompt = (
-            f"Critique de manière exhaustive le code frontend et backend généré. "
-            f"Code Frontend: '{project_context['frontend_code']}'. "
-            f"Code Backend: '{project_context['backend_code']}'. "
-            "Cherche les erreurs de logique, les bugs potentiels, les failles de sécurité, "
-            "les problèmes de performance, les violations de bonnes pratiques et les améliorations de qualité. "
-            "Fournis un rapport clair avec des points précis et des suggestions de correction."
-        )
-        # Correction: Utiliser asyncio.to_thread pour aask
-        critique_report = await asyncio.to_thread(critique.aask, critique_prompt)
-        elapsed = time.time() - start_time
-        project_context["critique_reports"] = {"general": critique_report}
-        # Correction: Passer agent.name à send_agent_message
-        await send_agent_message(critique.name, "Rapport de critique", project_context['critique_reports']['general'], "critique", websocket, elapsed)
-        
-        async with aiofiles.open(os.path.join(generated_files_dir, "critique_report.md"), "w", encoding="utf-8") as f:
-            await f.write(critique_report)
-    else:
-        await send_agent_message("System", "Info", "Agent Critique (TheCritique) non disponible ou non critique.", "critique", websocket, elapsed=None)
-
-
-    # --- Étape 9 : L'Optimiseur ---
-    # Correction: Passer agent.name à send_agent_message
-    if optimiseur: # Ajout de cette vérification car ensure_agent_exists peut retourner None
-        await send_agent_message(optimiseur.name, "Optimise et corrige le code basé sur les critiques.", "...", "optimization", websocket)
-        start_time = time.time()
-        optimizer_prompt = (
-            f"Basé sur les critiques: '{project_context['critique_reports']['general']}', "
-            f"optimise et corrige le code frontend: '{project_context['frontend_code']}' "
-            f"et le code backend: '{project_context['backend_code']}'. "
-            "Fournis le code final optimisé pour les deux parties, "
-            "en séparant clairement le code frontend (HTML/CSS/JS/React) et le code backend (Python/FastAPI) "
-            "avec des blocs de code Markdown distincts et des explications concises."
-        )
-        # Correction: Utiliser asyncio.to_thread pour aask
-        optimized_code_response = await asyncio.to_thread(optimiseur.aask, optimizer_prompt)
-        elapsed = time.time() - start_time
-        
-        final_frontend_code = extract_code_block(optimized_code_response, "html") or \
-                              extract_code_block(optimized_code_response, "jsx") or \
-                              extract_code_block(optimized_code_response, "javascript")
-        final_backend_code = extract_code_block(optimized_code_response, "python")
-
-        project_context["optimized_code"] = {
-            "frontend": final_frontend_code,
-            "backend": final_backend_code
-        }
-
-        async with aiofiles.open(os.path.join(generated_files_dir, "final_frontend_site.html"), "w", encoding="utf-8") as f:
-            await f.write(final_frontend_code)
-        async with aiofiles.open(os.path.join(generated_files_dir, "final_backend_api.py"), "w", encoding="utf-8") as f:
-            await f.write(final_backend_code)
-
-        # Correction: Passer agent.name à send_agent_message
-        await send_agent_message(optimiseur.name, "Code final optimisé et corrigé", optimized_code_response, "optimization", websocket, elapsed)
-    else:
-        await send_agent_message("System", "Info", "Agent Optimiseur (TheOptimizer) non disponible ou non critique.", "optimization", websocket, elapsed=None)
-
-
-    # --- Étape 10 : Le Déployeur / DevOps ---
-    # Correction: Passer agent.name à send_agent_message
-    if deployer: # L'appel est conditionnel
-        await send_agent_message(deployer.name, "Prépare les scripts de déploiement et la configuration DevOps.", "...", "devops", websocket)
-        start_time = time.time()
-        deploy_prompt = (
-            f"Basé sur le code frontend final: '{final_frontend_code[:len(final_frontend_code)//2]}...', "
-            f"et le code backend final: '{final_backend_code[:len(final_backend_code)//2]}...', "
-            "génère les scripts de déploiement (Dockerfile, commandes shell, fichiers de configuration CI/CD) "
-            "pour mettre ce site web de restaurant italien en production (ex: sur Docker, ou un service cloud comme Render/Vercel/Heroku). "
-            "Fournis des instructions claires."
-        )
-        # Correction: Utiliser asyncio.to_thread pour aask
-        deployment_scripts = await asyncio.to_thread(deployer.aask, deploy_prompt)
-        elapsed = time.time() - start_time
-        project_context["deployment_scripts"] = deployment_scripts
-        async with aiofiles.open(os.path.join(generated_files_dir, "deployment_instructions.md"), "w", encoding="utf-8") as f:
-            await f.write(deployment_scripts)
-        # Correction: Passer agent.name à send_agent_message
-        await send_agent_message(deployer.name, "Scripts de déploiement générés", project_context['deployment_scripts'], "devops", websocket, elapsed)
-    else:
-        await send_agent_message("System", "Info", "Agent Déployeur/DevOps (DevOpsGuy) non inclus dans ce workflow.", "devops", websocket, elapsed=None)
-
-    # --- Étape 11 : Le Traducteur (si demande de multilingue) ---
-    # Correction: Passer agent.name à send_agent_message
-    if translator_instance: # Assigner l'instance de l'agent translator si elle existe
-        if ("multilingue" in prompt.lower() or "traduire" in prompt.lower()):
-            await send_agent_message(translator_instance.name, "Traduit le contenu du site dans d'autres langues.", "...", "translation", websocket)
-            start_time = time.time()
-            content_to_translate = project_context['seo_content'] + "\n\n--- Code Frontend ---\n" + project_context['optimized_code']['frontend'][:1000] 
-            translation_prompt = (
-                f"Traduire le texte et les extraits de code (si pertinent) suivants du français vers l'italien et l'espagnol "
-                f"pour un site de restaurant: '{content_to_translate}'. "
-                "Fournis le texte traduit dans un format clair, en indiquant la langue et la section originale. "
-                "Ne traduis pas le code, seulement les chaînes de caractères dans le code."
-            )
-            # Correction: Utiliser asyncio.to_thread pour aask
-            translated_content = await asyncio.to_thread(translator_instance.aask, translation_prompt)
-            elapsed = time.time() - start_time
-            project_context["translations"] = {"all": translated_content}
-            async with aiofiles.open(os.path.join(generated_files_dir, "translated_content.md"), "w", encoding="utf-8") as f:
-                await f.write(translated_content)
-            # Correction: Passer agent.name à send_agent_message
-            await send_agent_message(translator_instance.name, "Contenu traduit", project_context['translations']['all'], "translation", websocket, elapsed)
-        else:
-            await send_agent_message("System", "Info", "Pas de demande de traduction multilingue détectée.", "translation", websocket, elapsed=None)
-    else:
-        await send_agent_message("System", "Info", "Agent Traducteur non disponible.", "translation", websocket, elapsed=None)
-
-    # --- Signal de fin de workflow global ---
-    await websocket.send_text(json.dumps({
-        "type": "workflow_complete",
-        "message": "✅ Projet de site web terminé ! Fichiers générés dans le dossier de session.",
-        "final_output_path": generated_files_dir,
-        "timestamp": str(datetime.now())
-    }))
+# Champs en camelCase, comme les types Project / ProjectFile du frontend
+class ProjectFileCreate(BaseModel):
+    name: str
+    path: Optional[str] = None
+    content: str = ""
+    language: Optional[str] = None
+
+class ProjectFileUpdate(BaseModel):
+    content: Optional[str] = None
+    name: Optional[str] = None
+    path: Optional[str] = None
+    language: Optional[str] = None
+
+class ProjectCreate(BaseModel):
+    name: str
+    description: str = ""
+    language: Optional[str] = None
+    isShared: bool = False
+    files: List[ProjectFileCreate] = []
+
+class ProjectUpdate(BaseModel):
+    name: Optional[str] = None
+    description: Optional[str] = None
+    language: Optional[str] = None
+    isShared: Optional[bool] = None
 
 # --- ROUTES FASTAPI STANDARD ---
 
@@ -439,13 +155,28 @@ async def root():
     # Renvoie une liste correcte des noms d'agents
     return {"message": "Backend Multi-Agents IA opérationnel !", "agents": [agent.name for agent in agents]}
 
+def _websocket_opened(endpoint: str):
+    WEBSOCKET_CONNECTIONS.inc(endpoint=endpoint)
+    WEBSOCKET_CONNECTIONS_TOTAL.inc(endpoint=endpoint)
+
 @app.websocket("/ws/{session_id}")
 async def websocket_endpoint(websocket: WebSocket, session_id: str):
     """
-    Endpoint WebSocket pour la communication en temps réel et le déclenchement du workflow.
+    Endpoint WebSocket : soumet les workflows à la file des jobs et s'abonne à leur
+    progression. La boucle de réception reste libre pendant l'exécution.
     """
+    if not SESSION_ID_RE.match(session_id):
+        await websocket.close(code=1008, reason="Identifiant de session invalide")
+        return
     await websocket.accept()
     print(f"[{session_id}] WebSocket: Connexion acceptée.") # Log normal de connexion
+    _websocket_opened("workflow")
+    subscriptions = [] # Jobs auxquels cette connexion est abonnée
+
+    async def subscribe(job, replay=True):
+        await job.channel.subscribe(websocket, replay=replay)
+        subscriptions.append(job)
+
     try:
         await websocket.send_text(json.dumps({
             "type": "connection_established",
@@ -453,6 +184,11 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
             "session_id": session_id,
             "timestamp": str(datetime.now())
         }))
+
+        # Reconnexion : on se réabonne au job en cours, ou on reprend le workflow interrompu
+        job = job_queue.active_job_for(session_id) or await resume_interrupted_workflow(session_id)
+        if job:
+            await subscribe(job)
         
         while True:
             try:
@@ -462,7 +198,38 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
                 
                 if message_data.get("type") == "chat_request":
                     prompt = message_data.get("prompt", "")
-                    await run_website_creation_workflow(websocket, prompt, session_id)
+                    if job_queue.active_job_for(session_id):
+                        await websocket.send_text(json.dumps({"type": "error", "message": "Un workflow est déjà en cours pour cette session."}))
+                        continue
+                    try:
+                        job = submit_workflow_job(prompt, session_id)
+                    except JobQueueFull as e:
+                        await websocket.send_text(json.dumps({"type": "error", "message": f"Serveur saturé: {e}"}))
+                        continue
+                    await subscribe(job, replay=False)
+                    await websocket.send_text(json.dumps({"type": "job_submitted", "job_id": job.job_id, "session_id": session_id}))
+
+                elif message_data.get("type") == "cancel":
+                    # Annule le job désigné, ou à défaut le workflow en cours de la session
+                    job = job_queue.get(message_data.get("job_id", "")) or job_queue.active_job_for(session_id)
+                    if not job or not job_queue.cancel(job.job_id):
+                        await websocket.send_text(json.dumps({"type": "error", "message": "Aucun workflow en cours à annuler."}))
+
+                elif message_data.get("type") == "resume":
+                    # Reprise explicite, y compris d'un workflow en échec, depuis sa dernière étape terminée
+                    job = job_queue.active_job_for(session_id) or await resume_interrupted_workflow(session_id, retry_failed=True)
+                    if job:
+                        await subscribe(job, replay=False)
+                        await websocket.send_text(json.dumps({"type": "job_submitted", "job_id": job.job_id, "session_id": session_id}))
+                    else:
+                        await websocket.send_text(json.dumps({"type": "error", "message": "Aucun workflow à reprendre."}))
+
+                elif message_data.get("type") == "subscribe":
+                    job = job_queue.get(message_data.get("job_id", ""))
+                    if job:
+                        await subscribe(job)
+                    else:
+                        await websocket.send_text(json.dumps({"type": "error", "message": "Job inconnu."}))
                 
             except json.JSONDecodeError:
                 print(f"[{session_id}] Erreur: Message WebSocket non JSON valide. Ignoré.")
@@ -483,17 +250,87 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
             await websocket.close(code=1011)
         except RuntimeError as close_error:
             print(f"[{session_id}] Erreur lors de la tentative de fermeture du WebSocket (déjà fermé ?): {close_error}")
+    finally:
+        WEBSOCKET_CONNECTIONS.dec(endpoint="workflow")
+        for job in subscriptions:
+            job.channel.unsubscribe(websocket)
+            job_queue.watch_abandon(job) # Annulé si personne ne se réabonne à temps
+        # Les agents d'un workflow encore en cours sont libérés à la fin du job
+        if not job_queue.active_job_for(session_id):
+            agent_registry.release(session_id)
+
+@app.post("/workflow", status_code=202)
+async def submit_workflow(request: WorkflowRequest):
+    """Soumet un workflow de création de site web ; il s'exécute en arrière-plan."""
+    session_id = request.session_id or f"session_{uuid.uuid4().hex[:12]}"
+    if not SESSION_ID_RE.match(session_id):
+        raise HTTPException(status_code=400, detail="Identifiant de session invalide (lettres, chiffres, '_' et '-', 64 caractères au plus)")
+    if job_queue.active_job_for(session_id):
+        raise HTTPException(status_code=409, detail="Un workflow est déjà en cours pour cette session.")
+    try:
+        job = submit_workflow_job(request.prompt, session_id)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=f"Serveur saturé: {e}")
+    return job.to_dict()
+
+@app.post("/workflow/sessions/{session_id}/resume", status_code=202)
+async def resume_workflow(session_id: str):
+    """Reprend explicitement le workflow interrompu ou en échec de la session, depuis sa dernière étape terminée."""
+    if job_queue.active_job_for(session_id):
+        raise HTTPException(status_code=409, detail="Un workflow est déjà en cours pour cette session.")
+    try:
+        job = await resume_interrupted_workflow(session_id, retry_failed=True)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=f"Serveur saturé: {e}")
+    if not job:
+        raise HTTPException(status_code=404, detail="Aucun workflow à reprendre pour cette session.")
+    return job.to_dict()
+
+@app.get("/workflow/{job_id}")
+async def get_workflow_status(job_id: str):
+    """Retourne le statut d'un job de workflow."""
+    job = job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job inconnu")
+    return job.to_dict()
+
+@app.post("/workflow/{job_id}/cancel")
+async def cancel_workflow(job_id: str):
+    """Annule un job de workflow en attente ou en cours."""
+    job = job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job inconnu")
+    if not job_queue.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job déjà {job.status}")
+    return job.to_dict()
+
+@app.get("/workflow/{job_id}/result")
+async def get_workflow_result(job_id: str):
+    """Retourne le résultat d'un job terminé (format WorkflowResult du frontend)."""
+    job = job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job inconnu")
+    if not job.finished:
+        raise HTTPException(status_code=409, detail=f"Job {job.status}, résultat pas encore disponible")
+    return workflow_result(job)
 
 @app.post("/chat")
 async def chat_with_agent(chat_data: ChatMessage):
     """
     Endpoint HTTP pour une interaction directe avec un seul agent. Utile pour des tests ou des requêtes ponctuelles hors workflow.
     """
-    agent = get_agent_by_name(chat_data.agent_name)
-    if not agent:
+    template = get_agent_by_name(chat_data.agent_name)
+    if not template:
         raise HTTPException(status_code=404, detail=f"Agent '{chat_data.agent_name}' inconnu. Agents disponibles: {[a.name for a in agents]}")
-    
-    response = await asyncio.to_thread(agent.aask, chat_data.message)
+
+    if chat_data.session_id:
+        # Agent de la session : l'historique borné est renvoyé comme contexte
+        agent = agent_registry.get_agent(f"chat:{chat_data.session_id}", chat_data.agent_name)
+        response = await agent.aask(chat_data.message, context_messages=agent.memory.as_messages(),
+                                    priority=PRIORITY_INTERACTIVE)
+    else:
+        # Appel ponctuel : instance éphémère, rien n'est conservé
+        response = await template.spawn().aask(chat_data.message, priority=PRIORITY_INTERACTIVE)
     return {
         "agent": chat_data.agent_name,
         "response": response,
@@ -514,54 +351,142 @@ async def get_agents_info():
         ]
     }
 
+@app.get("/llm/scheduler")
+async def get_llm_scheduler_status():
+    """Retourne l'état de l'ordonnanceur LLM : appels actifs, files d'attente et temps d'attente par voie."""
+    return llm_scheduler.snapshot()
+
+@app.get("/models/resident")
+async def get_resident_models():
+    """Retourne les modèles chargés en mémoire par Ollama et leurs utilisations prévues."""
+    try:
+        return {"models": await model_residency.resident_models()}
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Ollama indisponible: {e}")
+
 @app.get("/list_code")
-async def list_generated_files(session_id: str = None):
+async def list_generated_files(session_id: str = None, agent: str = None, language: str = None,
+                               since: str = None, until: str = None, cursor: str = None,
+                               limit: int = LIST_CODE_DEFAULT_LIMIT):
     """
-    Liste les fichiers de code généré pour une session spécifique,
-    ou tous les fichiers générés si session_id est None.
+    Liste les fichiers de code généré, du plus récent au plus ancien, depuis l'index
+    maintenu à l'écriture. Filtres : session, agent, langage, dates (`since`/`until`,
+    timestamp ou date ISO). Pagination : renvoyer `next_cursor` dans `cursor`.
     """
-    base_dir = "generated_code"
-    
-    files_info = []
-    
-    if not os.path.exists(base_dir):
-        return {"files": [], "message": "Le dossier 'generated_code' n'existe pas encore."}
-
-    if session_id:
-        target_dir = os.path.join(base_dir, session_id)
-        if os.path.exists(target_dir):
-            for root, _, files in os.walk(target_dir):
-                for file_name in files:
-                    if not file_name.endswith('.zip'):
-                        file_path = os.path.join(root, file_name)
-                        relative_path = os.path.relpath(file_path, target_dir)
-                        files_info.append({"path": relative_path, "content_url": f"/get_code_content?session_id={session_id}&file_path={relative_path}"})
-        else:
-            return {"files": [], "message": f"No generated code found for session {session_id}"}
-    else:
-        for session_folder in os.listdir(base_dir):
-            session_path = os.path.join(base_dir, session_folder)
-            if os.path.isdir(session_path):
-                for root, _, files in os.walk(session_path):
-                    for file_name in files:
-                        if not file_name.endswith('.zip'):
-                            file_path = os.path.join(root, file_name)
-                            relative_path = os.path.relpath(file_path, base_dir)
-                            # Pour l'URL, il faut le chemin relatif à la session, pas à base_dir
-                            files_info.append({"path": os.path.relpath(file_path, session_path), "session_id": session_folder, "content_url": f"/get_code_content?session_id={session_folder}&file_path={os.path.relpath(file_path, session_path)}"})
-
-    return {"files": files_info}
+    try:
+        since_ts, until_ts = parse_timestamp(since), parse_timestamp(until)
+        rows, next_cursor = await run_db(query_files, session_id, agent, language, since_ts, until_ts, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    files_info = [
+        {
+            "path": row["path"],
+            "session_id": row["session_id"],
+            "size": row["size"],
+            "agent": row["agent"],
+            "stage": row["stage"],
+            "language": row["language"],
+            "updated_at": row["updated_at"],
+            "content_url": f"/get_code_content?session_id={quote(row['session_id'], safe='')}&file_path={quote(row['path'], safe='')}",
+            "raw_url": f"/files/{quote(row['session_id'], safe='')}/{quote(row['path'])}",
+        }
+        for row in rows
+    ]
+    response = {"files": files_info, "next_cursor": next_cursor}
+    if session_id and not files_info and not cursor:
+        response["message"] = f"No generated code found for session {session_id}"
+    return response
+
+@app.get("/search")
+async def search_files(q: str, session_id: str = None, agent: str = None, language: str = None,
+                       source: str = None, project_id: str = None, limit: int = SEARCH_DEFAULT_LIMIT, offset: int = 0):
+    """
+    Recherche plein texte dans les fichiers générés et les fichiers de projets (index
+    FTS5 maintenu à l'écriture). Résultats classés par pertinence, avec un extrait.
+    Filtres : session, agent, langage, source ("artifact" ou "file"), projet.
+    """
+    try:
+        results = await run_db(search_index.search, q, session_id, agent, language, source, project_id, limit, offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"query": q, "results": results, "offset": offset}
+
+@app.get("/sessions/{session_id}/manifest")
+async def get_session_manifest(session_id: str):
+    """Retourne le manifeste des fichiers générés d'une session (taille, empreinte, étape, agent)."""
+    if is_hidden_path(session_id):
+        raise HTTPException(status_code=404, detail="Session inconnue")
+    manifest = await artifact_store.manifest(session_id)
+    if not manifest["files"]:
+        raise HTTPException(status_code=404, detail=f"Aucun fichier généré pour la session {session_id}")
+    return manifest
+
+@app.get("/sessions/{session_id}/archive")
+async def download_session_archive(session_id: str):
+    """
+    Télécharge tous les fichiers générés d'une session dans une archive ZIP, construite
+    et envoyée au fil de l'eau (mémoire constante, aucun fichier temporaire).
+    """
+    session_dir = artifact_store.session_dir(session_id)
+    files = []
+    if not is_hidden_path(session_id) and os.path.isdir(session_dir):
+        files = await asyncio.to_thread(list_archive_files, session_dir)
+    if not files:
+        raise HTTPException(status_code=404, detail=f"Aucun fichier généré pour la session {session_id}")
+    return StreamingResponse(
+        stream_zip(session_dir, files),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{session_id}.zip"'},
+    )
 
 @app.get("/get_code_content")
 async def get_code_content(session_id: str, file_path: str):
     """Retourne le contenu d'un fichier de code généré pour une session spécifique."""
-    full_path = os.path.join("generated_code", session_id, file_path)
-    if os.path.exists(full_path) and os.path.isfile(full_path):
-        with open(full_path, "r", encoding="utf-8") as f:
-            content = f.read()
-        return {"file_path": file_path, "content": content}
+    full_path = resolve_artifact_path(artifact_store.root, session_id, file_path)
+    if full_path and os.path.isfile(full_path):
+        # Lecture hors de la boucle asyncio ; pour les gros fichiers, préférer /files/...
+        content = await asyncio.to_thread(_read_text, full_path)
+        return {"file_path": file_path, "content": content, "raw_url": f"/files/{quote(session_id, safe='')}/{quote(file_path)}"}
     raise HTTPException(status_code=404, detail="File not found")
 
+def _read_text(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+@app.get("/files/{session_id}/{file_path:path}")
+async def serve_generated_file(session_id: str, file_path: str, request: Request):
+    """
+    Sert un fichier généré directement depuis le disque, en streaming : ETag et
+    If-None-Match (304), requêtes Range, et variantes gzip/br précompressées mises
+    en cache à côté du fichier.
+    """
+    full_path = resolve_artifact_path(artifact_store.root, session_id, file_path)
+    try:
+        stat_result = await asyncio.to_thread(os.stat, full_path) if full_path else None
+    except FileNotFoundError:
+        stat_result = None
+    if stat_result is None or not os.path.isfile(full_path):
+        raise HTTPException(status_code=404, detail="File not found")
+
+    media_type = media_type_for(full_path)
+    # Variante envoyée choisie avant la validation : chaque encodage a son propre ETag.
+    # Les plages portent sur le fichier d'origine : pas de variante compressée avec Range
+    encoding, variant = None, None
+    if "range" not in request.headers and is_compressible(media_type, stat_result.st_size):
+        for accepted in accepted_encodings(request.headers.get("accept-encoding")):
+            variant = await asyncio.to_thread(compressed_variant, full_path, stat_result, accepted)
+            if variant:
+                encoding = accepted
+                break
+    etag = etag_for(stat_result, encoding)
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        return FileResponse(variant, media_type=media_type, headers={**headers, "Content-Encoding": encoding})
+    return FileResponse(full_path, media_type=media_type, headers=headers, stat_result=stat_result)
+
 # --- Logique d'exécution de code (telle que vous l'aviez fournie) ---
 def _get_executors():
     """Retourne la configuration des exécuteurs par langage."""
@@ -598,14 +523,9 @@ def _prepare_command(code: str, executor: dict):
             temp_filename = temp_file.name
         return executor["command"] + [temp_filename], temp_filename
 
-def _process_execution_result(result, executor: dict, temp_filename: str = None):
-    """Traite le résultat de l'exécution et nettoie les fichiers temporaires."""
-    if not executor["direct_code"] and temp_filename:
-        try:
-            os.unlink(temp_filename)
-        except OSError:
-            pass
-    
+def _process_execution_result(result, executor: dict):
+    """Traite le résultat de l'exécution."""
+    truncated_marker = TRUNCATION_MARKER if result.truncated else ""
     if result.returncode == 0:
         output = result.stdout.strip()
         if result.stderr.strip():
@@ -613,13 +533,129 @@ def _process_execution_result(result, executor: dict, temp_filename: str = None)
         
         return {
             "success": True,
-            "output": output if output else "✅ Exécution réussie (aucune sortie)"
+            "output": (output + truncated_marker) if output else "✅ Exécution réussie (aucune sortie)"
         }
     else:
         return {
             "success": False,
-            "error": result.stderr.strip() or "Erreur d'exécution inconnue"
+            "error": (result.stderr.strip() + truncated_marker) if result.stderr.strip() else "Erreur d'exécution inconnue"
+        }
+
+def _execution_error(code: str, language: str):
+    """Erreur de validation d'une demande d'exécution (format de réponse de /execute), ou None."""
+    if not code:
+        return {"success": False, "error": "Code vide fourni"}
+    executors = _get_executors()
+    if language not in executors:
+        return {
+            "success": False,
+            "error": f"Langage '{language}' non supporté. Langages disponibles: {', '.join(executors.keys())}"
         }
+    return None
+
+async def _run_code(code: str, language: str, executor: dict, on_output=None) -> ExecutionOutcome:
+    """
+    Exécute le code dans un worker préchargé, ou à défaut dans un processus dédié.
+    Avec `on_output(flux, texte)`, la sortie est transmise au fil de l'eau plutôt que
+    retournée. La sortie est bornée à EXEC_MAX_OUTPUT caractères par flux dans tous les cas.
+    Lève asyncio.TimeoutError ou FileNotFoundError.
+    """
+    if language == "typescript" and execution_pools.get("javascript") is not None:
+        # Types retirés par le service de transpilation (avec cache), puis exécution comme du JavaScript
+        try:
+            javascript = await ts_transpiler.transpile(code)
+        except TranspileError as e:
+            return ExecutionOutcome(1, "", str(e))
+        if javascript is not None:
+            code, language = javascript, "javascript"
+    
+    pool = execution_pools.get(language)
+    if pool is not None:
+        # Worker préchargé : pas de démarrage d'interpréteur par requête
+        result = await pool.run(code, timeout=EXEC_TIMEOUT, on_output=on_output)
+        if result.timed_out:
+            raise asyncio.TimeoutError()
+        return result
+    
+    cmd, temp_filename = _prepare_command(code, executor)
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=tempfile.gettempdir() # Exécute dans un répertoire temporaire isolé
+        )
+        collected = {"stdout": [], "stderr": []}
+        sink = on_output or (lambda stream, text: collected[stream].append(text))
+        try:
+            # Lecture incrémentale des pipes : mémoire bornée quel que soit le volume affiché
+            truncated_out, truncated_err, _ = await asyncio.wait_for(
+                asyncio.gather(
+                    pump_output(process.stdout, "stdout", sink, EXEC_MAX_OUTPUT),
+                    pump_output(process.stderr, "stderr", sink, EXEC_MAX_OUTPUT),
+                    process.wait(),
+                ),
+                timeout=EXEC_TIMEOUT  # Timeout pour éviter les boucles infinies
+            )
+        except BaseException: # Délai dépassé ou exécution interrompue par le client
+            if process.returncode is None:
+                process.kill()
+            await process.wait()
+            raise
+        return ExecutionOutcome(
+            process.returncode,
+            "".join(collected["stdout"]),
+            "".join(collected["stderr"]),
+            truncated=truncated_out or truncated_err,
+        )
+    finally:
+        if temp_filename:
+            try:
+                os.unlink(temp_filename)
+            except OSError:
+                pass
+
+async def _execute(code: str, language: str, executor: dict, on_output=None) -> ExecutionOutcome:
+    """
+    `_run_code` avec le cache des extraits déterministes et l'historique (table executions,
+    écriture différée). Les erreurs (délai, exécuteur absent) sont historisées puis propagées.
+    """
+    start_time = time.perf_counter()
+    cached = execution_cache.get(code, language)
+    if cached:
+        result = ExecutionOutcome(*cached)
+        if on_output:
+            for stream, text in (("stdout", result.stdout), ("stderr", result.stderr)):
+                on_output(stream, text)
+        status = STATUS_SUCCESS if result.returncode == 0 else STATUS_ERROR
+        execution_history.record(code, language, status, result.stdout, result.stderr, time.perf_counter() - start_time)
+        EXECUTE_SECONDS.observe(time.perf_counter() - start_time, language=language, status=status, cached="true")
+        return result
+    
+    capture = OutputCapture(EXEC_HISTORY_MAX_OUTPUT) # Sortie streamée : copie bornée pour l'historique et le cache
+    def tee(stream, text):
+        capture.push(stream, text)
+        on_output(stream, text)
+    
+    try:
+        result = await _run_code(code, language, executor, on_output=tee if on_output else None)
+    except asyncio.TimeoutError:
+        execution_history.record(code, language, STATUS_TIMEOUT, capture.text("stdout"),
+                                 capture.text("stderr") + f"Timeout: l'exécution a dépassé {EXEC_TIMEOUT:g} secondes",
+                                 time.perf_counter() - start_time)
+        EXECUTE_SECONDS.observe(time.perf_counter() - start_time, language=language, status=STATUS_TIMEOUT, cached="false")
+        raise
+    except FileNotFoundError as e:
+        execution_history.record(code, language, STATUS_ERROR, errors=str(e), duration=time.perf_counter() - start_time)
+        EXECUTE_SECONDS.observe(time.perf_counter() - start_time, language=language, status=STATUS_ERROR, cached="false")
+        raise
+    stdout, stderr = capture.text("stdout") + result.stdout, capture.text("stderr") + result.stderr
+    if result.clean and not result.truncated and not capture.truncated:
+        execution_cache.put(code, language, result.returncode, stdout, stderr)
+    status = STATUS_SUCCESS if result.returncode == 0 else STATUS_ERROR
+    execution_history.record(code, language, status, stdout, stderr, time.perf_counter() - start_time)
+    EXECUTE_SECONDS.observe(time.perf_counter() - start_time, language=language, status=status, cached="false")
+    return result
 
 @app.post("/execute")
 async def execute_code(request: CodeExecutionRequest):
@@ -630,47 +666,20 @@ async def execute_code(request: CodeExecutionRequest):
         code = request.code.strip()
         language = request.language.lower()
         
-        if not code:
-            return {"success": False, "error": "Code vide fourni"}
+        error = _execution_error(code, language)
+        if error:
+            return error
         
-        executors = _get_executors()
-        
-        if language not in executors:
-            return {
-                "success": False,
-                "error": f"Langage '{language}' non supporté. Langages disponibles: {', '.join(executors.keys())}"
-            }
-        
-        executor = executors[language]
-        cmd, temp_filename = _prepare_command(code, executor)
+        executor = _get_executors()[language]
         
         try:
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                cwd=tempfile.gettempdir() # Exécute dans un répertoire temporaire isolé
-            )
-            
-            stdout, stderr = await asyncio.wait_for(
-                process.communicate(),
-                timeout=10  # Timeout de 10 secondes pour éviter les boucles infinies
-            )
-            
-            class AsyncResult: # Objet similaire à subprocess.CompletedProcess
-                def __init__(self, returncode, stdout, stderr):
-                    self.returncode = returncode
-                    self.stdout = stdout.decode('utf-8') if stdout else ''
-                    self.stderr = stderr.decode('utf-8') if stderr else ''
-            
-            result = AsyncResult(process.returncode, stdout, stderr)
-            
-            return _process_execution_result(result, executor, temp_filename)
+            result = await _execute(code, language, executor)
+            return _process_execution_result(result, executor)
                 
         except asyncio.TimeoutError:
             return {
                 "success": False,
-                "error": "⏰ Timeout: L'exécution a pris plus de 10 secondes"
+                "error": f"⏰ Timeout: L'exécution a pris plus de {EXEC_TIMEOUT:g} secondes"
             }
         except FileNotFoundError as e:
             return {
@@ -684,6 +693,208 @@ async def execute_code(request: CodeExecutionRequest):
             "error": f"Erreur système inattendue lors de l'exécution du code: {str(e)}"
         }
 
+async def _stream_execution(websocket: WebSocket, execution_id: str, code: str, language: str):
+    """Exécute le code en envoyant la sortie au fil de l'eau, puis le résultat final."""
+    executor = _get_executors()[language]
+    ring = OutputRing() # Sortie en attente d'envoi : bornée si le client lit moins vite que le code n'affiche
+
+    async def send_output():
+        while True:
+            chunks, dropped = await ring.drain()
+            if dropped:
+                await websocket.send_text(json.dumps({
+                    "type": "execution_output", "execution_id": execution_id, "stream": "system",
+                    "data": dropped_marker(dropped), "dropped": dropped
+                }))
+            if not chunks:
+                return
+            for stream, data in chunks:
+                await websocket.send_text(json.dumps({
+                    "type": "execution_output", "execution_id": execution_id, "stream": stream, "data": data
+                }))
+
+    await websocket.send_text(json.dumps({"type": "execution_started", "execution_id": execution_id, "language": language}))
+    sender = asyncio.create_task(send_output())
+    start_time = time.perf_counter()
+    try:
+        try:
+            result = await _execute(code, language, executor, on_output=ring.push)
+            if result.truncated:
+                ring.push("system", TRUNCATION_MARKER)
+            message = {"success": result.returncode == 0, "returncode": result.returncode, "truncated": result.truncated}
+            if result.returncode != 0 and result.stderr:
+                message["error"] = result.stderr.strip() # Worker interrompu (os._exit, signal...)
+        except asyncio.TimeoutError:
+            message = {"success": False, "error": f"⏰ Timeout: L'exécution a pris plus de {EXEC_TIMEOUT:g} secondes"}
+        except FileNotFoundError as e:
+            message = {"success": False, "error": f"Exécuteur non trouvé: {str(e)}. Vérifiez que '{language}' est installé et dans le PATH."}
+        except Exception as e:
+            message = {"success": False, "error": f"Erreur système inattendue lors de l'exécution du code: {str(e)}"}
+        ring.close()
+        await sender
+        message.update({"type": "execution_result", "execution_id": execution_id, "duration": round(time.perf_counter() - start_time, 3)})
+        await websocket.send_text(json.dumps(message))
+    except (WebSocketDisconnect, RuntimeError):
+        pass # Client parti pendant l'envoi : la boucle de réception de la connexion s'arrête aussi
+    finally:
+        sender.cancel()
+
+@app.websocket("/execute/ws")
+async def execute_websocket(websocket: WebSocket):
+    """
+    Exécution avec sortie en direct : le client envoie {"type": "execute", "code", "language"}
+    et reçoit execution_started, des execution_output (stdout, stderr, ou system pour les
+    marqueurs de troncature) puis execution_result. {"type": "stop"} interrompt l'exécution.
+    """
+    await websocket.accept()
+    _websocket_opened("execute")
+    current, current_id = None, None # Une exécution à la fois par connexion
+    try:
+        while True:
+            try:
+                message_data = json.loads(await websocket.receive_text())
+            except json.JSONDecodeError:
+                await websocket.send_text(json.dumps({"type": "error", "message": "Message non JSON valide."}))
+                continue
+            
+            if message_data.get("type") == "execute":
+                if current and not current.done():
+                    await websocket.send_text(json.dumps({"type": "error", "message": "Une exécution est déjà en cours."}))
+                    continue
+                code = (message_data.get("code") or "").strip()
+                language = (message_data.get("language") or "").lower()
+                execution_id = message_data.get("execution_id") or uuid.uuid4().hex[:12]
+                error = _execution_error(code, language)
+                if error:
+                    await websocket.send_text(json.dumps({"type": "execution_result", "execution_id": execution_id, **error}))
+                    continue
+                current, current_id = asyncio.create_task(_stream_execution(websocket, execution_id, code, language)), execution_id
+            
+            elif message_data.get("type") == "stop":
+                if current and not current.done():
+                    current.cancel()
+                    await asyncio.gather(current, return_exceptions=True) # Processus arrêté avant d'accepter la suite
+                    await websocket.send_text(json.dumps({"type": "execution_stopped", "execution_id": current_id}))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        WEBSOCKET_CONNECTIONS.dec(endpoint="execute")
+        if current and not current.done():
+            current.cancel() # Client parti : le processus d'exécution est arrêté
+
+@app.get("/executions")
+async def get_executions(language: Optional[str] = None, status: Optional[str] = None, limit: int = EXECUTIONS_DEFAULT_LIMIT):
+    """Historique des exécutions, des plus récentes aux plus anciennes."""
+    return {"executions": await run_db(list_executions, language, status, limit)}
+
+# --- API projets et fichiers (éditeur) ---
+def _page_response(items: list, next_cursor: Optional[str]) -> JSONResponse:
+    """Liste paginée : le tableau attendu par le frontend, le curseur suivant dans X-Next-Cursor."""
+    return JSONResponse(content=items, headers={"X-Next-Cursor": next_cursor} if next_cursor else None)
+
+@app.get("/api/projects")
+async def api_list_projects(cursor: Optional[str] = None, limit: int = PROJECTS_DEFAULT_LIMIT):
+    """Projets (métadonnées), du plus récemment modifié au plus ancien."""
+    try:
+        items, next_cursor = await run_db(project_store.list_projects, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _page_response(items, next_cursor)
+
+@app.post("/api/projects", status_code=201)
+async def api_create_project(request: ProjectCreate):
+    files = [file.model_dump() for file in request.files]
+    try:
+        return await run_db(project_store.create_project, request.name, request.description, request.language,
+                            request.isShared, files)
+    except FileExistsError as e:
+        raise HTTPException(status_code=409, detail=f"Chemin en double dans le projet: {e}")
+
+@app.get("/api/projects/{project_id}")
+async def api_get_project(project_id: str):
+    project = await run_db(project_store.get_project, project_id)
+    if project is None:
+        raise HTTPException(status_code=404, detail="Projet introuvable")
+    return project
+
+@app.put("/api/projects/{project_id}")
+async def api_update_project(project_id: str, request: ProjectUpdate):
+    fields = {"name": request.name, "description": request.description, "language": request.language,
+              "is_shared": request.isShared}
+    project = await run_db(project_store.update_project, project_id, {k: v for k, v in fields.items() if v is not None})
+    if project is None:
+        raise HTTPException(status_code=404, detail="Projet introuvable")
+    return project
+
+@app.delete("/api/projects/{project_id}", status_code=204)
+async def api_delete_project(project_id: str):
+    if not await run_db(project_store.delete_project, project_id):
+        raise HTTPException(status_code=404, detail="Projet introuvable")
+    return Response(status_code=204)
+
+@app.get("/api/projects/{project_id}/files")
+async def api_list_files(project_id: str, cursor: Optional[str] = None, limit: int = FILES_DEFAULT_LIMIT):
+    """Fichiers du projet triés par chemin, sans contenu (GET .../files/{file_id} pour le contenu)."""
+    try:
+        items, next_cursor = await run_db(project_store.list_files, project_id, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not items and not cursor and await run_db(project_store.get_project, project_id) is None:
+        raise HTTPException(status_code=404, detail="Projet introuvable")
+    return _page_response(items, next_cursor)
+
+@app.post("/api/projects/{project_id}/files", status_code=201)
+async def api_create_file(project_id: str, request: ProjectFileCreate):
+    try:
+        return await run_db(project_store.create_file, project_id, request.name, request.path, request.content, request.language)
+    except LookupError:
+        raise HTTPException(status_code=404, detail="Projet introuvable")
+    except FileExistsError as e:
+        raise HTTPException(status_code=409, detail=f"Un fichier existe déjà à ce chemin: {e}")
+
+@app.get("/api/projects/{project_id}/files/{file_id}")
+async def api_get_file(project_id: str, file_id: str):
+    file = await run_db(project_store.get_file, project_id, file_id)
+    if file is None:
+        raise HTTPException(status_code=404, detail="Fichier introuvable")
+    return file
+
+@app.put("/api/projects/{project_id}/files/{file_id}")
+async def api_update_file(project_id: str, file_id: str, request: ProjectFileUpdate):
+    try:
+        file = await run_db(project_store.update_file, project_id, file_id, request.model_dump())
+    except FileExistsError as e:
+        raise HTTPException(status_code=409, detail=f"Un fichier existe déjà à ce chemin: {e}")
+    if file is None:
+        raise HTTPException(status_code=404, detail="Fichier introuvable")
+    return file
+
+@app.get("/api/projects/{project_id}/files/{file_id}/versions")
+async def api_list_file_versions(project_id: str, file_id: str):
+    if await run_db(project_store.get_file, project_id, file_id, False) is None:
+        raise HTTPException(status_code=404, detail="Fichier introuvable")
+    return {"fileId": file_id, "versions": await run_db(file_versions.list_versions, file_id)}
+
+@app.get("/api/projects/{project_id}/files/{file_id}/versions/{version}")
+async def api_get_file_version(project_id: str, file_id: str, version: int):
+    if await run_db(project_store.get_file, project_id, file_id, False) is None:
+        raise HTTPException(status_code=404, detail="Fichier introuvable")
+    content = await run_db(file_versions.get_version, file_id, version)
+    if content is None:
+        raise HTTPException(status_code=404, detail=f"Version {version} introuvable")
+    return {"fileId": file_id, "version": version, "content": content}
+
+@app.delete("/api/projects/{project_id}/files/{file_id}", status_code=204)
+async def api_delete_file(project_id: str, file_id: str):
+    if not await run_db(project_store.delete_file, project_id, file_id):
+        raise HTTPException(status_code=404, detail="Fichier introuvable")
+    return Response(status_code=204)
+
+@app.get("/metrics")
+async def get_metrics():
+    """Métriques du processus au format texte Prometheus (latences LLM, files, tokens, WebSocket, /execute)."""
+    return Response(content=metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
 @app.get("/favicon.ico")
 async def favicon():
     """Évite l'erreur 404 pour favicon.ico."""
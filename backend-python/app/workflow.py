@@ -0,0 +1,660 @@
+# app/workflow.py
+import os
+import time
+import uuid
+import asyncio
+import logging
+from datetime import datetime
+
+from fastapi import WebSocket
+
+from app.agents import agent_registry
+from app.common.utils import send_agent_message, AgentDeltaBatcher
+from app.common.stage_graph import StageGraph
+from app.common.context_budget import context_budgeter, code_skeleton
+from app.common.code_fences import FenceParser, CodeBlockIndex, safe_filename
+from app.common.artifact_store import artifact_store
+from app.common.model_residency import model_residency
+from app.common.llm_scheduler import llm_scheduler
+from app.common.model_affinity import ModelSwapTracker, base_model_of
+from app.common.checkpoints import checkpoint_store, RUN_COMPLETED, RUN_FAILED, RUN_CANCELLED
+from app.common.job_queue import job_queue, CANCEL_REQUESTED
+
+# Nombre maximal d'étapes LLM exécutées en même temps dans un workflow
+WORKFLOW_MAX_PARALLEL_STAGES = int(os.environ.get("WORKFLOW_MAX_PARALLEL_STAGES", "3"))
+
+# --- Fonctions utilitaires du workflow ---
+class _RecordingWebSocket:
+    """
+    Relaie les messages vers le WebSocket du client en conservant, par étape, les
+    messages `agent_message` définitifs pour pouvoir les rejouer après une reprise.
+    """
+
+    def __init__(self, websocket, messages_by_stage: dict):
+        self.websocket = websocket
+        self.messages_by_stage = messages_by_stage
+
+    async def send_json(self, message: dict):
+        if message.get("type") == "agent_message" and message.get("content") != "...": # Annonces de démarrage non rejouées
+            self.messages_by_stage.setdefault(message.get("stage"), []).append(message)
+        await self.websocket.send_json(message)
+
+
+async def ensure_agent_exists(agent_name, stage, websocket, session_id):
+    """Vérifie qu'un agent existe et retourne son instance pour la session, sinon envoie un message d'erreur."""
+    agent = agent_registry.get_agent(session_id, agent_name)
+    if not agent:
+        # Utilisation de agent_name ici car nous n'avons pas d'objet agent valide
+        await send_agent_message("System", "Erreur critique", f"Agent {agent_name} introuvable. Vérifiez agents.py.", stage, websocket, elapsed=None)
+    return agent
+
+
+class WebsiteCreationWorkflow:
+    """
+    Workflow de création de site web. Chaque étape est une méthode `stage_*`;
+    `build_graph` déclare leurs dépendances de données pour que les étapes
+    indépendantes (design, contenu, BDD) s'exécutent en parallèle.
+    """
+
+    # Agents sans lesquels le workflow ne peut pas démarrer
+    REQUIRED_AGENTS = {
+        "visionnaire": "Mike",
+        "architecte": "Bob",
+        "designer": "UIDesigner",
+        "seo_expert": "SEOCopty",
+        "backend_engineer": "BackEngineer",
+        "frontend_engineer": "FrontEngineer",
+        "critique": "TheCritique",
+        "optimiseur": "TheOptimizer",
+    }
+    # Agents facultatifs : leur étape est sautée s'ils sont absents
+    OPTIONAL_AGENTS = {
+        "db_specialist": "DBMaster",
+        "deployer": "DevOpsGuy",
+        "translator": "TranslatorBot",
+    }
+    # Clés de project_context produites par chaque étape (sauvegardées dans son checkpoint)
+    STAGE_OUTPUTS = {
+        "vision": ["vision"],
+        "architecture": ["architecture_plan"],
+        "design": ["ui_design_proposals"],
+        "content": ["seo_content"],
+        "database": ["database_schema"],
+        "backend_coding": ["backend_code"],
+        "frontend_coding": ["frontend_code"],
+        "critique": ["critique_reports"],
+        "optimization": ["optimized_code"],
+        "devops": ["deployment_scripts"],
+        "translation": ["translations"],
+    }
+
+    def __init__(self, websocket: WebSocket, prompt: str, session_id: str, max_parallel_stages: int = WORKFLOW_MAX_PARALLEL_STAGES):
+        self.stage_messages = {} # étape -> messages envoyés au client (rejoués à la reprise)
+        self.websocket = _RecordingWebSocket(websocket, self.stage_messages)
+        self.prompt = prompt
+        self.session_id = session_id
+        self.max_parallel_stages = max_parallel_stages
+        self.team = {}
+        self.project_context = {
+            "user_request": prompt,
+            "vision": "",
+            "architecture_plan": "",
+            "ui_design_proposals": "",
+            "seo_content": "",
+            "database_schema": "",
+            "backend_code": "",
+            "frontend_code": "",
+            "critique_reports": {},
+            "optimized_code": {"frontend": "", "backend": ""},
+            "deployment_scripts": "",
+            "translations": {}
+        }
+        self.generated_files_dir = os.path.join("generated_code", session_id)
+        self.run_id = f"{session_id}:{uuid.uuid4().hex[:8]}"
+        self.graph = None
+        # Changements de modèle dus à l'ordre des étapes de ce workflow (ses seuls appels, sert
+        # à l'ordonnancement par affinité) ; les chargements réels sont comptés par llm_scheduler
+        self.swaps = ModelSwapTracker()
+        self.loads_at_start = 0
+        self.completed_stages = [] # Étapes restaurées depuis un checkpoint
+        self.finished_stages = set() # Étapes terminées pendant cette exécution
+        self.code_index = {} # étape -> CodeBlockIndex des blocs de code de sa réponse
+        self.stage_outputs = {} # étape -> {"agent": nom, "files": {chemin: contenu}} en attente d'écriture
+
+    async def _load_team(self) -> bool:
+        """Vérifie et initialise les agents nécessaires pour le workflow."""
+        for key, agent_name in self.REQUIRED_AGENTS.items():
+            agent = await ensure_agent_exists(agent_name, "init", self.websocket, self.session_id)
+            if not agent:
+                return False
+            self.team[key] = agent
+        for key, agent_name in self.OPTIONAL_AGENTS.items():
+            self.team[key] = agent_registry.get_agent(self.session_id, agent_name)
+        return True
+
+    async def _ask(self, agent, prompt, stage, save_blocks: bool = False):
+        """
+        Interroge un agent en streaming et retourne (réponse, durée). Les tokens sont
+        relayés au client au fil de l'eau sous forme de messages `agent_delta`, et
+        analysés au passage : les blocs de code de la réponse sont indexés dans
+        `self.code_index[stage]`. Avec `save_blocks`, chaque bloc dont le nom de fichier
+        est connu est enregistré dès sa fermeture, sans attendre la fin de la génération.
+        """
+        start_time = time.time()
+        batcher = AgentDeltaBatcher(agent.name, stage, self.websocket)
+        parser = FenceParser()
+        streamed_chars = 0
+
+        async def on_delta(delta):
+            nonlocal streamed_chars
+            streamed_chars += len(delta)
+            await batcher.push(delta)
+            for block in parser.feed(delta):
+                if save_blocks:
+                    await self._save_block(stage, block, agent.name)
+
+        model_residency.consume(self.run_id, agent.llm_model)
+        self.swaps.record(agent.llm_model)
+        # Pendant la génération, on précharge le(s) modèle(s) des étapes qui suivront
+        model_residency.prefetch(self._models_to_prefetch(stage, agent.llm_model), session_id=self.session_id)
+        response = await agent.aask_stream(prompt, on_delta=on_delta,
+                                           keep_alive=model_residency.keep_alive_for(agent.llm_model))
+        await batcher.flush()
+        if streamed_chars == len(response):
+            for block in parser.close():
+                if save_blocks:
+                    await self._save_block(stage, block, agent.name)
+            self.code_index[stage] = CodeBlockIndex(parser.blocks)
+        else:
+            # Réponse de secours (non streamée) : analyse en une passe
+            self.code_index[stage] = CodeBlockIndex.from_text(response)
+        return response, time.time() - start_time
+
+    def _add_output(self, stage, filename, content, agent_name):
+        """Ajoute un fichier aux sorties de l'étape, écrites ensemble quand elle se termine."""
+        outputs = self.stage_outputs.setdefault(stage, {"agent": agent_name, "files": {}})
+        outputs["files"][filename] = content
+
+    async def _flush_outputs(self, stage):
+        outputs = self.stage_outputs.pop(stage, None)
+        if outputs:
+            await artifact_store.write_files(self.session_id, outputs["files"], stage, outputs["agent"])
+
+    async def _save_block(self, stage, block, agent_name):
+        """Enregistre immédiatement un bloc de code nommé sous blocks/<étape>/<fichier>."""
+        filename = safe_filename(block.filename or "")
+        if filename and block.code:
+            await artifact_store.write_file(self.session_id, os.path.join("blocks", stage, filename), block.code, stage, agent_name)
+
+    def wants_translation(self) -> bool:
+        return "multilingue" in self.prompt.lower() or "traduire" in self.prompt.lower()
+
+    def _models_for(self, stages: list) -> list:
+        """Modèles Ollama des étapes données qui s'exécuteront réellement."""
+        by_name = {agent.name: agent for agent in self.team.values() if agent}
+        models = []
+        for stage in stages:
+            if stage.name == "translation" and not self.wants_translation():
+                continue
+            agent = by_name.get(stage.agent_name)
+            if agent:
+                models.append(agent.llm_model)
+        return models
+
+    def model_loads(self) -> int:
+        """
+        Chargements de modèle de base provoqués par ce workflow depuis son démarrage, vus
+        par l'ordonnanceur global : appels des étapes et préchargements, y compris ceux
+        rendus nécessaires par les modèles des autres sessions intercalés entre ses appels.
+        """
+        return llm_scheduler.loads_for(self.session_id) - self.loads_at_start
+
+    def _models_to_prefetch(self, stage: str, current_model: str) -> list:
+        """
+        Modèles des étapes que la fin de `stage` rendra prêtes, dans l'ordre où elles seront
+        lancées (affinité), sans dépasser le nombre de modèles de base qui tiennent en
+        mémoire avec celui en cours d'utilisation. Les bases déjà chargées sont ignorées.
+        """
+        done = set(self.completed_stages) | self.finished_stages | {stage}
+        upcoming = [s for s in self.graph.dependents(stage) if all(dep in done for dep in s.depends_on)]
+        if len(upcoming) > 1:
+            upcoming = self._order_by_affinity(upcoming)
+        bases = {base_model_of(current_model)}
+        models = []
+        for model in self._models_for(upcoming):
+            base = base_model_of(model)
+            if base in bases:
+                continue
+            bases.add(base)
+            if len(bases) > llm_scheduler.swaps.capacity:
+                break
+            if not llm_scheduler.swaps.is_resident(model):
+                models.append(model)
+        return models
+
+    def _order_by_affinity(self, ready: list) -> list:
+        """
+        Ordonne les étapes prêtes pour limiter les changements de modèle : d'abord celles
+        dont le modèle de base est déjà chargé, puis regroupées par modèle de base.
+        Les étapes sans agent (sautées immédiatement) passent en tête.
+        """
+        models = {agent.name: agent.llm_model for agent in self.team.values() if agent}
+        bases = [base_model_of(models[stage.agent_name]) if stage.agent_name in models else None for stage in ready]
+        first_seen = {base: index for index, base in reversed(list(enumerate(bases)))}
+
+        def key(item):
+            stage, base = item
+            if base is None:
+                return (-1, 0)
+            return (0 if base in self.swaps.resident else 1, first_seen[base])
+
+        return [stage for stage, _ in sorted(zip(ready, bases), key=key)]
+
+    def build_graph(self) -> StageGraph:
+        """Déclare les étapes du workflow et leurs dépendances de données."""
+        graph = StageGraph(max_concurrency=self.max_parallel_stages, order_ready=self._order_by_affinity,
+                           on_stage_done=self._on_stage_done)
+        graph.add_stage("vision", self.stage_vision, agent_name="Mike")
+        graph.add_stage("architecture", self.stage_architecture, ["vision"], agent_name="Bob")
+        graph.add_stage("design", self.stage_design, ["architecture"], agent_name="UIDesigner")
+        graph.add_stage("content", self.stage_content, ["architecture"], agent_name="SEOCopty")
+        graph.add_stage("database", self.stage_database, ["architecture"], agent_name="DBMaster")
+        graph.add_stage("backend_coding", self.stage_backend, ["database"], agent_name="BackEngineer")
+        graph.add_stage("frontend_coding", self.stage_frontend, ["design", "content", "backend_coding"], agent_name="FrontEngineer")
+        graph.add_stage("critique", self.stage_critique, ["frontend_coding", "backend_coding"], agent_name="TheCritique")
+        graph.add_stage("optimization", self.stage_optimization, ["critique"], agent_name="TheOptimizer")
+        graph.add_stage("devops", self.stage_devops, ["optimization"], agent_name="DevOpsGuy")
+        graph.add_stage("translation", self.stage_translation, ["content", "optimization"], agent_name="TranslatorBot")
+        return graph
+
+    # --- Fin d'étape : fichiers puis checkpoint ---
+    async def _on_stage_done(self, stage: str):
+        self.finished_stages.add(stage)
+        await self._flush_outputs(stage)
+        await self._checkpoint(stage)
+
+    async def _checkpoint(self, stage: str):
+        """Enregistre la sortie d'une étape terminée et les messages envoyés au client."""
+        outputs = {key: self.project_context[key] for key in self.STAGE_OUTPUTS.get(stage, [])}
+        try:
+            await checkpoint_store.save_stage(self.session_id, stage, outputs, self.stage_messages.get(stage, []))
+        except Exception as e:
+            # Un checkpoint manqué coûte une étape à refaire, pas le workflow
+            logging.warning(f"[Workflow {self.run_id}] Checkpoint de l'étape '{stage}' impossible: {e}")
+
+    async def _restore(self) -> bool:
+        """
+        Recharge les étapes déjà terminées de la session et rejoue leurs messages au client.
+        Retourne False s'il n'y a rien à reprendre.
+        """
+        stages = await checkpoint_store.load_stages(self.session_id)
+        if not stages:
+            return False
+        for stage, checkpoint in stages.items():
+            self.project_context.update(checkpoint["outputs"])
+            self.stage_messages[stage] = checkpoint["messages"]
+            for message in checkpoint["messages"]:
+                await self.websocket.websocket.send_json({**message, "replayed": True})
+        self.completed_stages = list(stages)
+        return True
+
+    async def run(self, resume: bool = False):
+        os.makedirs(self.generated_files_dir, exist_ok=True)
+        if not await self._load_team():
+            return
+
+        # --- Démarrage ou reprise du Workflow ---
+        if resume and await self._restore():
+            await checkpoint_store.mark_running(self.session_id)
+            await send_agent_message("System", "Reprise du workflow", f"Étapes déjà terminées: {', '.join(self.completed_stages)}. Reprise à partir de la première étape incomplète.", "init", self.websocket, elapsed=None)
+        else:
+            await checkpoint_store.start_run(self.session_id, self.prompt)
+            await send_agent_message("System", "Démarrage du workflow", "Lancement de la séquence de développement de site web.", "init", self.websocket, elapsed=None)
+
+        self.graph = self.build_graph()
+        remaining = [stage for name, stage in self.graph.stages.items() if name not in self.completed_stages]
+        model_residency.plan(self.run_id, self._models_for(remaining))
+        self.loads_at_start = llm_scheduler.loads_for(self.session_id)
+        try:
+            await self.graph.run(completed=self.completed_stages)
+        except Exception:
+            await checkpoint_store.finish_run(self.session_id, RUN_FAILED)
+            raise
+        finally:
+            model_residency.finish(self.run_id)
+            logging.info(f"[Workflow {self.run_id}] {self.model_loads()} chargement(s) de modèle "
+                         f"({self.swaps.swaps} changement(s) dus à l'ordre des étapes) pour {self.swaps.calls} appel(s)")
+        await checkpoint_store.finish_run(self.session_id, RUN_COMPLETED)
+
+        # --- Signal de fin de workflow global ---
+        await self.websocket.send_json({
+            "type": "workflow_complete",
+            "message": "✅ Projet de site web terminé ! Fichiers générés dans le dossier de session.",
+            "final_output_path": self.generated_files_dir,
+            "model_swaps": self.model_loads(), # Chargements réels attribués au workflow, préchargements compris
+            "stage_model_swaps": self.swaps.swaps, # Changements dus au seul ordre de ses étapes
+            "timestamp": str(datetime.now())
+        })
+
+    # ----------------- Étape 1 : Vision du projet -----------------
+    async def stage_vision(self):
+        visionnaire = self.team["visionnaire"]
+        await send_agent_message(visionnaire.name, "Démarre l'analyse des besoins et définit la vision du projet.", "...", "vision", self.websocket)
+        vision_response, elapsed = await self._ask(visionnaire, self.prompt, "vision")
+        self.project_context["vision"] = vision_response
+        await send_agent_message(visionnaire.name, "Vision définie", vision_response, "vision", self.websocket, elapsed)
+
+    # ----------------- Étape 2 : Architecture -----------------
+    async def stage_architecture(self):
+        architecte = self.team["architecte"]
+        project_context = self.project_context
+        await send_agent_message(architecte.name, "Conçoit l'architecture technique du site web.", "...", "architecture", self.websocket)
+        ctx = context_budgeter.fit("architecture", vision=project_context["vision"])
+        architecture_prompt = (
+            f"Basé sur la vision suivante: '{ctx['vision']}', "
+            "propose un plan d'architecture détaillé pour un site web de restaurant italien. "
+            "Le plan doit inclure la structure technique du frontend (React), du backend (FastAPI) et la base de données (si nécessaire, ex: pour les réservations, le menu). "
+            "Démontre la structure des dossiers et les interfaces principales (API). "
+            "Mets en évidence les considérations de performance, sécurité et scalabilité."
+        )
+        architecture_plan, elapsed = await self._ask(architecte, architecture_prompt, "architecture")
+        project_context["architecture_plan"] = architecture_plan
+        await send_agent_message(architecte.name, "Plan d'architecture généré", architecture_plan, "architecture", self.websocket, elapsed)
+        self._add_output("architecture", "architecture_plan.md", architecture_plan, architecte.name)
+
+    # ----------------- Étape 3 : Le Designer UI/UX -----------------
+    async def stage_design(self):
+        designer = self.team["designer"]
+        project_context = self.project_context
+        await send_agent_message(designer.name, "Propose des éléments de design UI/UX et la charte graphique.", "...", "design", self.websocket)
+        ctx = context_budgeter.fit("design", architecture_plan=project_context["architecture_plan"], vision=project_context["vision"])
+        design_prompt = (
+            f"Basé sur le plan d'architecture: '{ctx['architecture_plan']}' et la vision: '{ctx['vision']}', "
+            "propose des éléments de design UI/UX pour un site web de restaurant italien. "
+            "Inclue palettes de couleurs (HEX/RGB), typographies (noms de polices, styles), "
+            "agencements de page pour l'accueil, le menu et les réservations, et suggestions d'icônes. "
+            "Fournis des extraits CSS pertinents pour ces styles."
+        )
+        design_proposals, elapsed = await self._ask(designer, design_prompt, "design")
+        project_context["ui_design_proposals"] = design_proposals
+        await send_agent_message(designer.name, "Propositions de design UI/UX", design_proposals, "design", self.websocket, elapsed)
+        self._add_output("design", "ui_design_proposals.md", design_proposals, designer.name)
+
+    # ----------------- Étape 4 : L'Expert SEO / Contenu -----------------
+    async def stage_content(self):
+        seo_expert = self.team["seo_expert"]
+        project_context = self.project_context
+        await send_agent_message(seo_expert.name, "Génère le contenu textuel et les recommandations SEO.", "...", "content", self.websocket)
+        ctx = context_budgeter.fit("content", vision=project_context["vision"], architecture_plan=project_context["architecture_plan"])
+        seo_prompt = (
+            f"Basé sur la vision: '{ctx['vision']}' et le plan d'architecture: '{ctx['architecture_plan']}', "
+            "génère du contenu textuel pour les pages principales d'un site de restaurant italien (Accueil, Menu, Réservation, Contact, À propos). "
+            "Inclue des mots-clés pertinents pour le SEO, des titres accrocheurs et propose des balises meta (<title>, <meta description>)."
+        )
+        seo_content, elapsed = await self._ask(seo_expert, seo_prompt, "content")
+        project_context["seo_content"] = seo_content
+        await send_agent_message(seo_expert.name, "Contenu et SEO générés", seo_content, "content", self.websocket, elapsed)
+        self._add_output("content", "seo_content.md", seo_content, seo_expert.name)
+
+    # ----------------- Étape 5 : Spécialiste Base de Données (si nécessaire) -----------------
+    async def stage_database(self):
+        db_specialist = self.team["db_specialist"]
+        project_context = self.project_context
+        if not db_specialist:
+            await send_agent_message("System", "Info", "Agent Spécialiste Base de Données (DBMaster) non disponible ou non nécessaire pour cette demande.", "database", self.websocket, elapsed=None)
+            return
+        await send_agent_message(db_specialist.name, "Conçoit le schéma de base de données.", "...", "database", self.websocket)
+        ctx = context_budgeter.fit("database", architecture_plan=project_context["architecture_plan"], vision=project_context["vision"])
+        db_prompt = (
+            f"Basé sur le plan d'architecture: '{ctx['architecture_plan']}' et la vision: '{ctx['vision']}', "
+            "propose un schéma de base de données (tables, champs, relations, index) pour un site de restaurant italien "
+            "(ex: gestion du menu, des réservations, des utilisateurs). "
+            "Fournis les instructions SQL de création de table ou les modèles ORM (SQLAlchemy pour Python)."
+        )
+        database_schema, elapsed = await self._ask(db_specialist, db_prompt, "database")
+        project_context["database_schema"] = database_schema
+        self._add_output("database", "database_schema.sql", database_schema, db_specialist.name)
+        await send_agent_message(db_specialist.name, "Schéma de BDD généré", database_schema, "database", self.websocket, elapsed)
+
+    # ----------------- Étape 6 : Ingénieur Backend -----------------
+    async def stage_backend(self):
+        backend_engineer_agent = self.team["backend_engineer"]
+        project_context = self.project_context
+        await send_agent_message(backend_engineer_agent.name, "Génère le code backend (FastAPI).", "...", "backend_coding", self.websocket)
+        ctx = context_budgeter.fit("backend_coding", architecture_plan=project_context["architecture_plan"],
+                                   vision=project_context["vision"], database_schema=project_context["database_schema"])
+        backend_prompt = (
+            f"Basé sur le plan d'architecture: '{ctx['architecture_plan']}', "
+            f"la vision: '{ctx['vision']}', et le schéma de BDD (si existant): '{ctx['database_schema']}', "
+            "écris le code backend FastAPI pour un site de restaurant italien. "
+            "Inclue les routes API pour gérer le menu, les réservations, et potentiellement l'authentification. "
+            "Fournis le code Python complet pour les fichiers clés (ex: main.py, models.py, services.py), en utilisant des blocs de code Markdown."
+        )
+        backend_code, elapsed = await self._ask(backend_engineer_agent, backend_prompt, "backend_coding", save_blocks=True)
+        project_context["backend_code"] = backend_code
+
+        self._add_output("backend_coding", "backend_code_raw_output.md", backend_code, backend_engineer_agent.name)
+        try:
+            extracted_backend_code = self.code_index["backend_coding"].first("python")
+            if extracted_backend_code:
+                self._add_output("backend_coding", "backend_app.py", extracted_backend_code, backend_engineer_agent.name)
+                await send_agent_message(backend_engineer_agent.name, "Code Backend généré et sauvegardé", extracted_backend_code[:500] + "...", "backend_coding", self.websocket, elapsed)
+            else:
+                await send_agent_message(backend_engineer_agent.name, "Code Backend généré (mais extraction difficile)", backend_code, "backend_coding", self.websocket, elapsed)
+        except Exception as e:
+            await send_agent_message(backend_engineer_agent.name, "Erreur de sauvegarde/parsing Backend", f"Impossible d'extraire le code Python: {e}\nRaw Output: {backend_code}", "backend_coding", self.websocket, elapsed)
+
+    # --- Étape 7 : Ingénieur Frontend ---
+    async def stage_frontend(self):
+        frontend_engineer_agent = self.team["frontend_engineer"]
+        project_context = self.project_context
+        await send_agent_message(frontend_engineer_agent.name, "Génère le code frontend (React, HTML, CSS).", "...", "frontend_coding", self.websocket)
+        # Seules les routes et signatures du backend sont utiles ici : on n'en garde que le squelette
+        ctx = context_budgeter.fit("frontend_coding", architecture_plan=project_context["architecture_plan"],
+                                   ui_design_proposals=project_context["ui_design_proposals"],
+                                   seo_content=project_context["seo_content"],
+                                   backend_api=code_skeleton(project_context["backend_code"]) or project_context["backend_code"])
+        frontend_prompt = (
+            f"Basé sur le plan d'architecture: '{ctx['architecture_plan']}', "
+            f"les propositions de design UI/UX: '{ctx['ui_design_proposals']}', "
+            f"le contenu SEO: '{ctx['seo_content']}', "
+            f"et les routes API du backend: '{ctx['backend_api']}', "
+            "écris le code React, HTML et CSS pour un site web de restaurant italien. "
+            "Inclue les pages Accueil, Menu, Réservation, Contact. "
+            "Structure le code en composants réutilisables. "
+            "Fournis le code complet (ex: App.jsx, index.html, style.css), en utilisant des blocs de code Markdown pour chaque fichier."
+        )
+        frontend_code, elapsed = await self._ask(frontend_engineer_agent, frontend_prompt, "frontend_coding", save_blocks=True)
+        project_context["frontend_code"] = frontend_code
+
+        self._add_output("frontend_coding", "frontend_code_raw_output.md", frontend_code, frontend_engineer_agent.name)
+        try:
+            blocks = self.code_index["frontend_coding"]
+            extracted_html = blocks.first("html")
+            extracted_css = blocks.first("css")
+            extracted_js_jsx = blocks.first("javascript", "jsx")
+
+            if extracted_html:
+                self._add_output("frontend_coding", "index.html", extracted_html, frontend_engineer_agent.name)
+            if extracted_css:
+                self._add_output("frontend_coding", "style.css", extracted_css, frontend_engineer_agent.name)
+            if extracted_js_jsx:
+                js_filename = "App.jsx" if "import React" in extracted_js_jsx else "script.js"
+                self._add_output("frontend_coding", js_filename, extracted_js_jsx, frontend_engineer_agent.name)
+
+            if extracted_html or extracted_css or extracted_js_jsx:
+                await send_agent_message(frontend_engineer_agent.name, "Code Frontend généré et sauvegardé", "HTML, CSS, JS/JSX générés et enregistrés.", "frontend_coding", self.websocket, elapsed)
+            else:
+                await send_agent_message(frontend_engineer_agent.name, "Code Frontend généré (parsing complexe)", frontend_code, "frontend_coding", self.websocket, elapsed)
+        except Exception as e:
+            await send_agent_message(frontend_engineer_agent.name, "Erreur de sauvegarde/parsing Frontend", f"Impossible d'extraire le code: {e}\nRaw Output: {frontend_code}", "frontend_coding", self.websocket, elapsed)
+
+    # --- Étape 8 : Le Critique ---
+    async def stage_critique(self):
+        critique = self.team["critique"]
+        project_context = self.project_context
+        await send_agent_message(critique.name, "Analyse le code généré pour les erreurs et failles de sécurité.", "...", "critique", self.websocket)
+        ctx = context_budgeter.fit("critique", frontend_code=project_context["frontend_code"], backend_code=project_context["backend_code"])
+        critique_prompt = (
+            f"Critique de manière exhaustive le code frontend et backend généré. "
+            f"Code Frontend: '{ctx['frontend_code']}'. "
+            f"Code Backend: '{ctx['backend_code']}'. "
+            "Cherche les erreurs de logique, les bugs potentiels, les failles de sécurité, "
+            "les problèmes de performance, les violations de bonnes pratiques et les améliorations de qualité. "
+            "Fournis un rapport clair avec des points précis et des suggestions de correction."
+        )
+        critique_report, elapsed = await self._ask(critique, critique_prompt, "critique")
+        project_context["critique_reports"] = {"general": critique_report}
+        await send_agent_message(critique.name, "Rapport de critique", project_context['critique_reports']['general'], "critique", self.websocket, elapsed)
+        self._add_output("critique", "critique_report.md", critique_report, critique.name)
+
+    # --- Étape 9 : L'Optimiseur ---
+    async def stage_optimization(self):
+        optimiseur = self.team["optimiseur"]
+        project_context = self.project_context
+        await send_agent_message(optimiseur.name, "Optimise et corrige le code basé sur les critiques.", "...", "optimization", self.websocket)
+        ctx = context_budgeter.fit("optimization", critique=project_context["critique_reports"]["general"],
+                                   frontend_code=project_context["frontend_code"], backend_code=project_context["backend_code"])
+        optimizer_prompt = (
+            f"Basé sur les critiques: '{ctx['critique']}', "
+            f"optimise et corrige le code frontend: '{ctx['frontend_code']}' "
+            f"et le code backend: '{ctx['backend_code']}'. "
+            "Fournis le code final optimisé pour les deux parties, "
+            "en séparant clairement le code frontend (HTML/CSS/JS/React) et le code backend (Python/FastAPI) "
+            "avec des blocs de code Markdown distincts et des explications concises."
+        )
+        optimized_code_response, elapsed = await self._ask(optimiseur, optimizer_prompt, "optimization", save_blocks=True)
+
+        blocks = self.code_index["optimization"]
+        final_frontend_code = blocks.first("html", "jsx", "javascript")
+        final_backend_code = blocks.first("python")
+
+        project_context["optimized_code"] = {
+            "frontend": final_frontend_code,
+            "backend": final_backend_code
+        }
+
+        self._add_output("optimization", "final_frontend_site.html", final_frontend_code, optimiseur.name)
+        self._add_output("optimization", "final_backend_api.py", final_backend_code, optimiseur.name)
+        await send_agent_message(optimiseur.name, "Code final optimisé et corrigé", optimized_code_response, "optimization", self.websocket, elapsed)
+
+    # --- Étape 10 : Le Déployeur / DevOps ---
+    async def stage_devops(self):
+        deployer = self.team["deployer"]
+        project_context = self.project_context
+        if not deployer:
+            await send_agent_message("System", "Info", "Agent Déployeur/DevOps (DevOpsGuy) non inclus dans ce workflow.", "devops", self.websocket, elapsed=None)
+            return
+        await send_agent_message(deployer.name, "Prépare les scripts de déploiement et la configuration DevOps.", "...", "devops", self.websocket)
+        ctx = context_budgeter.fit("devops", frontend=project_context["optimized_code"]["frontend"],
+                                   backend=project_context["optimized_code"]["backend"])
+        deploy_prompt = (
+            f"Basé sur le code frontend final: '{ctx['frontend']}', "
+            f"et le code backend final: '{ctx['backend']}', "
+            "génère les scripts de déploiement (Dockerfile, commandes shell, fichiers de configuration CI/CD) "
+            "pour mettre ce site web de restaurant italien en production (ex: sur Docker, ou un service cloud comme Render/Vercel/Heroku). "
+            "Fournis des instructions claires."
+        )
+        deployment_scripts, elapsed = await self._ask(deployer, deploy_prompt, "devops")
+        project_context["deployment_scripts"] = deployment_scripts
+        self._add_output("devops", "deployment_instructions.md", deployment_scripts, deployer.name)
+        await send_agent_message(deployer.name, "Scripts de déploiement générés", project_context['deployment_scripts'], "devops", self.websocket, elapsed)
+
+    # --- Étape 11 : Le Traducteur (si demande de multilingue) ---
+    async def stage_translation(self):
+        translator_instance = self.team["translator"]
+        project_context = self.project_context
+        if not translator_instance:
+            await send_agent_message("System", "Info", "Agent Traducteur non disponible.", "translation", self.websocket, elapsed=None)
+            return
+        if not self.wants_translation():
+            await send_agent_message("System", "Info", "Pas de demande de traduction multilingue détectée.", "translation", self.websocket, elapsed=None)
+            return
+        await send_agent_message(translator_instance.name, "Traduit le contenu du site dans d'autres langues.", "...", "translation", self.websocket)
+        ctx = context_budgeter.fit("translation", seo_content=project_context["seo_content"],
+                                   frontend=project_context["optimized_code"]["frontend"])
+        content_to_translate = ctx["seo_content"] + "\n\n--- Code Frontend ---\n" + ctx["frontend"]
+        translation_prompt = (
+            f"Traduire le texte et les extraits de code (si pertinent) suivants du français vers l'italien et l'espagnol "
+            f"pour un site de restaurant: '{content_to_translate}'. "
+            "Fournis le texte traduit dans un format clair, en indiquant la langue et la section originale. "
+            "Ne traduis pas le code, seulement les chaînes de caractères dans le code."
+        )
+        translated_content, elapsed = await self._ask(translator_instance, translation_prompt, "translation")
+        project_context["translations"] = {"all": translated_content}
+        self._add_output("translation", "translated_content.md", translated_content, translator_instance.name)
+        await send_agent_message(translator_instance.name, "Contenu traduit", project_context['translations']['all'], "translation", self.websocket, elapsed)
+
+
+# --- Fonction principale de workflow pour la création de site web ---
+async def run_website_creation_workflow(websocket: WebSocket, prompt: str, session_id: str, resume: bool = False):
+    """
+    Orchestre une équipe d'agents IA pour réaliser la création d'un site web complet,
+    en envoyant des mises à jour en temps réel via WebSocket. Avec `resume`, reprend
+    le workflow interrompu de la session à partir de ses checkpoints.
+    """
+    workflow = WebsiteCreationWorkflow(websocket, prompt, session_id)
+    await workflow.run(resume=resume)
+    return workflow.project_context
+
+
+def submit_workflow_job(prompt: str, session_id: str, resume: bool = False):
+    """
+    Soumet le workflow à la file des jobs ; sa progression est diffusée par `job.channel`.
+    L'annulation du job interrompt l'appel Ollama en cours et les étapes restantes ;
+    annulé à la demande du client, le workflow ne sera pas repris à la reconnexion.
+    """
+    async def runner(job):
+        try:
+            return await run_website_creation_workflow(job.channel, prompt, session_id, resume=resume)
+        except asyncio.CancelledError:
+            if job.cancel_reason == CANCEL_REQUESTED:
+                await checkpoint_store.finish_run(session_id, RUN_CANCELLED)
+            raise
+        finally:
+            agent_registry.release(session_id)
+    return job_queue.submit(runner, session_id, prompt)
+
+
+async def resume_interrupted_workflow(session_id: str, retry_failed: bool = False):
+    """
+    Soumet la reprise du workflow interrompu de la session, s'il y en a un ; avec
+    `retry_failed` (demande explicite du client), reprend aussi un workflow en échec.
+    Retourne le job ou None.
+    """
+    if job_queue.active_job_for(session_id):
+        return None
+    run = await checkpoint_store.get_resumable_run(session_id, retry_failed=retry_failed)
+    if not run:
+        return None
+    return submit_workflow_job(run["prompt"], session_id, resume=True)
+
+
+def workflow_result(job) -> dict:
+    """Résultat d'un job au format WorkflowResult attendu par le frontend (multiAgentService.ts)."""
+    results = {}
+    for message in job.channel.messages:
+        if message.get("agent") == "System":
+            continue
+        results[message["agent"]] = {
+            "agent": message["agent"],
+            "response": message.get("content", ""),
+            "confidence": None, # Non fourni par les modèles Ollama
+            "executionTime": message.get("elapsed") or 0,
+            "thought": message.get("status", ""),
+        }
+    context = job.result or {}
+    critique = (context.get("critique_reports") or {}).get("general", "")
+    recommendations = [line.strip().strip("-*• ") for line in critique.splitlines() if line.strip().startswith(("-", "*", "•"))]
+    if job.error:
+        summary = f"Échec du workflow: {job.error}"
+    else:
+        summary = f"Workflow terminé : {len(results)} agent(s), fichiers générés dans generated_code/{job.session_id}."
+    return {
+        "job_id": job.job_id,
+        "status": job.status,
+        "results": results,
+        "summary": summary,
+        "recommendations": [r for r in recommendations if r][:10],
+        "totalTime": (job.finished_at or time.time()) - (job.started_at or job.created_at),
+    }
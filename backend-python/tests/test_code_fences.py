@@ -0,0 +1,55 @@
+# tests/test_code_fences.py
+from app.common.code_fences import FenceParser, parse_code_blocks
+
+
+def test_indented_fence():
+    text = "Voici le code :\n\n    ```python\n    print(1)\n    ```\n"
+    blocks = parse_code_blocks(text)
+    assert len(blocks) == 1
+    assert blocks[0].language == "python"
+    assert blocks[0].code == "print(1)"
+    assert blocks[0].closed
+
+
+def test_fence_in_list_item():
+    text = "1. Fichier principal :\n        ```js\n        console.log(1);\n        ```\n2. Fin\n"
+    blocks = parse_code_blocks(text)
+    assert [(block.language, block.code) for block in blocks] == [("javascript", "console.log(1);")]
+
+
+def test_closing_fence_on_code_line():
+    text = "```python\nprint(2)\nprint(3)```\nTexte après.\n```bash\nls\n```\n"
+    blocks = parse_code_blocks(text)
+    assert [(block.language, block.code, block.closed) for block in blocks] == [
+        ("python", "print(2)\nprint(3)", True),
+        ("bash", "ls", True),
+    ]
+    assert text[blocks[0].code_start:blocks[0].code_end] == "print(2)\nprint(3)"
+    assert text[blocks[0].end:].startswith("Texte après.")
+
+
+def test_closing_fence_on_code_line_at_end_of_text():
+    blocks = parse_code_blocks("```python\nprint(3)```")
+    assert len(blocks) == 1
+    assert blocks[0].code == "print(3)"
+    assert blocks[0].closed
+
+
+def test_inline_backticks_do_not_close_block():
+    blocks = parse_code_blocks("```markdown\nUtiliser `x`\n```\n")
+    assert blocks[0].code == "Utiliser `x`"
+
+
+def test_longer_fence_is_not_closed_by_shorter_one():
+    blocks = parse_code_blocks("````markdown\n```python\nx = 1\n```\n````\n")
+    assert len(blocks) == 1
+    assert blocks[0].code == "```python\nx = 1\n```"
+
+
+def test_streamed_fragments():
+    parser = FenceParser()
+    completed = []
+    for fragment in ("  ```py", "thon\n  a = 1\n  b = 2`", "``\n"):
+        completed += parser.feed(fragment)
+    completed += parser.close()
+    assert [(block.language, block.code) for block in completed] == [("python", "a = 1\n  b = 2")]
@@ -0,0 +1,48 @@
+# tests/test_job_queue.py
+import json
+import asyncio
+
+from app.common import job_queue
+from app.common.job_queue import JobChannel
+
+
+class _Socket:
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.received = []
+
+    async def send_text(self, text: str):
+        await asyncio.sleep(self.delay)
+        self.received.append(json.loads(text))
+
+
+def test_channel_records_and_replays_messages_by_type():
+    async def scenario():
+        channel = JobChannel()
+        early = _Socket()
+        await channel.subscribe(early)
+        await channel.send_json({"stage": "vision", "content": "...", "type": "agent_message"})
+        await channel.send_json({"type": "agent_delta", "delta": "a"})
+        await channel.send_json({"content": "Vision prête", "type": "agent_message", "stage": "vision"})
+        late = _Socket()
+        await channel.subscribe(late)
+        assert [m["type"] for m in early.received] == ["agent_message", "agent_delta", "agent_message"]
+        assert [m["type"] for m in late.received] == ["agent_message", "agent_message"]
+        assert [m["content"] for m in channel.messages] == ["Vision prête"]
+
+    asyncio.run(scenario())
+
+
+def test_stuck_subscriber_is_dropped(monkeypatch):
+    monkeypatch.setattr(job_queue, "WORKFLOW_SUBSCRIBER_SEND_TIMEOUT", 0.05)
+
+    async def scenario():
+        channel = JobChannel()
+        fast, stuck = _Socket(), _Socket(delay=10)
+        await channel.subscribe(fast)
+        await channel.subscribe(stuck)
+        await channel.send_json({"type": "agent_message", "content": "x"})
+        assert channel.subscribers == [fast]
+        assert len(fast.received) == 1
+
+    asyncio.run(asyncio.wait_for(scenario(), 5))
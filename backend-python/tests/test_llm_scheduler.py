@@ -0,0 +1,82 @@
+# tests/test_llm_scheduler.py
+import asyncio
+
+from app.common.llm_scheduler import LLMScheduler
+
+
+def test_waiter_cancelled_during_release_does_not_take_the_slot():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrent=1, default_model_limit=1)
+        entered, release = asyncio.Event(), asyncio.Event()
+
+        async def holder():
+            async with scheduler.slot("m", "a"):
+                entered.set()
+                await release.wait()
+
+        async def waiter():
+            async with scheduler.slot("m", "b"):
+                pass
+
+        holding = asyncio.create_task(holder())
+        await entered.wait()
+        waiting = asyncio.create_task(waiter())
+        await asyncio.sleep(0)
+        # Même tour de boucle : le détenteur libère son créneau alors que l'attente est déjà annulée
+        release.set()
+        waiting.cancel()
+        results = await asyncio.gather(holding, waiting, return_exceptions=True)
+        assert results[0] is None
+        assert isinstance(results[1], asyncio.CancelledError)
+        assert scheduler.active_total == 0
+        assert not scheduler.active_by_model
+
+        # Le créneau est de nouveau disponible
+        async with scheduler.slot("m", "c"):
+            assert scheduler.active_total == 1
+        assert scheduler.active_total == 0
+
+    asyncio.run(asyncio.wait_for(scenario(), 5))
+
+
+def test_cancelled_waiter_is_skipped_for_the_next_one():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrent=1, default_model_limit=1)
+        entered, release = asyncio.Event(), asyncio.Event()
+        served = []
+
+        async def holder():
+            async with scheduler.slot("m", "a"):
+                entered.set()
+                await release.wait()
+
+        async def waiter(session_id):
+            async with scheduler.slot("m", session_id):
+                served.append(session_id)
+
+        holding = asyncio.create_task(holder())
+        await entered.wait()
+        cancelled = asyncio.create_task(waiter("b"))
+        await asyncio.sleep(0)
+        other = asyncio.create_task(waiter("c"))
+        await asyncio.sleep(0)
+        release.set()
+        cancelled.cancel()
+        await asyncio.gather(holding, cancelled, other, return_exceptions=True)
+        assert served == ["c"]
+        assert scheduler.active_total == 0
+
+    asyncio.run(asyncio.wait_for(scenario(), 5))
+
+
+def test_model_loads_are_attributed_to_the_session_that_caused_them():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrent=2, default_model_limit=2)
+        for session_id, model in (("a", "m1"), ("a", "m1"), ("b", "m2"), ("a", "m3")):
+            async with scheduler.slot(model, session_id):
+                pass
+        assert scheduler.loads_for("a") == 2
+        assert scheduler.loads_for("b") == 1
+        assert scheduler.loads_for("unknown") == 0
+
+    asyncio.run(scenario())